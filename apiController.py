@@ -1,101 +1,548 @@
 import httpx
 import asyncio
-from configparser import ConfigParser
+import csv
+import importlib.util
+import json
+import mimetypes
+import os
+from collections import deque
+from pathlib import Path
 from rich.console import Console
 from rich.table import Table
+import appConfig
+from fileHash import file_sha256
+from libraryIndex import LibraryIndex
+from rateLimiter import NEVER_RETRY, async_client
 
 console = Console()
 
+MANIFEST_NAME = ".ai21_upload_manifest.jsonl"
+CONTENT_LABEL_PREFIX = "sha256:"  # see content_label
+
+
+class UploadManifest:
+    """Append-only JSONL record of finished uploads, keyed by content hash, so an interrupted run can resume."""
+
+    def __init__(self, manifest_path):
+        self.path = Path(manifest_path)
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as manifest:
+                for line in manifest:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a run killed mid-write leaves at most one torn line
+                    self.entries[entry["sha256"]] = entry
+
+    def get(self, sha256):
+        return self.entries.get(sha256)
+
+    def record(self, entry):
+        self.entries[entry["sha256"]] = entry
+        with open(self.path, 'a', encoding='utf-8') as manifest:
+            manifest.write(json.dumps(entry) + "\n")
+
+
+class DocumentIterator:
+    """Async iterator over every document in the library, fetching pages ahead of the consumer.
+
+    Up to `prefetch` pages beyond the current one are requested concurrently. `count` is the number of
+    documents yielded so far and `total` is set once the last page has arrived; `failed` is set instead
+    when a page request errors, since the listing then ended early. Leaving an `async with`
+    block early (or calling `aclose`) cancels any outstanding page requests.
+    """
+
+    def __init__(self, api, page_size=100, prefetch=4, offset=0):
+        self.api = api
+        self.page_size = page_size
+        self.prefetch = max(prefetch, 0)
+        self.count = 0
+        self.total = None
+        self.failed = False
+        self._next_offset = offset
+        self._pending = deque()
+        self._page = deque()
+        self._exhausted = False
+
+    def _schedule(self):
+        while len(self._pending) <= self.prefetch:
+            task = asyncio.ensure_future(self.api.retrieve_documents_list(offset=self._next_offset, limit=self.page_size))
+            self._pending.append(task)
+            self._next_offset += self.page_size
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._page:
+            if self._exhausted:
+                raise StopAsyncIteration
+            self._schedule()
+            try:
+                page = await self._pending.popleft()
+            except BaseException:
+                await self.aclose()
+                raise
+            if not page or len(page) < self.page_size:
+                self._exhausted = True
+                self.failed = page is None
+                await self.aclose()
+            self._page.extend(page or [])
+            if self._exhausted and not self.failed:
+                self.total = self.count + len(self._page)
+        self.count += 1
+        return self._page.popleft()
+
+    async def aclose(self):
+        for task in self._pending:
+            task.cancel()
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        self._pending.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+
+def content_label(sha256):
+    """Label bulk_upload_folder puts on each upload, so the library can later be checked for that content."""
+    return CONTENT_LABEL_PREFIX + sha256
+
+
+def guess_content_type(filename):
+    """MIME type for an upload from its file name; unknown types go up as text/plain, as they always have."""
+    return mimetypes.guess_type(str(filename))[0] or "text/plain"
+
+
+async def multipart_stream(boundary, data_fields, filename, content_type, chunks):
+    """A multipart/form-data upload body, encoded like httpx encodes data= and files=, yielded as `chunks` arrive."""
+    for name, value in data_fields.items():
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                   f'{"" if item is None else item}\r\n').encode('utf-8')
+    quoted = str(filename).replace('"', '%22')
+    yield (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{quoted}"\r\n'
+           f'Content-Type: {content_type}\r\n\r\n').encode('utf-8')
+    async for chunk in chunks:
+        yield bytes(chunk)
+    yield f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+
+def document_matches(doc, label=None, path_prefix=None, status=None, file_ids=None):
+    """True when `doc` passes every given filter, with the same semantics as LibraryIndex.find."""
+    return ((label is None or label in (doc.get('labels') or []))
+            and (path_prefix is None or (doc.get('path') or '').startswith(path_prefix))
+            and (status is None or doc.get('status') == status)
+            and (file_ids is None or doc.get('fileId') in file_ids))
+
 
 class AI21LibraryAPI:
     BASE_URL = "https://api.ai21.com/studio/v1/library/files"
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url=None, http2=True, max_connections=20, max_keepalive_connections=10,
+                 keepalive_expiry=30.0, timeout=30.0, connect_timeout=10.0):
         self.headers = {"Authorization": f"Bearer {api_key}"}
         self.console = Console()
+        if base_url:
+            self.BASE_URL = base_url
+        # HTTP/2 needs the optional `h2` package; without it we still get pooled HTTP/1.1 keep-alive.
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._client = None
 
-    async def upload_document(self, file_path, path=None, labels=None, public_url=None):
-        async with httpx.AsyncClient() as client:
-            try:
-                with open(file_path, 'rb') as file:
-                    files = {"file": (file_path, file, "text/plain")}
-                    data = {"path": path, "labels": labels, "publicUrl": public_url}
-                    response = await client.post(self.BASE_URL, headers=self.headers, data=data, files=files)
-                return response.json()
-            except Exception as e:
-                self.console.log(f"Error during upload: {e}")
-                return None
+    @property
+    def client(self):
+        """The shared connection pool, created on first use and reused by every call."""
+        if self._client is None or self._client.is_closed:
+            self._client = async_client("library-files", http2=self.http2, limits=self.limits, headers=self.headers,
+                                        timeout=self.timeout)
+        return self._client
 
-    async def retrieve_documents_list(self, offset=0, limit=100):
-        async with httpx.AsyncClient() as client:
-            params = {"offset": offset, "limit": limit}
-            response = await client.get(self.BASE_URL, headers=self.headers, params=params)
-            if response.status_code == 200:
-                return response.json()
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        _ = self.client
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def upload_document(self, file_path, path=None, labels=None, public_url=None, content_type=None):
+        try:
+            with open(file_path, 'rb') as file:
+                return await self.upload_bytes(file, str(file_path), path=path, labels=labels, public_url=public_url,
+                                               content_type=content_type)
+        except OSError as e:
+            self.console.log(f"Error during upload: {e}")
+            return None
+
+    async def upload_bytes(self, data, filename, path=None, labels=None, public_url=None, content_type=None):
+        """Upload content that is already in memory, or still being produced, as a document named `filename`.
+
+        `data` may be bytes, a binary file-like object such as io.BytesIO, or an async iterable of byte
+        chunks. An async iterable is streamed as it is produced, so it cannot be replayed: it is sent with
+        NEVER_RETRY, and if that request is throttled or fails the upload fails on the first error.
+        `content_type` defaults to a guess from `filename`.
+        """
+        content_type = content_type or guess_content_type(filename)
+        data_fields = {"path": path, "labels": labels, "publicUrl": public_url}
+        try:
+            if hasattr(data, '__aiter__'):
+                boundary = os.urandom(16).hex()
+                response = await self.client.post(
+                    self.BASE_URL, content=multipart_stream(boundary, data_fields, filename, content_type, data),
+                    headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}, extensions=NEVER_RETRY)
             else:
-                self.console.log(f"Error retrieving document list: {response.text}")
-                return None
+                if isinstance(data, (bytearray, memoryview)):
+                    data = bytes(data)
+                response = await self.client.post(self.BASE_URL, data=data_fields,
+                                                  files={"file": (filename, data, content_type)})
+            return response.json()
+        except Exception as e:
+            self.console.log(f"Error during upload: {e}")
+            return None
 
-    async def retrieve_document_by_id(self, file_id):
-        async with httpx.AsyncClient() as client:
-            url = f"{self.BASE_URL}/{file_id}"
-            response = await client.get(url, headers=self.headers)
+    async def upload_text(self, text, filename, path=None, labels=None, public_url=None):
+        """Upload extracted or generated text without saving it to a file first."""
+        return await self.upload_bytes(text.encode('utf-8'), filename, path=path, labels=labels, public_url=public_url,
+                                       content_type="text/plain; charset=utf-8")
+
+    async def retrieve_documents_list(self, offset=0, limit=100):
+        params = {"offset": offset, "limit": limit}
+        response = await self.client.get(self.BASE_URL, params=params)
+        if response.status_code == 200:
             return response.json()
+        else:
+            self.console.log(f"Error retrieving document list: {response.text}")
+            return None
+
+    async def retrieve_document_by_id(self, file_id):
+        url = f"{self.BASE_URL}/{file_id}"
+        response = await self.client.get(url)
+        return response.json()
 
     async def update_document(self, file_id, labels=None, public_url=None):
-        async with httpx.AsyncClient() as client:
-            url = f"{self.BASE_URL}/{file_id}"
-            data = {"labels": labels, "publicUrl": public_url}
-            response = await client.put(url, headers=self.headers, json=data)
-            if response.status_code == 200:
-                return "Update successful"
-            else:
-                self.console.log(f"Error updating document: {response.text}")
-                return None
+        url = f"{self.BASE_URL}/{file_id}"
+        data = {"labels": labels, "publicUrl": public_url}
+        response = await self.client.put(url, json=data)
+        if response.status_code == 200:
+            return "Update successful"
+        else:
+            self.console.log(f"Error updating document: {response.text}")
+            return None
 
     async def delete_document(self, file_id):
-        async with httpx.AsyncClient() as client:
-            url = f"{self.BASE_URL}/{file_id}"
-            response = await client.delete(url, headers=self.headers)
-            return response.status_code
+        url = f"{self.BASE_URL}/{file_id}"
+        response = await self.client.delete(url)
+        return response.status_code
 
+    def iter_documents(self, page_size=100, prefetch=4, offset=0):
+        """Iterate over the whole library: `async for doc in api.iter_documents(): ...`"""
+        return DocumentIterator(self, page_size=page_size, prefetch=prefetch, offset=offset)
 
-def print_document_list(documents):
-    table = Table(show_header=True, header_style="bold magenta")
-    table.add_column("File ID", style="dim")
-    table.add_column("Name")
-    table.add_column("Path")
-    table.add_column("File Type")
-    table.add_column("Size (Bytes)")
-    table.add_column("Labels")
-    table.add_column("Public URL")
-    table.add_column("Created By")
-    table.add_column("Creation Date")
-    table.add_column("Last Updated")
-    table.add_column("Status")
+    async def _library_content_hashes(self):
+        """SHA-256 of every library document that carries a content_label, or None when the listing failed
+        part way through."""
+        async with self.iter_documents() as documents:
+            hashes = {label[len(CONTENT_LABEL_PREFIX):] async for doc in documents for label in doc.get('labels') or []
+                      if label.startswith(CONTENT_LABEL_PREFIX)}
+        return None if documents.failed else hashes
 
-    for doc in documents:
-        labels = ", ".join(doc['labels']) if doc['labels'] else "None"
-        table.add_row(doc['fileId'], doc['name'], doc.get('path', 'None'), doc['fileType'], str(doc['sizeBytes']), labels,
-                      doc.get('publicUrl', 'None'), doc['createdBy'], doc['creationDate'], doc['lastUpdated'], doc['status'])
+    async def bulk_upload_folder(self, folder, pattern="*", path=None, labels=None, concurrency=8,
+                                 manifest_path=None, check_library=True):
+        """Upload every file under `folder` matching `pattern` with at most `concurrency` uploads in flight.
+
+        Files are identified by SHA-256 of their contents. A file is skipped when the manifest already
+        records that hash, when another file in this run has the same contents, or (with `check_library`)
+        when a library document is labelled with that hash: every upload gets a content_label, so this also
+        catches uploads from other machines. Name and size are not compared, since a changed file can keep
+        both. If the library cannot be listed completely, only the manifest and this run are checked. Each
+        finished upload is appended to the manifest straight away, so rerunning after an interruption picks
+        up where it stopped. Returns a dict with "uploaded", "skipped" and "failed" lists.
+        """
+        folder = Path(folder)
+        manifest = UploadManifest(manifest_path or folder / MANIFEST_NAME)
+        files = sorted(p for p in folder.rglob(pattern) if p.is_file() and p.name != manifest.path.name)
+        library = await self._library_content_hashes() if check_library else set()
+        if library is None:
+            self.console.log("Could not list the whole library; skipping only files recorded in the manifest.")
+            library = set()
+        results = {"uploaded": [], "skipped": [], "failed": []}
+        seen = set()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def upload_one(file_path):
+            async with semaphore:
+                try:
+                    sha256 = await asyncio.to_thread(file_sha256, file_path)
+                    size = file_path.stat().st_size
+                except OSError as e:  # unreadable or vanished: fail this file, not the batch
+                    results["failed"].append(str(file_path))
+                    self.console.log(f"Upload failed for {file_path}: {e}")
+                    return
+                if sha256 in seen or manifest.get(sha256) or sha256 in library:
+                    results["skipped"].append(str(file_path))
+                    return
+                seen.add(sha256)
+                response = await self.upload_document(str(file_path), path=path,
+                                                      labels=[*(labels or []), content_label(sha256)])
+                file_id = response.get("fileId") if isinstance(response, dict) else response
+                if not file_id:
+                    seen.discard(sha256)
+                    results["failed"].append(str(file_path))
+                    self.console.log(f"Upload failed for {file_path}: {response}")
+                    return
+                manifest.record({"sha256": sha256, "path": str(file_path), "sizeBytes": size, "fileId": file_id})
+                results["uploaded"].append(str(file_path))
+
+        await asyncio.gather(*(upload_one(file_path) for file_path in files))
+        return results
+
+    async def upload_pdf_parts(self, source, ranges=None, outline_level=1, path=None, labels=None, concurrency=4):
+        """Split a PDF and upload every part straight from memory: no part is written to or read from disk.
+
+        Parts are the given 1-based (start, end) page ranges, or the outline entries at `outline_level`
+        when `ranges` is None, named as split_pdf_ranges/split_pdf_by_outline would name the files. Each
+        part is rendered into a buffer on a worker thread while earlier parts upload; at most
+        `concurrency` buffers exist at once. Returns a dict with "uploaded" and "failed" part names; parts
+        whose range is outside the document, or that fail to render, are failed without being uploaded.
+        """
+        import pdfSplitter  # PyPDF2 is only needed when splitting
+        not_rendered = []
+        parts = pdfSplitter.iter_part_buffers(source, ranges, outline_level, failed=not_rendered)
+        results = {"uploaded": [], "failed": []}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def upload_part(name, buffer):
+            try:
+                response = await self.upload_bytes(buffer, name, path=path, labels=labels)
+            finally:
+                semaphore.release()
+            file_id = response.get("fileId") if isinstance(response, dict) else response
+            results["uploaded" if file_id else "failed"].append(name)
 
+        tasks = []
+        try:
+            while True:
+                await semaphore.acquire()  # rendering waits here while `concurrency` parts are in flight
+                part = await asyncio.to_thread(next, parts, None)
+                if part is None:
+                    break
+                tasks.append(asyncio.ensure_future(upload_part(*part)))
+            await asyncio.gather(*tasks)
+        finally:  # rendering failed or we were cancelled: don't leave uploads running unowned
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        results["failed"] += [name for name, _ in not_rendered]
+        return results
+
+    async def select_documents(self, label=None, path_prefix=None, status=None, file_ids=None, index=None,
+                               all_documents=False):
+        """Documents matching every given filter: the preview set for bulk_update and bulk_delete.
+
+        With a LibraryIndex the selection is a local query (as fresh as the last sync); otherwise the
+        library listing is walked. An ID list on its own is resolved with one lookup per ID. Selecting with
+        no filter at all would hand the whole library to a bulk operation, so it raises ValueError unless
+        `all_documents` says that is meant.
+        """
+        file_ids = set(file_ids) if file_ids else None
+        if label is None and path_prefix is None and status is None and file_ids is None and not all_documents:
+            raise ValueError("no filter given; pass all_documents=True to select every document")
+        if index is not None:
+            if label is None and path_prefix is None and status is None and file_ids is not None:
+                return [doc for doc in map(index.get, sorted(file_ids)) if doc is not None]
+            return [doc for doc in index.find(label=label, path_prefix=path_prefix, status=status)
+                    if document_matches(doc, file_ids=file_ids)]
+        if label is None and path_prefix is None and status is None and file_ids is not None:
+            documents = await asyncio.gather(*(self.retrieve_document_by_id(file_id) for file_id in sorted(file_ids)),
+                                             return_exceptions=True)
+            return [doc for doc in documents if isinstance(doc, dict) and doc.get('fileId')]
+        async with self.iter_documents() as documents:
+            return [doc async for doc in documents if document_matches(doc, label, path_prefix, status, file_ids)]
+
+    async def _bulk_apply(self, documents, operation, concurrency):
+        """Run `operation(doc)` for every document with at most `concurrency` in flight.
+        A falsy result or an exception marks that document failed; the rest carry on."""
+        results = {"succeeded": [], "failed": []}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def apply_one(doc):
+            item = {"fileId": doc.get('fileId'), "name": doc.get('name')}
+            async with semaphore:
+                try:
+                    outcome = await operation(doc)
+                except Exception as e:  # one bad document must not stop the batch
+                    outcome, item["error"] = None, str(e) or type(e).__name__
+            if outcome:
+                results["succeeded"].append(item)
+            else:
+                item.setdefault("error", "request failed")
+                results["failed"].append(item)
+
+        await asyncio.gather(*(apply_one(doc) for doc in documents))
+        return results
+
+    async def bulk_update(self, documents, labels=None, add_labels=None, remove_labels=None, public_url=None,
+                          concurrency=8, index=None):
+        """Update many documents, e.g. the result of select_documents, with bounded concurrency.
+
+        `labels` replaces each document's labels; otherwise `add_labels`/`remove_labels` are applied to its
+        current labels, so documents keep labels the update doesn't mention. Successful updates are mirrored
+        into `index` when one is given. Returns a dict with per-document "succeeded" and "failed" lists.
+        """
+        updated = []
+
+        async def update_one(doc):
+            new_labels = labels
+            if new_labels is None:
+                new_labels = [name for name in doc.get('labels') or [] if name not in (remove_labels or [])]
+                new_labels += [name for name in add_labels or [] if name not in new_labels]
+            status = await self.update_document(doc['fileId'], labels=new_labels, public_url=public_url)
+            if status:
+                updated.append({**doc, "labels": new_labels, "publicUrl": public_url or doc.get('publicUrl')})
+            return status
+
+        results = await self._bulk_apply(documents, update_one, concurrency)
+        if index is not None:
+            index.apply_changes(updated=updated)
+        return results
+
+    async def bulk_delete(self, documents, concurrency=8, index=None):
+        """Delete many documents with bounded concurrency; returns per-document "succeeded" and "failed" lists."""
+        async def delete_one(doc):
+            return await self.delete_document(doc['fileId']) in (200, 204)
+
+        results = await self._bulk_apply(documents, delete_one, concurrency)
+        if index is not None:
+            index.apply_changes(removed=[item["fileId"] for item in results["succeeded"]])
+        return results
+
+
+DOCUMENT_COLUMNS = [("File ID", "fileId"), ("Name", "name"), ("Path", "path"), ("File Type", "fileType"),
+                    ("Size (Bytes)", "sizeBytes"), ("Labels", "labels"), ("Public URL", "publicUrl"),
+                    ("Created By", "createdBy"), ("Creation Date", "creationDate"), ("Last Updated", "lastUpdated"),
+                    ("Status", "status")]
+
+
+def document_row(doc):
+    """One document as table cells, in DOCUMENT_COLUMNS order."""
+    row = []
+    for _, key in DOCUMENT_COLUMNS:
+        value = doc.get(key, 'None')
+        if key == "labels":
+            value = ", ".join(value) if value and value != 'None' else "None"
+        row.append(value if value is None else str(value))
+    return row
+
+
+def document_table(caption=None):
+    table = Table(show_header=True, header_style="bold magenta", caption=caption)
+    for header, _ in DOCUMENT_COLUMNS:
+        table.add_column(header, style="dim" if header == "File ID" else None)
+    return table
+
+
+def print_document_list(documents):
+    table = document_table()
+    for doc in documents:
+        table.add_row(*document_row(doc))
     console.print(table)
 
 
+async def print_documents_streaming(documents, page_size=50, pager=False):
+    """Render an async stream of documents (e.g. iter_documents()) one table of `page_size` rows at a time.
+
+    Each table is printed as soon as its rows have arrived, so output starts with the first listing page
+    and memory holds one table, whatever the library size. With `pager`, waits for Enter after every
+    table; "q" stops early. Returns the number of documents shown.
+    """
+    shown, table = 0, None
+    async for doc in documents:
+        if table is None:
+            table = document_table(caption=f"Documents {shown + 1}-{shown + page_size}")
+        table.add_row(*document_row(doc))
+        shown += 1
+        if shown % page_size == 0:
+            console.print(table)
+            table = None
+            if pager and (await asyncio.to_thread(input, "Enter for the next page, q to stop: ")).lower() == 'q':
+                return shown
+    if table is not None:
+        table.caption = f"Documents {shown - shown % page_size + 1}-{shown}"
+        console.print(table)
+    return shown
+
+
+def csv_cell(value):
+    if value is None:
+        return ""
+    return ", ".join(value) if isinstance(value, list) else value
+
+
+def export_format(path):
+    return "csv" if str(path).lower().endswith(".csv") else "jsonl"
+
+
+async def export_documents(documents, output, fmt="jsonl"):
+    """Write an async stream of documents to the text stream `output` as CSV or JSON lines, row by row.
+
+    Memory use doesn't grow with the library: nothing is kept once its row is written. CSV has a header
+    row and the DOCUMENT_COLUMNS columns, with labels joined by commas; JSON lines keep those fields with
+    their original types. Returns the number of documents written.
+    """
+    writer = csv.writer(output) if fmt == "csv" else None
+    if writer:
+        writer.writerow([header for header, _ in DOCUMENT_COLUMNS])
+    written = 0
+    async for doc in documents:
+        if writer:
+            writer.writerow([csv_cell(doc.get(key)) for _, key in DOCUMENT_COLUMNS])
+        else:
+            output.write(json.dumps({key: doc.get(key) for _, key in DOCUMENT_COLUMNS}) + "\n")
+        written += 1
+    output.flush()
+    return written
+
+
 def get_api_key(config_path):
-    config = ConfigParser()
-    config.read(config_path)
-    return config['DEFAULT']['API_KEY']
+    """The library API key; raises KeyError when none is configured, rather than sending "Bearer " requests."""
+    return appConfig.require_api_key(config_path, 'DEFAULT', 'API_KEY')
 
 
 def user_choice():
-    choices = ["Upload Document", "Retrieve Document List", "Retrieve Document by ID", "Update Document", "Delete Document"]
+    choices = ["Upload Document", "Retrieve Document List", "Retrieve Document by ID", "Update Document", "Delete Document",
+               "Bulk Upload Folder", "Sync Local Index", "Search Local Index", "Bulk Update by Filter",
+               "Bulk Delete by Filter", "Split PDF and Upload Parts", "Export Document List"]
     for i, choice in enumerate(choices):
         print(f"{i}. {choice}")
     choice = input("Choose an action by number: ")
     return int(choice) if choice.isdigit() and int(choice) < len(choices) else None
 
 
+def prompt_filters():
+    label = input("Filter by label (optional): ")
+    path_prefix = input("Filter by path prefix (optional): ")
+    status = input("Filter by status (optional): ")
+    file_ids = input("Filter by file IDs separated by commas (optional): ")
+    return {"label": label or None, "path_prefix": path_prefix or None, "status": status or None,
+            "file_ids": file_ids.split(',') if file_ids else None}
+
+
+def print_bulk_results(results):
+    console.print(f"Succeeded: {len(results['succeeded'])}, failed: {len(results['failed'])}")
+    for item in results["failed"]:
+        console.print(f"  {item['fileId']}\t{item['name']}\t{item['error']}")
+
+
 CONFIGFILE = 'config/config.ini'
 
 
@@ -103,54 +550,136 @@ async def main():
     try:
         config_path = CONFIGFILE
         api_key = get_api_key(config_path)
-        ai21_api = AI21LibraryAPI(api_key)
-
-        action = user_choice()
-        if action is None:
-            print("Invalid choice. Exiting.")
-            return
-        print(f"Selected action: {action}")
-
-        if action == 0:
-            file_to_upload = input("Enter the full path of the file to upload: ")
-            if file_to_upload:
-                path = input("Enter the path (optional): ")
-                labels_str = input("Enter labels separated by commas (optional): ")
-                labels = labels_str.split(',') if labels_str else None
-                public_url = input("Enter the public URL (optional): ")
-                upload_response = await ai21_api.upload_document(file_to_upload, path=path, labels=labels, public_url=public_url)
-                print(upload_response)
-
-        elif action == 1:
-            offset = input("Enter the offset (optional, default 0): ")
-            limit = input("Enter the limit (optional, default 100): ")
-            documents_list = await ai21_api.retrieve_documents_list(offset=int(offset) if offset else 0, limit=int(limit) if limit else 100)
-            if documents_list is not None:
+        async with AI21LibraryAPI(api_key) as ai21_api:
+            action = user_choice()
+            if action is None:
+                print("Invalid choice. Exiting.")
+                return
+            print(f"Selected action: {action}")
+
+            if action == 0:
+                file_to_upload = input("Enter the full path of the file to upload: ")
+                if file_to_upload:
+                    path = input("Enter the path (optional): ")
+                    labels_str = input("Enter labels separated by commas (optional): ")
+                    labels = labels_str.split(',') if labels_str else None
+                    public_url = input("Enter the public URL (optional): ")
+                    upload_response = await ai21_api.upload_document(file_to_upload, path=path, labels=labels, public_url=public_url)
+                    print(upload_response)
+
+            elif action == 1:
+                offset = input("Enter the offset (optional, default 0): ")
+                limit = input("Enter the limit (optional, default 100, 'all' for the whole library): ")
+                if limit.lower() == 'all':  # page through the table as the listing arrives
+                    async with ai21_api.iter_documents(offset=int(offset) if offset else 0) as documents:
+                        shown = await print_documents_streaming(documents, pager=True)
+                    console.print(f"Documents shown: {shown}")
+                    documents_list = None
+                else:
+                    documents_list = await ai21_api.retrieve_documents_list(offset=int(offset) if offset else 0, limit=int(limit) if limit else 100)
+                if documents_list is not None:
+                    print_document_list(documents_list)
+                    # Print FileID and Name
+                    print("FileID\t\tName")
+                    for doc in documents_list:
+                        print(f"{doc['fileId']}\t{doc['name']}")
+            elif action == 2:
+                file_id = input("Enter the file ID to retrieve: ")
+                if file_id:
+                    document_details = await ai21_api.retrieve_document_by_id(file_id)
+                    console.print(document_details)
+
+            elif action == 3:
+                file_id = input("Enter the file ID to update: ")
+                if file_id:
+                    labels_str = input("Enter updated labels separated by commas (optional): ")
+                    labels = labels_str.split(',') if labels_str else None
+                    public_url = input("Enter the updated public URL (optional): ")
+                    update_status = await ai21_api.update_document(file_id, labels=labels, public_url=public_url)
+                    console.print(f"Update status: {update_status}")
+
+            elif action == 4:
+                file_id = input("Enter the file ID to delete: ")
+                if file_id:
+                    delete_status = await ai21_api.delete_document(file_id)
+                    console.print(f"Delete status: {delete_status}")
+
+            elif action == 5:
+                folder = input("Enter the folder to upload: ")
+                if folder:
+                    pattern = input("Enter a file pattern (optional, default *): ") or "*"
+                    path = input("Enter the path (optional): ")
+                    labels_str = input("Enter labels separated by commas (optional): ")
+                    labels = labels_str.split(',') if labels_str else None
+                    concurrency = input("Enter the number of parallel uploads (optional, default 8): ")
+                    results = await ai21_api.bulk_upload_folder(folder, pattern=pattern, path=path or None, labels=labels,
+                                                                concurrency=int(concurrency) if concurrency else 8)
+                    console.print(f"Uploaded: {len(results['uploaded'])}, skipped: {len(results['skipped'])}, "
+                                  f"failed: {len(results['failed'])}")
+
+            elif action == 6:
+                with LibraryIndex() as index:
+                    stats = await index.sync(ai21_api)
+                console.print(f"Index synced: {stats}")
+
+            elif action == 7:
+                label = input("Enter a label (optional): ")
+                path_prefix = input("Enter a path prefix (optional): ")
+                status = input("Enter a status (optional): ")
+                with LibraryIndex() as index:
+                    documents_list = index.find(label=label or None, path_prefix=path_prefix or None, status=status or None)
+                print_document_list(documents_list)
+
+            elif action in (8, 9):
+                filters = prompt_filters()
+                if not any(filters.values()):
+                    if input("No filter given: type ALL to select every document in the library: ") != "ALL":
+                        return
+                    filters["all_documents"] = True
+                documents_list = await ai21_api.select_documents(**filters)
                 print_document_list(documents_list)
-                # Print FileID and Name
-                print("FileID\t\tName")
-                for doc in documents_list:
-                    print(f"{doc['fileId']}\t{doc['name']}")
-        elif action == 2:
-            file_id = input("Enter the file ID to retrieve: ")
-            if file_id:
-                document_details = await ai21_api.retrieve_document_by_id(file_id)
-                console.print(document_details)
-
-        elif action == 3:
-            file_id = input("Enter the file ID to update: ")
-            if file_id:
-                labels_str = input("Enter updated labels separated by commas (optional): ")
-                labels = labels_str.split(',') if labels_str else None
-                public_url = input("Enter the updated public URL (optional): ")
-                update_status = await ai21_api.update_document(file_id, labels=labels, public_url=public_url)
-                console.print(f"Update status: {update_status}")
-
-        elif action == 4:
-            file_id = input("Enter the file ID to delete: ")
-            if file_id:
-                delete_status = await ai21_api.delete_document(file_id)
-                console.print(f"Delete status: {delete_status}")
+                if not documents_list:
+                    console.print("No documents match.")
+                    return
+                if action == 8:
+                    labels_str = input("Enter labels to set, replacing current ones (optional): ")
+                    add_str = input("Enter labels to add (optional): ")
+                    remove_str = input("Enter labels to remove (optional): ")
+                    public_url = input("Enter the new public URL (optional): ")
+                if input(f"Apply to {len(documents_list)} documents? (y/N): ").lower() != 'y':
+                    return
+                with LibraryIndex() as index:
+                    if action == 8:
+                        results = await ai21_api.bulk_update(
+                            documents_list, labels=labels_str.split(',') if labels_str else None,
+                            add_labels=add_str.split(',') if add_str else None,
+                            remove_labels=remove_str.split(',') if remove_str else None,
+                            public_url=public_url or None, index=index)
+                    else:
+                        results = await ai21_api.bulk_delete(documents_list, index=index)
+                print_bulk_results(results)
+
+            elif action == 10:
+                source = input("Enter the PDF to split and upload: ")
+                if source:
+                    ranges_str = input("Enter page ranges, e.g. 1-3, 4-5 (optional, default: top-level outline): ")
+                    path = input("Enter the path (optional): ")
+                    labels_str = input("Enter labels separated by commas (optional): ")
+                    ranges = None
+                    if ranges_str:
+                        from pdfSplitter import parse_ranges
+                        ranges = parse_ranges(ranges_str)
+                    results = await ai21_api.upload_pdf_parts(source, ranges, path=path or None,
+                                                              labels=labels_str.split(',') if labels_str else None)
+                    console.print(f"Uploaded: {len(results['uploaded'])}, failed: {len(results['failed'])}")
+
+            elif action == 11:
+                output_path = input("Enter the export file (.csv or .jsonl): ")
+                if output_path:
+                    with open(output_path, 'w', encoding='utf-8', newline='') as output:
+                        async with ai21_api.iter_documents() as documents:
+                            written = await export_documents(documents, output, export_format(output_path))
+                    console.print(f"Exported {written} documents to {output_path}")
 
     except Exception as e:
         console.print(f"An error occurred: {e}")
@@ -0,0 +1,48 @@
+import configparser
+import os
+from functools import lru_cache
+from typing import Optional
+
+API_KEY_ENV = "AI21_API_KEY"
+# The scripts grew up reading the key from different files and spellings; all of them are accepted.
+KEY_LOCATIONS = (("KEY", "API_KEY"), ("KEY", "APIKEY"), ("DEFAULT", "API_KEY"))
+
+_config_override: Optional[str] = None
+
+
+@lru_cache(maxsize=None)
+def read_config(path: str) -> configparser.ConfigParser:
+    """Parse a config file once per process; later lookups reuse the parsed result."""
+    config = configparser.ConfigParser()
+    config.read(path)
+    return config
+
+
+def use_config(path: Optional[str]) -> None:
+    """Make every API key lookup read `path` instead of each script's default file (None restores the defaults)."""
+    global _config_override  # pylint: disable=global-statement
+    _config_override = path
+
+
+def api_key(path: str, section: str, option: str) -> str:
+    """The API key stored at `section`/`option` of `path`, or "" when there is none.
+
+    AI21_API_KEY in the environment takes precedence, and a file given to use_config() replaces `path`;
+    if the requested spelling is missing, the other known ones are tried.
+    """
+    if os.environ.get(API_KEY_ENV):
+        return os.environ[API_KEY_ENV]
+    config = read_config(_config_override or path)
+    for key_section, key_option in ((section, option),) + KEY_LOCATIONS:
+        value = config.get(key_section, key_option, fallback="")
+        if value:
+            return value
+    return ""
+
+
+def require_api_key(path: str, section: str, option: str) -> str:
+    """Like api_key, but raises KeyError, saying where the key was looked for, when there is none."""
+    key = api_key(path, section, option)
+    if not key:
+        raise KeyError(f"API key not found: set {API_KEY_ENV} or {section}/{option} in {_config_override or path}")
+    return key
@@ -0,0 +1,728 @@
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List
+
+import httpx
+from rich.console import Console
+from rich.table import Table
+
+from apiController import AI21LibraryAPI
+from metrics import metrics
+from rateLimiter import get_limiter, unthrottle
+from responseCache import ResponseCache, set_response_cache
+from stubServer import StubServer
+import contextualAPI
+import pdfSplitter
+import summarizeAPI
+
+console = Console()
+
+SAMPLE_LINE = "The quick brown fox jumps over the lazy dog while the quarterly report is reviewed."
+
+
+def make_sample_pdf(path: Path, pages: int, lines_per_page: int = 40, chapter_every: int = 0,
+                    revised_pages: Iterable[int] = (), sections: int = 0) -> Path:
+    """Write a PDF with `pages` pages of real text content (not blank pages), for extraction benchmarks.
+    With chapter_every, an outline entry "Chapter N" is added every that many pages, with `sections`
+    nested "Section N.M" entries spread over its pages; pages listed in revised_pages (0-based) get
+    different text, to simulate an edited version of the same document."""
+    import PyPDF2
+    from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = PyPDF2.PdfWriter()
+    font = DictionaryObject({NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+                             NameObject("/BaseFont"): NameObject("/Helvetica")})
+    font_ref = writer._add_object(font)
+    for number in range(pages):
+        page = PyPDF2.PageObject.create_blank_page(width=612, height=792)
+        label = "Revised page" if number in revised_pages else "Page"
+        lines = [f"({SAMPLE_LINE} {label} {number + 1} line {line}) Tj 0 -16 Td" for line in range(lines_per_page)]
+        content = DecodedStreamObject()
+        content.set_data(("BT /F1 10 Tf 36 756 Td " + " ".join(lines) + " ET").encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref})})
+        writer.add_page(page)
+    if chapter_every:
+        for number, first_page in enumerate(range(0, pages, chapter_every), start=1):
+            chapter = writer.add_outline_item(f"Chapter {number}", first_page)
+            span = min(chapter_every, pages - first_page)
+            for section in range(sections):
+                writer.add_outline_item(f"Section {number}.{section + 1}", first_page + section * span // sections,
+                                        parent=chapter)
+    with open(path, "wb") as output:
+        writer.write(output)
+    return path
+
+
+def print_results(title: str, rows, unit: str = "Requests", rate: str = "Req/s") -> None:
+    table = Table(title=title, show_header=True, header_style="bold magenta")
+    table.add_column("Mode", no_wrap=True)
+    table.add_column(unit)
+    table.add_column("Seconds")
+    table.add_column(rate)
+    for mode, count, elapsed in rows:
+        table.add_row(mode, str(count), f"{elapsed:.2f}", f"{count / elapsed:.1f}")
+    console.print(table)
+
+
+def print_latency(title: str, rows) -> None:
+    """rows: (operation, per-call latencies in seconds, failed calls, retries, wall seconds)."""
+    table = Table(title=title, show_header=True, header_style="bold magenta")
+    table.add_column("Operation", no_wrap=True)
+    for column in ("Calls", "Failed", "Retries", "Req/s", "p50 ms", "p95 ms", "p99 ms"):
+        table.add_column(column)
+    for operation, latencies, failed, retries, elapsed in rows:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+        table.add_row(operation, str(len(latencies)), str(failed), str(retries), f"{len(latencies) / elapsed:.1f}",
+                      f"{cuts[49] * 1000:.1f}", f"{cuts[94] * 1000:.1f}", f"{cuts[98] * 1000:.1f}")
+    console.print(table)
+
+
+async def _measure_async(count: int, concurrency: int, call):
+    """Run call(i) for i in range(count) with bounded concurrency; returns (latencies, failed, wall seconds)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failed = [], 0
+
+    async def one(i):
+        nonlocal failed
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if await call(i) is None:
+                    failed += 1
+            except Exception:  # pylint: disable=broad-except
+                failed += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return latencies, failed, time.perf_counter() - started
+
+
+def _measure_threads(count: int, concurrency: int, call):
+    """Blocking counterpart of _measure_async for the synchronous API functions; "" counts as a failure."""
+    def one(i):
+        started = time.perf_counter()
+        try:
+            ok = bool(call(i))
+        except Exception:  # pylint: disable=broad-except
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    return [latency for latency, _ in results], sum(1 for _, ok in results if not ok), time.perf_counter() - started
+
+
+def _retries(endpoint: str) -> int:
+    limiter = get_limiter(endpoint)
+    retries, limiter.retries = limiter.retries, 0
+    return retries
+
+
+def _point_apis_at(stub: StubServer) -> None:
+    summarizeAPI.summarizeAPI.API_URL = stub.summarize_url
+    summarizeAPI.contextualAPI.API_URL = stub.answer_url
+    contextualAPI.contextualAPI.API_URL = stub.library_answer_url
+    for api in (summarizeAPI.summarizeAPI, summarizeAPI.contextualAPI, contextualAPI.contextualAPI):
+        api.get_api_key = staticmethod(lambda: "stub")
+    set_response_cache(ResponseCache(":memory:"))  # every request below is unique, so this only measures overhead
+    summarizeAPI.console.quiet = contextualAPI.console.quiet = True
+
+
+async def _uploaded_file_id(api: AI21LibraryAPI, file_path: Path, labels: List[str]):
+    """The new document's ID; None when the response carries none (an error body), so _measure_async counts it failed."""
+    response = await api.upload_document(str(file_path), labels=labels)
+    return response.get("fileId") if isinstance(response, dict) else response or None
+
+
+async def _document_found(api: AI21LibraryAPI, file_id: str):
+    """retrieve_document_by_id returns whatever JSON came back; None unless it is the document itself."""
+    doc = await api.retrieve_document_by_id(file_id)
+    return doc if isinstance(doc, dict) and doc.get("fileId") else None
+
+
+async def _delete_succeeded(api: AI21LibraryAPI, file_id: str):
+    """delete_document returns the HTTP status; None for anything but 2xx, so _measure_async counts it failed."""
+    status = await api.delete_document(file_id)
+    return status if 200 <= status < 300 else None
+
+
+async def bench_api(calls: int, concurrency: int, latency: float, jitter: float, error_rate: float) -> None:
+    """Throughput and latency percentiles for every API operation against the stub server."""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubServer(documents=calls, latency=latency, jitter=jitter, error_rate=error_rate) as stub:
+        _point_apis_at(stub)
+        upload_path = Path(tmp) / "upload.txt"
+        upload_path.write_text(SAMPLE_LINE * 50, encoding="utf-8")
+        file_ids = list(stub.httpd.documents)
+        async with AI21LibraryAPI("stub", base_url=stub.library_url, max_connections=concurrency) as api:
+            operations = [
+                ("library: list", lambda i: api.retrieve_documents_list(offset=i % 10, limit=100)),
+                ("library: get by id", lambda i: _document_found(api, file_ids[i])),
+                ("library: upload", lambda i: _uploaded_file_id(api, upload_path, ["bench"])),
+                ("library: update", lambda i: api.update_document(file_ids[i], labels=["bench"])),
+                ("library: delete", lambda i: _delete_succeeded(api, file_ids[i])),
+            ]
+            for name, call in operations:
+                latencies, failed, elapsed = await _measure_async(calls, concurrency, call)
+                rows.append((name, latencies, failed, _retries("library-files"), elapsed))
+
+        blocking = [
+            ("summarize_text", "summarize", lambda i: summarizeAPI.summarizeAPI.summarize_text(f"{i} {SAMPLE_LINE}", "bench")),
+            ("contextual answer", "answer",
+             lambda i: summarizeAPI.contextualAPI.get_contextual_answer(SAMPLE_LINE, f"Question {i}?")),
+            ("library answer", "library-answer",
+             lambda i: contextualAPI.contextualAPI.get_contextual_answer_from_library(f"Question {i}?")),
+        ]
+        for name, endpoint, call in blocking:
+            latencies, failed, elapsed = await asyncio.to_thread(_measure_threads, calls, concurrency, call)
+            rows.append((name, latencies, failed, _retries(endpoint), elapsed))
+        injected = stub.httpd.errors_injected
+    print_latency(f"API operations: {calls} calls each, concurrency {concurrency}, {latency * 1000:.0f}"
+                  f"+{jitter * 1000:.0f} ms latency, {error_rate:.0%} injected errors ({injected} served)", rows)
+
+
+def bench_retrieval(pages: int, questions: int, latency: float) -> None:
+    """Document Q&A with the whole text as context against only the top-k BM25 chunks: payload and latency."""
+    from retrievalIndex import DEFAULT_TOP_K, RetrievalIndex
+    import PyPDF2
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp, StubServer(latency=latency) as stub:
+        _point_apis_at(stub)
+        pdf_path = make_sample_pdf(Path(tmp) / "sample.pdf", pages, chapter_every=10)
+        page_texts = [text for _, text in summarizeAPI.iter_page_texts(PyPDF2.PdfReader(pdf_path))]
+        started = time.perf_counter()
+        index = RetrievalIndex.for_document("bench", lambda: page_texts, index_dir=tmp)
+        build = time.perf_counter() - started
+        started = time.perf_counter()
+        RetrievalIndex.for_document("bench", lambda: page_texts, index_dir=tmp)
+        load = time.perf_counter() - started
+        full_text = "".join(page_texts)
+        for mode, context in (("whole document", lambda question: full_text),
+                              (f"top {DEFAULT_TOP_K} chunks", lambda question: index.context(question))):
+            sent = metrics.request_bytes.get("answer", 0)
+            started = time.perf_counter()
+            for i in range(questions):
+                question = f"What does chapter {i % max(1, pages // 10) + 1} say about the quarterly report?"
+                summarizeAPI.contextualAPI.get_contextual_answer(context(question), question)
+            elapsed = time.perf_counter() - started
+            rows.append((mode, (metrics.request_bytes.get("answer", 0) - sent) / questions, elapsed / questions))
+    table = Table(title=f"Document Q&A: {pages} pages, {questions} questions, {latency * 1000:.0f} ms server latency",
+                  show_header=True, header_style="bold magenta")
+    for column in ("Context", "KB sent per question", "ms per question"):
+        table.add_column(column)
+    for mode, payload, seconds in rows:
+        table.add_row(mode, f"{payload / 1024:.1f}", f"{seconds * 1000:.1f}")
+    console.print(table)
+    console.print(f"Index: {len(index)} chunks, built in {build * 1000:.0f} ms, loaded from disk in {load * 1000:.1f} ms.")
+
+
+def _summarize_requests() -> int:
+    return sum(count for (endpoint, _, _), count in metrics.requests.items() if endpoint == "summarize")
+
+
+def _pages_extracted() -> int:
+    return metrics.stage_items.get("pdf.extract", 0) + metrics.stage_items.get("pdf.extract_parallel", 0)
+
+
+def bench_resummarize(pages: int, edits: int, latency: float) -> None:
+    """Summarize a PDF, then a revision of it with `edits` pages changed: requests sent and pages extracted."""
+    from textCache import PageTextCache
+    rows = []
+    revised = [(i + 1) * pages // (edits + 1) for i in range(edits)]
+    with tempfile.TemporaryDirectory() as tmp, StubServer(latency=latency) as stub:
+        _point_apis_at(stub)
+        pdf_path = Path(tmp) / "report.pdf"
+        cache = PageTextCache(str(Path(tmp) / "text.sqlite3"))
+        runs = [("original, cold caches", ()), (f"revised ({edits} pages changed)", revised),
+                ("revised, caches cleared", revised)]
+        for name, revised_pages in runs:
+            if name.endswith("cleared"):  # what every revision cost before page hashing and stable chunks
+                cache = PageTextCache(str(Path(tmp) / "text-cleared.sqlite3"))
+                set_response_cache(ResponseCache(":memory:"))
+            make_sample_pdf(pdf_path, pages, revised_pages=revised_pages)
+            before = _summarize_requests(), _pages_extracted()
+            started = time.perf_counter()
+            page_texts = summarizeAPI.extract_pages_cached(pdf_path, cache=cache)
+            asyncio.run(summarizeAPI.summarizeAPI.summarize_map_reduce(page_texts, "bench"))
+            elapsed = time.perf_counter() - started
+            rows.append((name, _summarize_requests() - before[0], _pages_extracted() - before[1], elapsed))
+    table = Table(title=f"Re-summarizing a {pages}-page PDF, {latency * 1000:.0f} ms server latency",
+                  show_header=True, header_style="bold magenta")
+    for column in ("Run", "Summarize requests", "Pages extracted", "Seconds"):
+        table.add_column(column)
+    for name, requests, extracted, elapsed in rows:
+        table.add_row(name, str(requests), str(extracted), f"{elapsed:.2f}")
+    console.print(table)
+
+
+def _outline_ranges_per_entry(pdf_path: Path, level: int = 1):
+    """Chapter ranges the way pdfSplitter resolved them before the outline index: a lookup per entry
+    through reader.pages, and a scan of the later entries for every chapter's end."""
+    import PyPDF2
+    reader = PyPDF2.PdfReader(str(pdf_path), strict=False)
+    starts = []
+
+    def walk(entries, depth):
+        for entry in entries:
+            if isinstance(entry, list):
+                walk(entry, depth + 1)
+            else:
+                starts.append((depth, entry.get("/Title"), reader.get_destination_page_number(entry) + 1))
+
+    walk(reader.outline, 1)
+    chapters = []
+    for i, (depth, title, start) in enumerate(starts):
+        if depth == level:
+            following = [page for d, _, page in starts[i + 1:] if d <= level and page > start]
+            chapters.append((title, start, following[0] - 1 if following else len(reader.pages)))
+    return chapters
+
+
+def bench_chapters(pages: int, chapters: int, sections: int, latency: float) -> None:
+    """Resolving chapter ranges from a large nested outline, and summarizing one chapter vs the whole PDF."""
+    from textCache import PageTextCache
+    with tempfile.TemporaryDirectory() as tmp, StubServer(latency=latency) as stub:
+        _point_apis_at(stub)
+        pdf_path = make_sample_pdf(Path(tmp) / "book.pdf", pages, lines_per_page=5,
+                                   chapter_every=max(1, pages // chapters), sections=sections)
+        cache = PageTextCache(str(Path(tmp) / "text.sqlite3"))
+        timings = []
+        for mode, resolve in (("per-entry lookups", lambda: _outline_ranges_per_entry(pdf_path)),
+                              ("single pass", lambda: pdfSplitter.outline_ranges(pdfSplitter.pdfMemory.open_pdf(pdf_path))),
+                              ("cached index (first use)", lambda: summarizeAPI.cached_chapters(pdf_path, cache=cache)),
+                              ("cached index", lambda: summarizeAPI.cached_chapters(pdf_path, cache=cache))):
+            started = time.perf_counter()
+            found = resolve()
+            timings.append((mode, len(found), time.perf_counter() - started))
+        table = Table(title=f"Chapter ranges of a {pages}-page PDF, {chapters} chapters x {sections} sections",
+                      show_header=True, header_style="bold magenta")
+        for column in ("Mode", "Chapters", "ms"):
+            table.add_column(column)
+        for mode, count, elapsed in timings:
+            table.add_row(mode, str(count), f"{elapsed * 1000:.1f}")
+        console.print(table)
+
+        rows = []
+        for name, selection in (("whole PDF", None), ("one chapter", "2")):
+            set_response_cache(ResponseCache(":memory:"))
+            cache = PageTextCache(str(Path(tmp) / f"text-{len(rows)}.sqlite3"))
+            before = _summarize_requests(), _pages_extracted()
+            started = time.perf_counter()
+            if selection is None:
+                page_texts = summarizeAPI.extract_pages_cached(pdf_path, cache=cache)
+            else:
+                _, start, end = summarizeAPI.select_chapters(summarizeAPI.cached_chapters(pdf_path, cache=cache), selection)[0]
+                page_texts = summarizeAPI.extract_pages_cached(pdf_path, start - 1, end, cache=cache)
+            asyncio.run(summarizeAPI.summarizeAPI.summarize_map_reduce(page_texts, "bench"))
+            rows.append((name, _summarize_requests() - before[0], _pages_extracted() - before[1],
+                         time.perf_counter() - started))
+    table = Table(title=f"Summarizing, {latency * 1000:.0f} ms server latency", show_header=True,
+                  header_style="bold magenta")
+    for column in ("Source", "Summarize requests", "Pages extracted", "Seconds"):
+        table.add_column(column)
+    for name, requests, extracted, elapsed in rows:
+        table.add_row(name, str(requests), str(extracted), f"{elapsed:.2f}")
+    console.print(table)
+
+
+async def _run_concurrently(count: int, concurrency: int, call) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    return time.perf_counter() - started
+
+
+async def bench_library_client(requests: int, concurrency: int) -> None:
+    """Compare a fresh AsyncClient per call (the old behaviour) against the shared pooled client."""
+    with StubServer(documents=100) as stub:
+        url = stub.library_url
+
+        async def per_call_client():
+            async with httpx.AsyncClient() as client:
+                await client.get(url, params={"offset": 0, "limit": 10})
+
+        before = await _run_concurrently(requests, concurrency, per_call_client)
+
+        async with AI21LibraryAPI("stub", base_url=url, max_connections=concurrency) as api:
+            after = await _run_concurrently(requests, concurrency, lambda: api.retrieve_documents_list(limit=10))
+
+    print_results("AI21LibraryAPI: retrieve_documents_list",
+                  [("new client per call", requests, before), ("shared pooled client", requests, after)])
+
+
+async def bench_library_scan(documents: int, page_size: int, prefetch: int, latency: float) -> None:
+    """Full library scan: a hand-written offset loop against the prefetching iterator."""
+    with StubServer(documents=documents, latency=latency) as stub:
+        async with AI21LibraryAPI("stub", base_url=stub.library_url) as api:
+            started = time.perf_counter()
+            offset = 0
+            while True:
+                page = await api.retrieve_documents_list(offset=offset, limit=page_size)
+                if not page or len(page) < page_size:
+                    break
+                offset += page_size
+            serial = time.perf_counter() - started
+
+            started = time.perf_counter()
+            async with api.iter_documents(page_size=page_size, prefetch=prefetch) as iterator:
+                async for _ in iterator:
+                    pass
+            prefetched = time.perf_counter() - started
+
+    pages = -(-documents // page_size)
+    print_results(f"Library scan: {documents} documents, {latency * 1000:.0f} ms per request",
+                  [("serial offset loop", pages, serial), (f"iter_documents(prefetch={prefetch})", pages, prefetched)],
+                  unit="Pages", rate="Pages/s")
+
+
+async def bench_list_render(documents: int, latency: float) -> None:
+    """Peak Python memory and time to first output when listing a whole library: one big table vs streaming."""
+    import apiController
+    rows = []
+    with StubServer(documents=documents, latency=latency) as stub, open(os.devnull, "w", encoding="utf-8") as null:
+        apiController.console = Console(file=null, width=200)
+        first_output = []
+        original_print = apiController.console.print
+
+        def timed_print(*args, **kwargs):
+            first_output.append(first_output[0] if first_output else time.perf_counter())
+            original_print(*args, **kwargs)
+        apiController.console.print = timed_print
+
+        async def collect_then_print(documents_stream):
+            apiController.print_document_list([doc async for doc in documents_stream])
+
+        modes = [("collect, one table", collect_then_print),
+                 ("streamed tables", apiController.print_documents_streaming),
+                 ("streamed CSV export", lambda docs: apiController.export_documents(docs, null, "csv")),
+                 ("streamed JSONL export", lambda docs: apiController.export_documents(docs, null, "jsonl"))]
+        async with AI21LibraryAPI("stub", base_url=stub.library_url) as api:
+            for name, render in modes:
+                first_output.clear()
+                tracemalloc.start()
+                started = time.perf_counter()
+                async with api.iter_documents() as docs:
+                    await render(docs)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                rows.append((name, elapsed, first_output[0] - started if first_output else None, peak))
+    table = Table(title=f"Listing {documents} documents, {latency * 1000:.0f} ms per page",
+                  show_header=True, header_style="bold magenta")
+    for column in ("Mode", "Seconds", "First output s", "Peak MB"):
+        table.add_column(column)
+    for name, elapsed, first, peak in rows:  # exports write rows rather than print, so they have no first output
+        table.add_row(name, f"{elapsed:.2f}", "-" if first is None else f"{first:.2f}", f"{peak / 2 ** 20:.1f}")
+    console.print(table)
+
+
+def _extract_rows(pdf_path: Path, pages: int, workers):
+    started = time.perf_counter()
+    serial_text = summarizeAPI.extract_text_from_pdf(summarizeAPI.U.read_pdf(pdf_path))
+    serial = time.perf_counter() - started
+    started = time.perf_counter()
+    parallel_text, _ = summarizeAPI.extract_text_with_throughput(pdf_path, workers=workers)
+    parallel = time.perf_counter() - started
+    if serial_text != parallel_text:
+        console.print("[red]Parallel extraction output differs from serial extraction.[/red]")
+    return [(f"extract, serial, {pages} pages", pages, serial),
+            (f"extract, process pool (workers={workers or 'cpu count'}), {pages} pages", pages, parallel)]
+
+
+def _split_rows(pdf_path: Path, pages: int, workers, output_root: Path):
+    rows = []
+    for mode, mode_workers in (("serial", 1), (f"process pool (workers={workers or 'cpu count'})", workers)):
+        output = output_root / f"{pages}_{mode.split()[0]}"
+        output.mkdir()
+        started = time.perf_counter()
+        written = pdfSplitter.split_pdf_by_outline(pdf_path, output, level=1, workers=mode_workers)
+        rows.append((f"split, {mode}, {pages} pages into {len(written)} parts", pages, time.perf_counter() - started))
+    return rows
+
+
+def bench_extract(pages: int, workers) -> None:
+    """Serial extract_text_from_pdf against the process-pool extractor on a generated PDF."""
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = _extract_rows(make_sample_pdf(Path(tmp) / "sample.pdf", pages), pages, workers)
+    print_results(f"extract_text_from_pdf: {pages} pages", rows, unit="Pages", rate="Pages/s")
+
+
+def bench_split(pages: int, parts: int, workers) -> None:
+    """Split a generated PDF into `parts` outline chapters: serial writer against the process pool."""
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = make_sample_pdf(Path(tmp) / "sample.pdf", pages, lines_per_page=5, chapter_every=max(1, pages // parts))
+        rows = _split_rows(pdf_path, pages, workers, Path(tmp))
+    print_results(f"split_pdf: {pages} pages", rows, unit="Pages", rate="Pages/s")
+
+
+async def bench_split_upload(pages: int, parts: int, concurrency: int) -> None:
+    """Split a PDF and upload the parts: through files on disk, and straight from in-memory buffers."""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp, StubServer() as stub:
+        pdf_path = make_sample_pdf(Path(tmp) / "sample.pdf", pages, chapter_every=max(1, pages // parts))
+        async with AI21LibraryAPI("stub", base_url=stub.library_url, max_connections=concurrency) as api:
+            api.console.quiet = True
+            output = Path(tmp) / "parts"
+            output.mkdir()
+            started = time.perf_counter()
+            written = await asyncio.to_thread(pdfSplitter.split_pdf_by_outline, pdf_path, output, 1, 1)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def upload(path):
+                async with semaphore:
+                    await api.upload_document(str(path))
+            await asyncio.gather(*(upload(path) for path in written))
+            rows.append((f"split to disk, then upload {len(written)} files", pages, time.perf_counter() - started))
+            started = time.perf_counter()
+            results = await api.upload_pdf_parts(pdf_path, concurrency=concurrency)
+            rows.append((f"upload {len(results['uploaded'])} parts from memory", pages, time.perf_counter() - started))
+    print_results(f"Split and upload: {pages} pages, concurrency {concurrency}", rows, unit="Pages", rate="Pages/s")
+
+
+def bench_pdf(sizes, workers) -> None:
+    """Pages/sec for extraction and splitting on generated PDFs of several sizes (one chapter per 10 pages)."""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in sizes:
+            pdf_path = make_sample_pdf(Path(tmp) / f"sample_{pages}.pdf", pages, chapter_every=10)
+            rows.extend(_extract_rows(pdf_path, pages, workers))
+            rows.extend(_split_rows(pdf_path, pages, workers, Path(tmp)))
+    print_results("PDF processing", rows, unit="Pages", rate="Pages/s")
+
+
+HEAVY_MODULES = ("httpx", "rich", "PyPDF2", "requests")
+# (subcommand, command line that exercises it without network or files, modules it imports when it runs)
+STARTUP_COMMANDS = [
+    ("cli --help", ["--help"], []),
+    ("library search", ["library", "search", "--help"], ["libraryIndex"]),
+    ("library", ["library", "list", "--help"], ["apiController"]),
+    ("summarize", ["summarize", "--help"], ["summarizeAPI"]),
+    ("answer", ["answer", "--help"], ["contextualAPI"]),
+    ("chapters", ["chapters", "--help"], ["summarizeAPI"]),
+    ("split", ["split", "--help"], ["pdfSplitter"]),
+    ("watch", ["watch", "--help"], ["watchFolder"]),
+]
+
+
+def _memory_probe(operation: str, pdf_path: str, low_memory: bool, output_folder: str) -> None:
+    """Run one operation in this (fresh) process and print its peak RSS in bytes; used by bench_memory."""
+    import resource
+    import pdfMemory
+    pdfMemory.use_low_memory(low_memory)
+    if operation == "extract":
+        reader = summarizeAPI.U.read_pdf(Path(pdf_path))
+        for _ in summarizeAPI.iter_page_texts(reader, window=pdfMemory.window_for(pdf_path)):
+            pass
+    elif operation == "split":
+        pdfSplitter.split_pdf_by_outline(Path(pdf_path), Path(output_folder), workers=1)
+    try:  # ru_maxrss would include the parent's peak on Linux: it survives the fork/exec that started us
+        with open("/proc/self/status", encoding="ascii") as status:
+            print(next(int(line.split()[1]) * 1024 for line in status if line.startswith("VmHWM:")))
+    except OSError:
+        print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)  # macOS reports bytes
+
+
+def bench_memory(sizes) -> None:
+    """Peak RSS of text extraction and outline splitting, default reader vs low-memory mode, per 1,000 pages.
+    Each run is a separate process so peaks don't carry over; the cost of importing the tools is subtracted."""
+    try:
+        import resource  # noqa: F401  pylint: disable=unused-import
+    except ImportError:
+        console.print("The memory benchmark needs the resource module (Linux or macOS).")
+        return
+
+    def probe(operation, pdf_path, low_memory, output_folder):
+        code = (f"import benchmark; benchmark._memory_probe({operation!r}, {str(pdf_path)!r}, {low_memory!r}, "
+                f"{str(output_folder)!r})")
+        report = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                                cwd=Path(__file__).parent)
+        return int(report.stdout.split()[-1])
+
+    table = Table(title="Peak RSS of one worker, default vs low-memory mode", show_header=True,
+                  header_style="bold magenta")
+    for column in ("Operation", "Pages", "Default MB", "Low-memory MB", "Default MB/1k pages", "Low-memory MB/1k pages"):
+        table.add_column(column)
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = probe("none", "", False, tmp)
+        for pages in sizes:
+            pdf_path = make_sample_pdf(Path(tmp) / f"sample_{pages}.pdf", pages, chapter_every=10)
+            for operation in ("extract", "split"):
+                output_folder = Path(tmp) / f"{operation}_{pages}"
+                output_folder.mkdir()
+                peaks = [probe(operation, pdf_path, low_memory, output_folder) - baseline for low_memory in (False, True)]
+                table.add_row(operation, str(pages), *(f"{peak / 2 ** 20:.1f}" for peak in peaks),
+                              *(f"{peak / 2 ** 20 / pages * 1000:.1f}" for peak in peaks))
+    console.print(table)
+    console.print(f"Over a baseline of {baseline / 2 ** 20:.1f} MB for the interpreter and imports.")
+
+
+def _best_seconds(command, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       cwd=Path(__file__).parent)  # so `import <tool>` works wherever the benchmark is run from
+        timings.append(time.perf_counter() - started)
+    return min(timings)  # the fastest run is the one least disturbed by the rest of the machine
+
+
+def _imported_modules(command) -> set:
+    """Top-level packages a command imports, from the interpreter's -X importtime report."""
+    report = subprocess.run([sys.executable, "-X", "importtime"] + command, check=True, capture_output=True, text=True,
+                            cwd=Path(__file__).parent)
+    return {line.rsplit("|", 1)[1].strip().split(".")[0] for line in report.stderr.splitlines() if line.count("|") == 2}
+
+
+def bench_startup(runs: int, budget_ms: float, command_budget_ms: float) -> bool:
+    """Wall time of cli.py start-up over a bare interpreter, per subcommand, with and without its imports.
+
+    The dispatcher itself (argument parsing, `--help`) must fit in `budget_ms` and must not import any of
+    HEAVY_MODULES; each subcommand's own imports must fit in `command_budget_ms`. Returns False on a breach.
+    """
+    cli = str(Path(__file__).with_name("cli.py"))
+    baseline = _best_seconds([sys.executable, "-c", "pass"], runs * 3)
+    table = Table(title=f"Start-up over a bare interpreter ({baseline * 1000:.0f} ms), best of {runs}",
+                  show_header=True, header_style="bold magenta")
+    for column in ("Command", "Dispatch ms", "Imports ms", "Heavy modules at dispatch", "Within budget"):
+        table.add_column(column)
+    ok = True
+    for name, argv, modules in STARTUP_COMMANDS:
+        dispatch = _best_seconds([sys.executable, cli] + argv, runs) - baseline
+        imports = (_best_seconds([sys.executable, "-c", "import " + ", ".join(modules)], runs) - baseline
+                   if modules else 0.0)
+        heavy = sorted(_imported_modules([cli] + argv) & set(HEAVY_MODULES))
+        within = dispatch * 1000 <= budget_ms and imports * 1000 <= command_budget_ms and not heavy
+        ok = ok and within
+        table.add_row(name, f"{dispatch * 1000:.1f}", f"{imports * 1000:.1f}", ", ".join(heavy) or "-",
+                      "yes" if within else "[red]no[/red]")
+    console.print(table)
+    console.print(f"Budget: {budget_ms:.0f} ms to dispatch, {command_budget_ms:.0f} ms of imports per subcommand.")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks against a local stub AI21 server.")
+    parser.add_argument("--metrics-out", help="Also export collected metrics: Prometheus text for *.prom, JSON otherwise.")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    library = sub.add_parser("library-client", help="Requests/sec with and without the pooled client.")
+    library.add_argument("--requests", type=int, default=500)
+    library.add_argument("--concurrency", type=int, default=10)
+
+    scan = sub.add_parser("library-scan", help="Wall time of a full library scan, serial vs prefetching.")
+    scan.add_argument("--documents", type=int, default=5000)
+    scan.add_argument("--page-size", type=int, default=100)
+    scan.add_argument("--prefetch", type=int, default=4)
+    scan.add_argument("--latency", type=float, default=0.05, help="Seconds of simulated server latency.")
+
+    list_render = sub.add_parser("list-render", help="Memory and time to first row: one table vs streaming.")
+    list_render.add_argument("--documents", type=int, default=5000)
+    list_render.add_argument("--latency", type=float, default=0.01, help="Seconds of simulated server latency.")
+
+    extract = sub.add_parser("extract", help="Pages/sec for serial and parallel PDF text extraction.")
+    extract.add_argument("--pages", type=int, default=1000)
+    extract.add_argument("--workers", type=int, default=None)
+
+    split = sub.add_parser("split", help="Pages/sec for splitting a PDF into many parts by outline.")
+    split.add_argument("--pages", type=int, default=2000)
+    split.add_argument("--parts", type=int, default=200)
+    split.add_argument("--workers", type=int, default=None)
+
+    api = sub.add_parser("api", help="Throughput and p50/p95/p99 latency of every API operation.")
+    api.add_argument("--calls", type=int, default=200)
+    api.add_argument("--concurrency", type=int, default=8)
+    api.add_argument("--latency", type=float, default=0.02, help="Seconds of simulated server latency.")
+    api.add_argument("--jitter", type=float, default=0.01, help="Extra random latency, up to this many seconds.")
+    api.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/500.")
+
+    split_upload = sub.add_parser("split-upload", help="Split-and-upload through disk vs straight from memory.")
+    split_upload.add_argument("--pages", type=int, default=1000)
+    split_upload.add_argument("--parts", type=int, default=100)
+    split_upload.add_argument("--concurrency", type=int, default=4)
+
+    pdf = sub.add_parser("pdf", help="Pages/sec for extraction and splitting on PDFs of several sizes.")
+    pdf.add_argument("--sizes", default="100,500,2000", help="Comma-separated page counts.")
+    pdf.add_argument("--workers", type=int, default=None)
+
+    retrieval = sub.add_parser("retrieval", help="Payload and latency of document Q&A, whole text vs top-k chunks.")
+    retrieval.add_argument("--pages", type=int, default=300)
+    retrieval.add_argument("--questions", type=int, default=20)
+    retrieval.add_argument("--latency", type=float, default=0.02, help="Seconds of simulated server latency.")
+
+    resummarize = sub.add_parser("resummarize", help="Requests and pages re-processed after editing a few pages.")
+    resummarize.add_argument("--pages", type=int, default=500)
+    resummarize.add_argument("--edits", type=int, default=2, help="Pages changed in the revision.")
+    resummarize.add_argument("--latency", type=float, default=0.02, help="Seconds of simulated server latency.")
+
+    chapters = sub.add_parser("chapters", help="Chapter ranges from a nested outline, and one chapter vs whole-PDF summaries.")
+    chapters.add_argument("--pages", type=int, default=2000)
+    chapters.add_argument("--chapters", type=int, default=200)
+    chapters.add_argument("--sections", type=int, default=5, help="Nested outline entries per chapter.")
+    chapters.add_argument("--latency", type=float, default=0.02, help="Seconds of simulated server latency.")
+
+    memory = sub.add_parser("memory", help="Peak RSS per 1,000 pages for extraction and splitting, default vs low-memory.")
+    memory.add_argument("--sizes", default="1000,4000", help="Comma-separated page counts.")
+
+    startup = sub.add_parser("startup", help="cli.py start-up time per subcommand, failing over budget.")
+    startup.add_argument("--runs", type=int, default=10)
+    # Dispatch is argparse plus compiling cli.py (a script never gets a cached .pyc): about 20 ms here, and up to
+    # 60 ms on slower machines. Importing any of HEAVY_MODULES by mistake costs well over 100 ms.
+    startup.add_argument("--budget-ms", type=float, default=100.0, help="Allowed dispatch time over a bare interpreter.")
+    startup.add_argument("--command-budget-ms", type=float, default=1000.0,
+                         help="Allowed import time of each subcommand's modules.")
+
+    args = parser.parse_args()
+    for endpoint in ("summarize", "answer", "library-answer", "library-files"):
+        unthrottle(endpoint)  # measure our code, not the client-side limits tuned for the real service
+    if args.bench == "library-client":
+        asyncio.run(bench_library_client(args.requests, args.concurrency))
+    elif args.bench == "library-scan":
+        asyncio.run(bench_library_scan(args.documents, args.page_size, args.prefetch, args.latency))
+    elif args.bench == "list-render":
+        asyncio.run(bench_list_render(args.documents, args.latency))
+    elif args.bench == "extract":
+        bench_extract(args.pages, args.workers)
+    elif args.bench == "split":
+        bench_split(args.pages, args.parts, args.workers)
+    elif args.bench == "api":
+        asyncio.run(bench_api(args.calls, args.concurrency, args.latency, args.jitter, args.error_rate))
+    elif args.bench == "split-upload":
+        asyncio.run(bench_split_upload(args.pages, args.parts, args.concurrency))
+    elif args.bench == "pdf":
+        bench_pdf([int(size) for size in args.sizes.split(",")], args.workers)
+    elif args.bench == "retrieval":
+        bench_retrieval(args.pages, args.questions, args.latency)
+    elif args.bench == "resummarize":
+        bench_resummarize(args.pages, args.edits, args.latency)
+    elif args.bench == "chapters":
+        bench_chapters(args.pages, args.chapters, args.sections, args.latency)
+    elif args.bench == "memory":
+        bench_memory([int(size) for size in args.sizes.split(",")])
+    elif args.bench == "startup" and not bench_startup(args.runs, args.budget_ms, args.command_budget_ms):
+        sys.exit(1)
+    if args.metrics_out:
+        metrics.write(args.metrics_out)
+        console.print(f"Metrics written to {args.metrics_out}")
+
+
+if __name__ == "__main__":
+    main()
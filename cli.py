@@ -0,0 +1,409 @@
+"""One command line for the library, summarize, answer, chapters, split and watch tools.
+
+Only the standard library is imported up front: each subcommand imports the module that implements it
+(and through it httpx, rich or PyPDF2) when it runs, so `--help`, argument errors and the cheaper commands
+start quickly when called from cron or shell loops. The API key is read once, from --config, AI21_API_KEY
+or each tool's usual config file.
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+
+def _labels(value: Optional[str]) -> Optional[List[str]]:
+    return value.split(",") if value else None
+
+
+def _print_documents(documents, as_json: bool) -> None:
+    """One line per document, tab-separated (or JSON lines), so output pipes cleanly into other tools."""
+    for doc in documents:
+        if as_json:
+            print(json.dumps(doc))
+        else:
+            print("\t".join(str(doc.get(field) or "") for field in ("fileId", "name", "path", "status")))
+
+
+def _file_id(response) -> Optional[str]:
+    """The document ID in an upload or get response; error JSON has none."""
+    return response.get("fileId") if isinstance(response, dict) else response
+
+
+def run_library(args) -> int:
+    if args.action == "search":  # served from the local index, so the HTTP stack is never imported
+        from libraryIndex import LibraryIndex
+        with LibraryIndex() as index:
+            _print_documents(index.find(label=args.label, path_prefix=args.path_prefix, status=args.status,
+                                        limit=args.limit), args.json)
+        return 0
+    import asyncio
+    from apiController import AI21LibraryAPI, CONFIGFILE, get_api_key
+    try:
+        api_key = get_api_key(CONFIGFILE)
+    except KeyError as err:
+        print(f"library: {err.args[0]}", file=sys.stderr)
+        return 1
+    return asyncio.run(_run_library_api(AI21LibraryAPI(api_key), args))
+
+
+async def _run_library_api(api, args) -> int:
+    async with api:
+        if args.action == "upload" and args.file == "-":  # e.g. `pdftotext a.pdf - | cli.py library upload - --name a.txt`
+            result = await api.upload_bytes(sys.stdin.buffer.read(), args.name or "stdin.txt", path=args.path,
+                                            labels=_labels(args.labels), public_url=args.public_url)
+        elif args.action == "upload":
+            result = await api.upload_document(args.file, path=args.path, labels=_labels(args.labels),
+                                               public_url=args.public_url)
+        elif args.action == "upload-split":
+            from pdfSplitter import parse_ranges
+            result = await api.upload_pdf_parts(args.source, parse_ranges(args.ranges) if args.ranges else None,
+                                                args.outline or 1, path=args.path, labels=_labels(args.labels),
+                                                concurrency=args.concurrency)
+            print(json.dumps(result))
+            return 1 if result["failed"] else 0
+        elif args.action == "list" and args.all:  # streamed: rows go out as listing pages arrive
+            from apiController import print_documents_streaming
+            async with api.iter_documents(offset=args.offset) as documents:
+                if args.table:
+                    await print_documents_streaming(documents, page_size=args.page_size)
+                else:
+                    async for doc in documents:
+                        _print_documents([doc], args.json)
+            return 1 if documents.failed else 0
+        elif args.action == "list":
+            result = await api.retrieve_documents_list(offset=args.offset, limit=args.limit)
+            if result is not None:
+                if args.table:
+                    from apiController import print_document_list
+                    print_document_list(result)
+                else:
+                    _print_documents(result, args.json)
+                return 0
+        elif args.action == "export":
+            from apiController import export_documents, export_format
+            fmt = args.format or export_format(args.output)
+            async with api.iter_documents() as documents:
+                if args.output == "-":
+                    written = await export_documents(documents, sys.stdout, fmt)
+                else:
+                    with open(args.output, "w", encoding="utf-8", newline="") as output:
+                        written = await export_documents(documents, output, fmt)
+            print(f"{written} documents exported.", file=sys.stderr)
+            return 1 if documents.failed else 0
+        elif args.action == "get":
+            result = await api.retrieve_document_by_id(args.file_id)
+        elif args.action == "update":
+            result = await api.update_document(args.file_id, labels=_labels(args.labels), public_url=args.public_url)
+        elif args.action == "delete":
+            status = await api.delete_document(args.file_id)
+            print(json.dumps(status))
+            return 0 if 200 <= status < 300 else 1
+        elif args.action == "bulk-upload":
+            result = await api.bulk_upload_folder(args.folder, pattern=args.pattern, path=args.path,
+                                                  labels=_labels(args.labels), concurrency=args.concurrency)
+        elif args.action in ("bulk-update", "bulk-delete"):
+            return await _run_bulk(api, args)
+        else:  # sync
+            from libraryIndex import LibraryIndex
+            with LibraryIndex() as index:
+                result = await index.sync(api)
+    if result is None:
+        return 1
+    print(json.dumps(result, default=str))
+    if args.action in ("upload", "get"):
+        return 0 if _file_id(result) else 1
+    if args.action == "bulk-upload":
+        return 1 if result["failed"] else 0
+    return 0
+
+
+async def _run_bulk(api, args) -> int:
+    """Select by filter, print the affected set, and apply only with --yes; one JSON line per document after."""
+    if not (args.label or args.path_prefix or args.status or args.file_ids or args.all):
+        print(f"{args.action}: give a filter (--label, --path-prefix, --status, --file-ids), "
+              f"or --all to select every document", file=sys.stderr)
+        return 2
+    from libraryIndex import LibraryIndex
+    with LibraryIndex() as index:
+        documents = await api.select_documents(label=args.label, path_prefix=args.path_prefix, status=args.status,
+                                               file_ids=_labels(args.file_ids), index=index if args.from_index else None,
+                                               all_documents=args.all)
+        if not args.yes:
+            _print_documents(documents, False)
+            print(f"{len(documents)} documents selected; rerun with --yes to apply.", file=sys.stderr)
+            return 0
+        if args.action == "bulk-update":
+            results = await api.bulk_update(documents, labels=_labels(args.labels), add_labels=_labels(args.add_labels),
+                                             remove_labels=_labels(args.remove_labels), public_url=args.public_url,
+                                             concurrency=args.concurrency, index=index)
+        else:
+            results = await api.bulk_delete(documents, concurrency=args.concurrency, index=index)
+    for outcome, items in results.items():
+        for item in items:
+            print(json.dumps({**item, "ok": outcome == "succeeded"}))
+    return 1 if results["failed"] else 0
+
+
+def run_summarize(args) -> int:
+    import asyncio
+    from pathlib import Path
+    import summarizeAPI
+    source = Path(args.source)
+    if not source.exists():
+        print(f"summarize: {source} not found", file=sys.stderr)
+        return 1
+    if source.is_dir():
+        results = asyncio.run(summarizeAPI.summarize_folder(source, args.focus, output_folder=args.output,
+                                                            extract_workers=args.workers,
+                                                            summarize_concurrency=args.concurrency,
+                                                            skip_existing=not args.force))
+        print(json.dumps({key: len(paths) for key, paths in results.items()}))
+        return 1 if results["failed"] else 0
+    if args.chapters:
+        chapters = summarizeAPI.select_chapters(summarizeAPI.cached_chapters(source, args.level), args.chapters)
+        if not chapters:
+            return 1
+        results = asyncio.run(summarizeAPI.summarize_chapters(source, chapters, args.focus, output_folder=args.output,
+                                                              concurrency=args.concurrency))
+        print(json.dumps({key: len(titles) for key, titles in results.items()}))
+        return 1 if results["failed"] else 0
+    start, end = (0, None)
+    if args.pages:
+        first, _, last = args.pages.partition("-")
+        start, end = int(first) - 1, int(last or first)
+    pages = summarizeAPI.extract_pages_cached(source, start, end)
+    summary = summarizeAPI.summarize_pages(pages, args.focus)
+    if not summary:
+        return 1
+    stem = source.stem if not args.pages else f"{source.stem}_{start + 1}-{end}"
+    return 0 if summarizeAPI.U.save_text_to_file(summary, stem, output_folder=args.output) else 1
+
+
+def run_answer(args) -> int:
+    if args.batch:
+        import asyncio
+        from pathlib import Path
+        from contextualAPI import answer_batch
+        stats = asyncio.run(answer_batch(Path(args.batch), Path(args.output), args.concurrency))
+        print(json.dumps(stats))
+        return 0 if stats and not stats["failed"] else 1
+    if not args.question:
+        print("answer: a question or --batch is required", file=sys.stderr)
+        return 2
+    if args.pdf:  # answer from one document's text rather than the library
+        from pathlib import Path
+        import summarizeAPI
+        pdf = Path(args.pdf)
+        if not pdf.is_file():
+            print(f"answer: {pdf} not found", file=sys.stderr)
+            return 1
+        chapters = None
+        if args.chapters:
+            chapters = summarizeAPI.select_chapters(summarizeAPI.cached_chapters(pdf, args.level), args.chapters)
+            if not chapters:
+                return 1
+        answer = summarizeAPI.contextualAPI.answer_from_pdf(pdf, args.question, args.top_k, chapters)
+    elif args.chapters:
+        print("answer: --chapters needs --pdf", file=sys.stderr)
+        return 2
+    else:
+        from contextualAPI import contextualAPI
+        answer = contextualAPI.get_contextual_answer_from_library(args.question, path=args.path,
+                                                                  labels=_labels(args.labels),
+                                                                  file_ids=_labels(args.file_ids))
+    return 0 if answer else 1
+
+
+def run_chapters(args) -> int:
+    """One line per chapter: number, title, first and last page (1-based), tab-separated."""
+    from pathlib import Path
+    import summarizeAPI
+    chapters = summarizeAPI.cached_chapters(Path(args.source), args.level)
+    for number, (title, start, end) in enumerate(chapters, start=1):
+        print(f"{number}\t{title}\t{start}\t{end}")
+    return 0 if chapters else 1
+
+
+def run_split(args) -> int:
+    from pathlib import Path
+    import pdfSplitter
+    source = Path(args.source)
+    output_folder = Path(args.output or source.parent)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    failed = []
+    if args.ranges:
+        parts = pdfSplitter.split_pdf_ranges(source, pdfSplitter.parse_ranges(args.ranges), output_folder,
+                                             workers=args.workers, failed=failed)
+    else:
+        parts = pdfSplitter.split_pdf_by_outline(source, output_folder, level=args.outline, workers=args.workers,
+                                                 failed=failed)
+    for part in parts:
+        print(part)
+    return 1 if failed else 0
+
+
+def run_watch(args) -> int:
+    import asyncio
+    from watchFolder import FolderWatcher, WorkQueue
+    actions = [action for action in ("extract", "summarize", "upload") if getattr(args, action)] or ["summarize"]
+    watcher = FolderWatcher(args.folder, actions, pattern=args.pattern, output_folder=args.output, focus=args.focus,
+                            labels=_labels(args.labels), library_path=args.path, interval=args.interval,
+                            settle=args.settle, concurrency=args.concurrency, queue_size=args.queue_size,
+                            extract_workers=args.workers, queue=WorkQueue(args.queue))
+    try:
+        results = asyncio.run(watcher.run(once=args.once))
+    except (FileNotFoundError, KeyError) as err:
+        print(f"watch: {err.args[0]}", file=sys.stderr)
+        return 1
+    print(json.dumps(results))
+    return 1 if results["failed"] else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="AI21 library, summarize, answer and PDF split tools.")
+    parser.add_argument("--config", help="Config file holding the API key, instead of each tool's default.")
+    parser.add_argument("--metrics-out", help="Export request and stage metrics when done: Prometheus text for "
+                                              "*.prom, JSON otherwise.")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="Memory-map PDFs and release parsed pages in windows (automatic for very large files).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    library = commands.add_parser("library", help="Manage documents in the AI21 library.")
+    library.set_defaults(handler=run_library)
+    actions = library.add_subparsers(dest="action", required=True)
+    upload = actions.add_parser("upload", help="Upload one file.")
+    upload.add_argument("file", help="File to upload, or - to read the content from stdin.")
+    upload.add_argument("--name", help="Document name for content read from stdin.")
+    listing = actions.add_parser("list", help="List documents.")
+    listing.add_argument("--offset", type=int, default=0)
+    listing.add_argument("--limit", type=int, default=100)
+    listing.add_argument("--all", action="store_true", help="Stream the whole library, page by page.")
+    listing.add_argument("--table", action="store_true", help="Render tables instead of tab-separated lines.")
+    listing.add_argument("--page-size", type=int, default=50, help="Rows per table with --all --table.")
+    export = actions.add_parser("export", help="Stream the whole library to CSV or JSON lines in constant memory.")
+    export.add_argument("output", help="Output file (.csv for CSV, anything else for JSON lines), or - for stdout.")
+    export.add_argument("--format", choices=("csv", "jsonl"))
+    get = actions.add_parser("get", help="Show one document.")
+    update = actions.add_parser("update", help="Change a document's labels or public URL.")
+    delete = actions.add_parser("delete", help="Delete a document.")
+    for action in (get, update, delete):
+        action.add_argument("file_id")
+    bulk = actions.add_parser("bulk-upload", help="Upload every new file in a folder.")
+    bulk.add_argument("folder")
+    bulk.add_argument("--pattern", default="*")
+    bulk.add_argument("--concurrency", type=int, default=8)
+    upload_split = actions.add_parser("upload-split", help="Split a PDF and upload the parts from memory.")
+    upload_split.add_argument("source")
+    how = upload_split.add_mutually_exclusive_group(required=True)
+    how.add_argument("--ranges", help="1-based page ranges, e.g. 1-10,11-20.")
+    how.add_argument("--outline", type=int, metavar="LEVEL", help="Split at outline entries of this level.")
+    upload_split.add_argument("--concurrency", type=int, default=4)
+    for action in (upload, bulk, upload_split):
+        action.add_argument("--path")
+
+    bulk_update = actions.add_parser("bulk-update", help="Change labels or public URL of every matching document.")
+    bulk_update.add_argument("--add-labels", help="Comma-separated labels to add, keeping the others.")
+    bulk_update.add_argument("--remove-labels", help="Comma-separated labels to remove.")
+    bulk_delete = actions.add_parser("bulk-delete", help="Delete every matching document.")
+    for action in (bulk_update, bulk_delete):
+        action.add_argument("--label")
+        action.add_argument("--path-prefix")
+        action.add_argument("--status")
+        action.add_argument("--file-ids", help="Comma-separated file IDs.")
+        action.add_argument("--all", action="store_true", help="Select every document; required when no filter is given.")
+        action.add_argument("--from-index", action="store_true", help="Select from the local index, not a library scan.")
+        action.add_argument("--concurrency", type=int, default=8)
+        action.add_argument("--yes", action="store_true", help="Apply; without it the selection is only previewed.")
+    for action in (upload, update, bulk, bulk_update, upload_split):
+        action.add_argument("--labels", help="Comma-separated labels.")
+    for action in (upload, update, bulk_update):
+        action.add_argument("--public-url")
+    actions.add_parser("sync", help="Refresh the local library index.")
+    search = actions.add_parser("search", help="Query the local library index without calling the API.")
+    search.add_argument("--label")
+    search.add_argument("--path-prefix")
+    search.add_argument("--status")
+    search.add_argument("--limit", type=int)
+    for action in (listing, search):
+        action.add_argument("--json", action="store_true", help="Print JSON lines instead of tab-separated fields.")
+
+    summarize = commands.add_parser("summarize", help="Summarize a PDF, or every PDF in a folder.")
+    summarize.set_defaults(handler=run_summarize)
+    summarize.add_argument("source", help="A PDF file or a folder of PDFs.")
+    summarize.add_argument("--focus", default="", help="What the summary should focus on.")
+    which = summarize.add_mutually_exclusive_group()
+    which.add_argument("--pages", help="1-based page range of a single PDF, e.g. 10-25.")
+    which.add_argument("--chapters", help="Chapters of a single PDF, one summary each: numbers, ranges or title words, "
+                                          "e.g. 1,3-4,appendix.")
+    summarize.add_argument("--output", help="Folder for the summary files.")
+    summarize.add_argument("--workers", type=int, help="Extraction processes when summarizing a folder.")
+    summarize.add_argument("--concurrency", type=int, default=4, help="Documents summarized at once in a folder.")
+    summarize.add_argument("--force", action="store_true",
+                           help="Re-summarize PDFs even when their summary is newer than the PDF.")
+
+    answer = commands.add_parser("answer", help="Answer questions from the library or from one PDF.")
+    answer.set_defaults(handler=run_answer)
+    answer.add_argument("question", nargs="?")
+    answer.add_argument("--pdf", help="Answer from this PDF's most relevant passages instead of the library.")
+    answer.add_argument("--top-k", type=int, help="Passages of the PDF sent as context (default 6).")
+    answer.add_argument("--chapters", help="Only search these chapters of the PDF, e.g. 1,3-4,appendix.")
+    answer.add_argument("--path")
+    answer.add_argument("--labels", help="Comma-separated labels.")
+    answer.add_argument("--file-ids", help="Comma-separated file IDs.")
+    answer.add_argument("--batch", help="Answer every question in this JSONL file.")
+    answer.add_argument("--output", default="answers.jsonl", help="Where batch answers are appended.")
+    answer.add_argument("--concurrency", type=int, default=8)
+
+    chapters = commands.add_parser("chapters", help="List a PDF's chapters from its cached outline index.")
+    chapters.set_defaults(handler=run_chapters)
+    chapters.add_argument("source")
+    for command in (summarize, answer, chapters):
+        command.add_argument("--level", type=int, default=1, help="Outline level that counts as a chapter.")
+
+    split = commands.add_parser("split", help="Split a PDF by page ranges or by its outline.")
+    split.set_defaults(handler=run_split)
+    split.add_argument("source")
+    how = split.add_mutually_exclusive_group(required=True)
+    how.add_argument("--ranges", help="1-based page ranges, e.g. 1-10,11-20.")
+    how.add_argument("--outline", type=int, metavar="LEVEL", help="Split at outline entries of this level.")
+    split.add_argument("--output", help="Folder for the parts. Defaults to the PDF's folder.")
+    split.add_argument("--workers", type=int)
+
+    watch = commands.add_parser("watch", help="Process new or changed files in a folder as they arrive.")
+    watch.set_defaults(handler=run_watch)
+    watch.add_argument("folder", nargs="?", default="data")
+    watch.add_argument("--extract", action="store_true", help="Extract page text into the page cache.")
+    watch.add_argument("--summarize", action="store_true", help="Write a summary per file (the default action).")
+    watch.add_argument("--upload", action="store_true", help="Upload each file to the library.")
+    watch.add_argument("--pattern", default="*.pdf")
+    watch.add_argument("--output", help="Folder for the summary files. Defaults to the watched folder.")
+    watch.add_argument("--focus", default="", help="What the summaries should focus on.")
+    watch.add_argument("--labels", help="Comma-separated labels for uploads.")
+    watch.add_argument("--path", help="Library path for uploads.")
+    watch.add_argument("--interval", type=float, default=2.0, help="Seconds between folder scans.")
+    watch.add_argument("--settle", type=float, default=5.0, help="Seconds a file must stay unchanged before it is processed.")
+    watch.add_argument("--concurrency", type=int, default=2, help="Files processed at once.")
+    watch.add_argument("--queue-size", type=int, default=4, help="Files waiting in memory before scanning pauses.")
+    watch.add_argument("--workers", type=int, help="Extraction processes. Defaults to --concurrency.")
+    watch.add_argument("--queue", default=".cache/watch_queue.sqlite3", help="Persistent work queue database.")
+    watch.add_argument("--once", action="store_true", help="Exit once every file found has been processed.")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.config:
+        import appConfig
+        appConfig.use_config(args.config)
+    if args.low_memory:
+        import pdfMemory
+        pdfMemory.use_low_memory()
+    status = args.handler(args)
+    if args.metrics_out:
+        from metrics import metrics
+        metrics.write(args.metrics_out)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,14 @@
-import requests
-import configparser
+import asyncio
+import httpx
+import json
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional, Set, Tuple
+from rich.console import Console
+import appConfig
+from rateLimiter import SAFE_TO_RETRY, async_client, sync_client
+
+console = Console()
 
 
 class contextualAPI:
@@ -9,13 +16,10 @@ class contextualAPI:
 
     @staticmethod
     def get_api_key() -> str:
-        config = configparser.ConfigParser()
-        try:
-            config.read('config.ini')
-            return config['KEY']['APIKEY']
-        except KeyError:
+        key = appConfig.api_key('config.ini', 'KEY', 'APIKEY')
+        if not key:
             console.print("API key not found in config.ini.")
-            return ""
+        return key
 
     @staticmethod
     def get_contextual_answer_from_library(question: str,
@@ -32,21 +36,130 @@ class contextualAPI:
         payload = {"question": question, "path": path, "labels": labels, "fileIds": file_ids}
 
         try:
-            response = requests.post(contextualAPI.API_URL, json=payload, headers=headers)
+            response = sync_client("library-answer").post(contextualAPI.API_URL, json=payload, headers=headers, timeout=60,
+                                                          extensions=SAFE_TO_RETRY)
             response.raise_for_status()
             answer_data = response.json()
             answer = answer_data.get("answer", "Answer not found.")
             console.print("\nAnswer: ", answer)
             return answer
-        except requests.RequestError as request_error:
+        except httpx.RequestError as request_error:
             console.print(f"Request error: {request_error}")
-        except requests.HTTPStatusError as http_error:
+        except httpx.HTTPStatusError as http_error:
             console.print(f"HTTP error: {http_error}")
         return ""
 
+    @staticmethod
+    async def get_contextual_answer_from_library_async(client: httpx.AsyncClient, question: str,
+                                                       path: Optional[str] = None,
+                                                       labels: Optional[List[str]] = None,
+                                                       file_ids: Optional[List[str]] = None) -> dict:
+        """Async variant for batch use: returns the response JSON and lets errors propagate to the caller."""
+        payload = {"question": question, "path": path, "labels": labels, "fileIds": file_ids}
+        response = await client.post(contextualAPI.API_URL, json=payload, extensions=SAFE_TO_RETRY)
+        response.raise_for_status()
+        return response.json()
+
+
+def _read_questions(input_path: Path) -> Iterator[Tuple[str, Optional[dict], Optional[str]]]:
+    """Yield (id, question record, error) from a JSONL file; records without an "id" are keyed by line number.
+    A line that is not a JSON object yields (line number, None, what is wrong with it) instead."""
+    with open(input_path, encoding='utf-8') as questions:
+        for line_number, line in enumerate(questions, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as error:
+                yield str(line_number), None, f"line {line_number} is not valid JSON: {error}"
+                continue
+            if not isinstance(record, dict):
+                yield str(line_number), None, f"line {line_number} is not a JSON object"
+                continue
+            yield str(record.get("id", line_number)), record, None
+
+
+def _completed_ids(output_path: Path) -> Set[str]:
+    """IDs already answered in a previous run; failed questions are left out so they are retried."""
+    done = set()
+    if output_path.exists():
+        with open(output_path, encoding='utf-8') as answers:
+            for line in answers:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from a crash
+                if not result.get("error"):
+                    done.add(result["id"])
+    return done
+
+
+async def answer_batch(input_path: Path, output_path: Path, concurrency: int = 8) -> dict:
+    """Answer every question in a JSONL file against the library, with at most `concurrency` in flight.
+
+    Each input line is an object with "question" and optional "path", "labels", "fileIds" and "id".
+    Results are appended to `output_path` as each question finishes, with its latency in seconds, so a
+    crashed run can simply be started again: questions already answered there are skipped.
+    """
+    api_key = contextualAPI.get_api_key()
+    if not api_key:
+        return {}
+    input_path, output_path = Path(input_path), Path(output_path)
+    done = _completed_ids(output_path)
+    stats = {"answered": 0, "failed": 0, "skipped": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {"accept": "application/json", "content-type": "application/json", "Authorization": f"Bearer {api_key}"}
+
+    async with async_client("library-answer", headers=headers, timeout=60,
+                            limits=httpx.Limits(max_connections=concurrency)) as client:
+        with open(output_path, 'a', encoding='utf-8') as output:
+
+            async def answer_one(question_id: str, record: dict) -> None:
+                started = time.perf_counter()
+                result = {"id": question_id, "question": record.get("question")}
+                try:
+                    answer_data = await contextualAPI.get_contextual_answer_from_library_async(
+                        client, record["question"], path=record.get("path"), labels=record.get("labels"),
+                        file_ids=record.get("fileIds"))
+                    result["answer"] = answer_data.get("answer", "Answer not found.")
+                    result["answerInContext"] = answer_data.get("answerInContext")
+                    stats["answered"] += 1
+                except Exception as error:  # one bad question must not stop the batch
+                    result["error"] = str(error) or type(error).__name__
+                    stats["failed"] += 1
+                finally:
+                    semaphore.release()
+                result["latency"] = round(time.perf_counter() - started, 3)
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+
+            tasks = []
+            for question_id, record, error in _read_questions(input_path):
+                if question_id in done:
+                    stats["skipped"] += 1
+                    continue
+                if error:  # recorded like a failed question, so the rest of the batch still runs
+                    output.write(json.dumps({"id": question_id, "question": None, "error": error}) + "\n")
+                    stats["failed"] += 1
+                    continue
+                await semaphore.acquire()  # reading stops here while the window is full, so memory stays bounded
+                tasks.append(asyncio.ensure_future(answer_one(question_id, record)))
+                tasks = [task for task in tasks if not task.done()]
+            await asyncio.gather(*tasks)
+    return stats
+
 
 # Example usage in main function:
 def main() -> None:
+    mode = input("Enter 1 to ask a question or 2 to answer a JSONL batch (default 1): ")
+    if mode == "2":
+        input_path = input("Enter the questions JSONL path: ")
+        output_path = input("Enter the answers JSONL path (default answers.jsonl): ") or "answers.jsonl"
+        concurrency = input("Enter the number of parallel questions (default 8): ")
+        stats = asyncio.run(answer_batch(Path(input_path), Path(output_path), int(concurrency) if concurrency else 8))
+        console.print(f"Batch finished: {stats}")
+        return
+
     question = input("Enter your question: ")
     path = input("Enter path (optional, press enter to skip): ")
     labels_input = input("Enter labels separated by commas (optional, press enter to skip): ")
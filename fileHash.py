@@ -0,0 +1,12 @@
+import hashlib
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path) -> str:
+    """Hash a file in fixed-size chunks so large files never sit in memory whole."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
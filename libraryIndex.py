@@ -0,0 +1,151 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+COLUMNS = ["fileId", "name", "path", "fileType", "sizeBytes", "labels", "publicUrl", "createdBy", "creationDate",
+           "lastUpdated", "status"]
+DEFAULT_INDEX_PATH = ".cache/library_index.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    fileId TEXT PRIMARY KEY,
+    name TEXT,
+    path TEXT,
+    fileType TEXT,
+    sizeBytes INTEGER,
+    labels TEXT,
+    publicUrl TEXT,
+    createdBy TEXT,
+    creationDate TEXT,
+    lastUpdated TEXT,
+    status TEXT
+);
+CREATE TABLE IF NOT EXISTS document_labels (
+    fileId TEXT NOT NULL REFERENCES documents(fileId) ON DELETE CASCADE,
+    label TEXT NOT NULL,
+    PRIMARY KEY (label, fileId)
+);
+CREATE INDEX IF NOT EXISTS idx_documents_path ON documents(path);
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents(status);
+CREATE INDEX IF NOT EXISTS idx_document_labels_file ON document_labels(fileId);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class LibraryIndex:
+    """Local SQLite mirror of the document library metadata.
+
+    `sync` walks the library listing and only writes rows whose lastUpdated changed; queries by label,
+    path prefix and status are answered from indexed tables without touching the network.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_INDEX_PATH):
+        self.db_path = Path(db_path)
+        if str(db_path) != ":memory:":
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _known_versions(self) -> Dict[str, str]:
+        return dict(self.conn.execute("SELECT fileId, lastUpdated FROM documents"))
+
+    def upsert(self, doc: dict) -> None:
+        row = [doc.get(column) for column in COLUMNS]
+        row[COLUMNS.index("labels")] = json.dumps(doc.get("labels") or [])
+        updates = ", ".join(f"{column} = excluded.{column}" for column in COLUMNS[1:])
+        self.conn.execute(f"INSERT INTO documents ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                          f"ON CONFLICT(fileId) DO UPDATE SET {updates}", row)
+        self.conn.execute("DELETE FROM document_labels WHERE fileId = ?", (doc["fileId"],))
+        self.conn.executemany("INSERT OR IGNORE INTO document_labels (fileId, label) VALUES (?, ?)",
+                              [(doc["fileId"], label) for label in doc.get("labels") or []])
+
+    def remove(self, file_ids) -> None:
+        self.conn.executemany("DELETE FROM documents WHERE fileId = ?", [(file_id,) for file_id in file_ids])
+
+    def apply_changes(self, updated=(), removed=()) -> None:
+        """Mirror changes made through the API (e.g. bulk updates and deletes) without waiting for a sync."""
+        with self.conn:
+            for doc in updated:
+                self.upsert(doc)
+            self.remove(removed)
+
+    async def sync(self, api, page_size: int = 100, prefetch: int = 4) -> Dict[str, int]:
+        """Bring the mirror up to date with the library behind `api` (an AI21LibraryAPI).
+
+        The listing endpoint has no "changed since" filter, so the listing itself is always walked, but
+        only new or changed records are written and documents missing from the library are dropped.
+        """
+        known = self._known_versions()
+        seen = set()
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        with self.conn:
+            async with api.iter_documents(page_size=page_size, prefetch=prefetch) as documents:
+                async for doc in documents:
+                    file_id = doc["fileId"]
+                    seen.add(file_id)
+                    previous = known.get(file_id)
+                    if previous is not None and previous == doc.get("lastUpdated"):
+                        stats["unchanged"] += 1
+                        continue
+                    stats["added" if previous is None else "updated"] += 1
+                    self.upsert(doc)
+            # A listing cut short by an error says nothing about which documents were deleted.
+            stale = set(known) - seen if not documents.failed else set()
+            self.remove(stale)
+            stats["removed"] = len(stale)
+            self.conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('last_sync', ?)", (str(time.time()),))
+        return stats
+
+    @property
+    def last_sync(self) -> Optional[float]:
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = 'last_sync'").fetchone()
+        return float(row["value"]) if row else None
+
+    def _to_document(self, row: sqlite3.Row) -> dict:
+        doc = dict(row)
+        doc["labels"] = json.loads(doc["labels"] or "[]")
+        return doc
+
+    def find(self, label: Optional[str] = None, path_prefix: Optional[str] = None, status: Optional[str] = None,
+             limit: Optional[int] = None) -> List[dict]:
+        """Return documents matching every given filter, in the same shape the library API returns."""
+        clauses, params = [], []
+        if label is not None:
+            clauses.append("fileId IN (SELECT fileId FROM document_labels WHERE label = ?)")
+            params.append(label)
+        if path_prefix is not None:
+            # A range comparison instead of LIKE keeps the path index usable.
+            clauses.append("path >= ? AND path < ?")
+            params.extend([path_prefix, path_prefix + "\U0010ffff"])
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        sql = "SELECT * FROM documents"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY name"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._to_document(row) for row in self.conn.execute(sql, params)]
+
+    def get(self, file_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT * FROM documents WHERE fileId = ?", (file_id,)).fetchone()
+        return self._to_document(row) if row else None
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
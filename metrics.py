@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Prometheus-style histogram: per-bucket counts plus a running sum and count."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total, result = 0, []
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile; coarse, but enough to spot regressions."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return float(bound)
+        return float("inf")
+
+
+class StageTiming:
+    def __init__(self, items: int = 0):
+        self.items = items
+
+
+class MetricsRegistry:
+    """Counters and histograms for every API request and PDF processing stage in this process.
+
+    Requests are recorded by the throttled transports in rateLimiter (so every AI21LibraryAPI,
+    summarizeAPI and contextualAPI call is covered, one record per attempt); stages are timed with
+    `time_stage`. Trace hooks receive one dict per event as it happens.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.latency: Dict[str, Histogram] = {}
+        self.request_bytes: Dict[str, int] = {}
+        self.response_bytes: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+        self.stages: Dict[str, Histogram] = {}
+        self.stage_items: Dict[str, int] = {}
+        self.trace_hooks: List[Callable[[dict], None]] = []
+
+    def add_trace_hook(self, hook: Callable[[dict], None]) -> None:
+        self.trace_hooks.append(hook)
+
+    def _trace(self, event: dict) -> None:
+        for hook in self.trace_hooks:
+            try:
+                hook(event)
+            except Exception:  # pylint: disable=broad-except
+                pass  # a broken hook must never break the request it is observing
+
+    def record_request(self, endpoint: str, method: str, status: str, latency: float, request_bytes: int = 0,
+                       response_bytes: int = 0) -> None:
+        with self.lock:
+            key = (endpoint, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(endpoint, Histogram()).observe(latency)
+            self.request_bytes[endpoint] = self.request_bytes.get(endpoint, 0) + request_bytes
+            self.response_bytes[endpoint] = self.response_bytes.get(endpoint, 0) + response_bytes
+        self._trace({"type": "request", "endpoint": endpoint, "method": method, "status": str(status), "latency": latency,
+                     "request_bytes": request_bytes, "response_bytes": response_bytes})
+
+    def record_retry(self, endpoint: str) -> None:
+        with self.lock:
+            self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+        self._trace({"type": "retry", "endpoint": endpoint})
+
+    @contextmanager
+    def time_stage(self, stage: str, items: int = 0):
+        """Time a block of work: `with metrics.time_stage("pdf.extract", items=pages): ...`
+        The yielded object's `items` can be set inside the block when the count is only known afterwards."""
+        started = time.perf_counter()
+        timing = StageTiming(items)
+        try:
+            yield timing
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.stages.setdefault(stage, Histogram()).observe(elapsed)
+                self.stage_items[stage] = self.stage_items.get(stage, 0) + timing.items
+            self._trace({"type": "stage", "stage": stage, "seconds": elapsed, "items": timing.items})
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            endpoints = {}
+            for (endpoint, method, status), count in self.requests.items():
+                entry = endpoints.setdefault(endpoint, {"requests": 0, "by_status": {}, "by_method": {}})
+                entry["requests"] += count
+                entry["by_status"][status] = entry["by_status"].get(status, 0) + count
+                entry["by_method"][method] = entry["by_method"].get(method, 0) + count
+            for endpoint, entry in endpoints.items():
+                histogram = self.latency[endpoint]
+                entry.update({"retries": self.retries.get(endpoint, 0),
+                              "request_bytes": self.request_bytes.get(endpoint, 0),
+                              "response_bytes": self.response_bytes.get(endpoint, 0),
+                              "latency_seconds": {"sum": histogram.sum, "count": histogram.count,
+                                                  "p50": histogram.quantile(0.5), "p95": histogram.quantile(0.95),
+                                                  "p99": histogram.quantile(0.99),
+                                                  "buckets": dict(histogram.cumulative())}})
+            stages = {stage: {"count": histogram.count, "seconds": histogram.sum, "items": self.stage_items.get(stage, 0)}
+                      for stage, histogram in self.stages.items()}
+        return {"endpoints": endpoints, "stages": stages}
+
+    def to_prometheus(self) -> str:
+        lines = ["# TYPE ai21_requests_total counter"]
+        with self.lock:
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'ai21_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+            lines.append("# TYPE ai21_request_retries_total counter")
+            for endpoint, count in sorted(self.retries.items()):
+                lines.append(f'ai21_request_retries_total{{endpoint="{endpoint}"}} {count}')
+            for name, values in (("ai21_request_bytes_total", self.request_bytes),
+                                 ("ai21_response_bytes_total", self.response_bytes)):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f'{name}{{endpoint="{endpoint}"}} {count}' for endpoint, count in sorted(values.items()))
+            for name, label, histograms in (("ai21_request_duration_seconds", "endpoint", self.latency),
+                                            ("pdf_stage_duration_seconds", "stage", self.stages)):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(histograms.items()):
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {total}')
+                    lines.append(f'{name}_sum{{{label}="{key}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}="{key}"}} {histogram.count}')
+            lines.append("# TYPE pdf_stage_items_total counter")
+            lines.extend(f'pdf_stage_items_total{{stage="{stage}"}} {count}' for stage, count in sorted(self.stage_items.items()))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path) -> None:
+        """Export to `path`: Prometheus text format for *.prom / *.txt, a JSON snapshot otherwise."""
+        path = Path(path)
+        if path.suffix in (".prom", ".txt"):
+            path.write_text(self.to_prometheus(), encoding="utf-8")
+        else:
+            path.write_text(json.dumps(self.snapshot(), indent=2), encoding="utf-8")
+
+
+metrics = MetricsRegistry()
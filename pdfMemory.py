@@ -0,0 +1,140 @@
+import mmap
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import PyPDF2
+from PyPDF2.generic import IndirectObject, NameObject
+
+LOW_MEMORY_WINDOW = 50  # pages parsed between releases of the reader's object cache
+LOW_MEMORY_FILE_BYTES = 256 * 1024 * 1024  # files at least this large always use low-memory mode
+INHERITABLE_PAGE_ATTRIBUTES = tuple(NameObject(name) for name in ("/Resources", "/MediaBox", "/CropBox", "/Rotate"))
+
+_low_memory = False
+
+
+def use_low_memory(enabled: bool = True) -> None:
+    """Process every PDF in low-memory mode (see open_pdf), not only files of LOW_MEMORY_FILE_BYTES or more."""
+    global _low_memory  # pylint: disable=global-statement
+    _low_memory = enabled
+
+
+def low_memory_enabled() -> bool:
+    """Whether use_low_memory() is in effect; pass it to pool workers, which may not inherit module state."""
+    return _low_memory
+
+
+def low_memory_for(path) -> bool:
+    """Whether `path` should be processed in low-memory mode."""
+    if _low_memory:
+        return True
+    try:
+        return os.path.getsize(path) >= LOW_MEMORY_FILE_BYTES
+    except OSError:
+        return False
+
+
+def window_for(path) -> Optional[int]:
+    """The page window to use for `path`: LOW_MEMORY_WINDOW in low-memory mode, otherwise None."""
+    return LOW_MEMORY_WINDOW if low_memory_for(path) else None
+
+
+def open_pdf(path, low_memory: Optional[bool] = None) -> PyPDF2.PdfReader:
+    """A PdfReader for `path`. In low-memory mode the file is memory-mapped rather than read into a bytes
+    buffer, so the OS pages it in and out as needed. Use the helpers below on such a reader rather than
+    `reader.pages`, which builds and keeps every page object of the document at once."""
+    if low_memory is None:
+        low_memory = low_memory_for(path)
+    if not low_memory:
+        return PyPDF2.PdfReader(path, strict=False)
+    with open(path, "rb") as pdf_file:  # the mapping stays valid after the file is closed
+        mapped = mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return PyPDF2.PdfReader(mapped, strict=False)
+
+
+def is_mapped(reader: PyPDF2.PdfReader) -> bool:
+    """Whether the reader was opened by open_pdf in low-memory mode."""
+    return isinstance(reader.stream, mmap.mmap)
+
+
+def release_parsed(reader: PyPDF2.PdfReader) -> None:
+    """Drop every object the reader has parsed and cached (page contents, fonts, images, ...), and the
+    pages of a memory-mapped file read so far. They are read again from the file if needed later."""
+    reader.resolved_objects.clear()
+    if is_mapped(reader) and hasattr(mmap, "MADV_DONTNEED"):
+        # the mapping is read-only, so the OS can simply re-read dropped pages from the file
+        reader.stream.madvise(mmap.MADV_DONTNEED)
+
+
+def page_count(reader: PyPDF2.PdfReader) -> int:
+    """Number of pages, without building every page object for mapped readers."""
+    return len(_page_layout(reader)) if is_mapped(reader) else len(reader.pages)
+
+
+def _page_layout(reader: PyPDF2.PdfReader) -> List[Tuple[IndirectObject, dict]]:
+    """(reference, inherited attributes) of every page, in order: what `reader.pages` holds, minus the
+    parsed pages themselves. Built once per reader, releasing parsed tree nodes as it goes."""
+    layout = getattr(reader, "_pdf_memory_layout", None)
+    if layout is not None:
+        return layout
+    layout = []
+    stack = [(reader.trailer["/Root"].raw_get("/Pages"), {})]
+    while stack:
+        node_ref, inherit = stack.pop()
+        node = node_ref.get_object()
+        if "/Kids" in node:
+            inherit = dict(inherit)
+            for attr in INHERITABLE_PAGE_ATTRIBUTES:
+                if attr in node:
+                    inherit[attr] = node.raw_get(attr)  # references, not parsed objects
+            stack.extend((kid, inherit) for kid in reversed(node.raw_get("/Kids").get_object()))
+        else:
+            layout.append((node_ref, inherit))
+            if len(layout) % LOW_MEMORY_WINDOW == 0:
+                release_parsed(reader)
+    release_parsed(reader)
+    reader._pdf_memory_layout = layout  # pylint: disable=protected-access  # lives and dies with the reader
+    return layout
+
+
+def _build_page(reader: PyPDF2.PdfReader, node_ref, inherit: dict) -> PyPDF2.PageObject:
+    """A page object built the way PdfReader builds the entries of `reader.pages`."""
+    page = PyPDF2.PageObject(reader, node_ref if isinstance(node_ref, IndirectObject) else None)
+    page.update(node_ref.get_object())
+    for attr, value in inherit.items():
+        if attr not in page:
+            page[attr] = value
+    return page
+
+
+def iter_windowed(reader: PyPDF2.PdfReader, indices: Iterable[int],
+                  window: Optional[int] = None) -> Iterator[Tuple[int, PyPDF2.PageObject]]:
+    """Yield (page_index, page) for the given pages, releasing the reader's parsed objects after every
+    `window` pages so memory stays flat however long the document is. Mapped readers build each page on
+    demand instead of using `reader.pages`. window=None never releases."""
+    layout = _page_layout(reader) if is_mapped(reader) else None
+    for count, index in enumerate(indices, start=1):
+        yield index, _build_page(reader, *layout[index]) if layout is not None else reader.pages[index]
+        if window and count % window == 0:
+            release_parsed(reader)
+    if window:
+        release_parsed(reader)
+
+
+def page_numbers(reader: PyPDF2.PdfReader) -> Dict[int, int]:
+    """Object number -> page index of every page, to resolve outline destinations in one pass.
+    Mapped readers answer from the page layout, without building `reader.pages`."""
+    if not is_mapped(reader):
+        return {page.indirect_reference.idnum: index for index, page in enumerate(reader.pages)
+                if page.indirect_reference is not None}
+    return {node_ref.idnum: index for index, (node_ref, _) in enumerate(_page_layout(reader))
+            if isinstance(node_ref, IndirectObject)}
+
+
+def destination_page_number(reader: PyPDF2.PdfReader, destination, numbers: Optional[Dict[int, int]] = None) -> int:
+    """reader.get_destination_page_number, answered from a page_numbers() map when one is given."""
+    if numbers is None:
+        return reader.get_destination_page_number(destination)
+    page = destination.page
+    if isinstance(page, IndirectObject):
+        return numbers.get(page.idnum, -1)
+    return int(page) if isinstance(page, int) else -1
@@ -1,10 +1,16 @@
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 from datetime import datetime
+import io
 import logging
+import os
+import re
 from rich.logging import RichHandler
 from rich.prompt import Prompt
 import PyPDF2
+from metrics import metrics
+import pdfMemory
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -53,47 +59,235 @@ def select_pdf_file(files: List[Path]) -> Optional[Path]:
             logger.info("Please enter a number.")
 
 
-def split_pdf(pdf_reader: PyPDF2.PdfReader, output_folder: Path, base_filename: str):
-    """Split the given PDF into multiple files based on user input for page ranges."""
-    logger.info("Enter page ranges to split (e.g., 1-3, 4-5). Leave empty to skip.")
-    ranges = input().split(',')
-    for page_range in ranges:
-        try:
-            start, end = map(int, page_range.split('-'))
+def parse_ranges(spec: str) -> List[Tuple[int, int]]:
+    """Parse "1-3, 4-5, 9" into 1-based inclusive (start, end) pairs."""
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        ranges.append((int(start), int(end or start)))
+    return ranges
 
-            output_filename = f"{base_filename}_{start}-{end}.pdf"
-            output_filepath = output_folder / output_filename
-            pdf_writer = PyPDF2.PdfWriter()
 
-            for page in range(start - 1, end):
-                pdf_writer.add_page(pdf_reader.pages[page])
+def outline_entries(pdf_reader: PyPDF2.PdfReader) -> List[Tuple[int, str, int]]:
+    """Every outline entry as (depth, title, first page), in document order; depth 1 is the top level and
+    pages are 0-based (-1 when the destination is not a page of this document).
+    Destinations are resolved against one object number -> page index map, built in a single pass."""
+    numbers = pdfMemory.page_numbers(pdf_reader)
+    entries = []
 
-            with open(output_filepath, "wb") as output_file:
-                pdf_writer.write(output_file)
+    def walk(items, depth):
+        for item in items:
+            if isinstance(item, list):
+                walk(item, depth + 1)
+            else:
+                entries.append((depth, str(item.get("/Title") or ""),
+                                pdfMemory.destination_page_number(pdf_reader, item, numbers)))
 
-            logger.info(f"PDF split: {output_filename} created.")
-        except Exception as e:
-            logger.info(f"Error processing range {page_range}: {e}")
+    with metrics.time_stage("pdf.outline") as stage:
+        walk(pdf_reader.outline, 1)
+        stage.items = len(entries)
+    return entries
 
 
-def display_table_of_contents(pdf_reader):
-    toc = pdf_reader.outline
+def chapter_ranges(entries: List[Tuple[int, str, int]], total_pages: int, level: int = 1) -> List[Tuple[str, int, int]]:
+    """Chapters at outline depth `level` (1 = top level) as (title, start, end), 1-based and inclusive.
+    Each chapter runs until the next entry at the same or a shallower depth; the last runs to the end.
+    Entries whose destination is not a page of the document (page -1) are left out."""
+    chapters = []
+    following = []  # first pages of later entries at depth <= level, each smaller than the one below it
+    for depth, title, page in reversed(entries):
+        if depth > level or not 0 <= page < total_pages:
+            continue
+        start = page + 1
+        while following and following[-1] <= start:
+            following.pop()
+        if depth == level:
+            chapters.append((title, start, following[-1] - 1 if following else total_pages))
+        following.append(start)
+    chapters.reverse()
+    return chapters
 
-    logger.info("Table of Contents:\n")
 
-    def print_toc(entries, level=0):
-        for entry in entries:
-            if isinstance(entry, dict):
-                title = entry.get("/Title")
-                page_num = pdf_reader.get_destination_page_number(entry) + 1  # Fix page number offset
-                indent = '    ' * level  # Indentation for sub-levels
-                logger.info(f"{indent}- {title}, Page {page_num}")
-            elif isinstance(entry, list):
-                print_toc(entry, level + 1)
-            else:
-                print_toc([entry], level)
+def outline_ranges(pdf_reader: PyPDF2.PdfReader, level: int = 1) -> List[Tuple[str, int, int]]:
+    """Chapters at outline depth `level` of the reader; see chapter_ranges."""
+    return chapter_ranges(outline_entries(pdf_reader), pdfMemory.page_count(pdf_reader), level)
+
+
+def _safe_name(title: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', title or "untitled").strip('_')[:80] or "untitled"
+
+
+def part_filename(base_filename: str, index: int, start: int, end: int, name: Optional[str] = None) -> str:
+    """File name of one part: "<base>_<start>-<end>.pdf", or "<base>_<NNN>_<name>.pdf" for named parts."""
+    suffix = f"{index + 1:03d}_{_safe_name(name)}" if name is not None else f"{start}-{end}"
+    return f"{base_filename}_{suffix}.pdf"
+
+
+def range_writer(pdf_reader: PyPDF2.PdfReader, start: int, end: int, window: Optional[int] = None) -> PyPDF2.PdfWriter:
+    """A PdfWriter holding pages start..end (1-based, inclusive) of the reader.
+    With `window`, the reader's parsed objects are released every that many pages; the writer keeps its
+    own copies, so only the part being built stays in memory (see pdfMemory)."""
+    pdf_writer = PyPDF2.PdfWriter()
+    for _, page in pdfMemory.iter_windowed(pdf_reader, range(start - 1, end), window):
+        pdf_writer.add_page(page)
+    return pdf_writer
+
+
+def write_range(pdf_reader: PyPDF2.PdfReader, start: int, end: int, output_filepath: Path,
+                window: Optional[int] = None) -> Path:
+    """Write pages start..end (1-based, inclusive) of the reader to a new PDF."""
+    with open(output_filepath, "wb") as output_file:
+        range_writer(pdf_reader, start, end, window).write(output_file)
+    return output_filepath
+
+
+def range_buffer(pdf_reader: PyPDF2.PdfReader, start: int, end: int, window: Optional[int] = None) -> io.BytesIO:
+    """Pages start..end (1-based, inclusive) as an in-memory PDF, rewound and ready to upload."""
+    buffer = io.BytesIO()
+    range_writer(pdf_reader, start, end, window).write(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def iter_part_buffers(source: Path, ranges: Optional[List[Tuple[int, int]]] = None, level: int = 1,
+                      failed: Optional[List[Tuple[str, str]]] = None) -> Iterator[Tuple[str, io.BytesIO]]:
+    """Yield (file name, PDF buffer) for each part of `source`, built one at a time and never written to disk.
+
+    Parts are the given 1-based (start, end) ranges, or the outline entries at depth `level` when
+    `ranges` is None; names match what split_pdf_ranges/split_pdf_by_outline would write. As there, ranges
+    outside the document and parts that fail to render are logged and skipped, and (file name, error) for
+    each is appended to `failed` when given."""
+    source = Path(source)
+    pdf_reader = pdfMemory.open_pdf(source)
+    window = pdfMemory.window_for(source)
+    total_pages = pdfMemory.page_count(pdf_reader)
+    names = [None] * len(ranges) if ranges is not None else None
+    if ranges is None:
+        chapters = outline_ranges(pdf_reader, level)
+        ranges, names = [(start, end) for _, start, end in chapters], [title for title, _, _ in chapters]
+    for i, (start, end) in enumerate(ranges):
+        name = part_filename(source.stem, i, start, end, names[i])
+        error = range_error(start, end, total_pages)
+        if error is None:
+            try:
+                with metrics.time_stage("pdf.split_buffer", items=end - start + 1):
+                    buffer = range_buffer(pdf_reader, start, end, window)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        if error:
+            logger.error(f"Part {start}-{end} of {source.name} not rendered: {error}")
+            if failed is not None:
+                failed.append((name, error))
+            continue
+        yield name, buffer
+
+
+_worker_reader = None
+
 
-    print_toc(toc)
+def _init_split_worker(source: str, low_memory: bool = False) -> None:
+    global _worker_reader  # pylint: disable=global-statement
+    _worker_reader = pdfMemory.open_pdf(source, low_memory)
+
+
+def _write_job(pdf_reader: PyPDF2.PdfReader, job: Tuple[int, int, str, Optional[int]]) -> Optional[str]:
+    """Write one part; returns None on success, or the error, so one bad part does not stop the others."""
+    start, end, output_filepath, window = job
+    try:
+        write_range(pdf_reader, start, end, Path(output_filepath), window)
+    except Exception as e:
+        return str(e) or type(e).__name__
+    return None
+
+
+def _write_part(job: Tuple[int, int, str, Optional[int]]) -> Optional[str]:
+    return _write_job(_worker_reader, job)
+
+
+def range_error(start: int, end: int, total_pages: int) -> Optional[str]:
+    """Why the 1-based inclusive range start..end cannot be taken from a PDF of total_pages, or None."""
+    if not 1 <= start <= end <= total_pages:
+        return f"pages {start}-{end} are not a range within 1-{total_pages}"
+    return None
+
+
+def split_pdf_ranges(source: Path, ranges: List[Tuple[int, int]], output_folder: Path, base_filename: Optional[str] = None,
+                     names: Optional[List[str]] = None, workers: Optional[int] = None,
+                     failed: Optional[List[Tuple[int, int, str]]] = None) -> List[Path]:
+    """Split `source` into one file per (start, end) range without any prompts.
+
+    Output files are written in parallel by a process pool; each worker parses the source once and then
+    writes every part it is handed. Pass workers=1 to write serially in this process. In low-memory mode
+    the source is memory-mapped and parsed pages are released in windows, in the workers as well.
+    Ranges outside the document are rejected before any part is written; they and parts that fail to
+    write are logged and left out, and (start, end, error) for each is appended to `failed` when given.
+    Returns:List[Path]: Output files written, in the order of `ranges`."""
+    base_filename = base_filename or Path(source).stem
+    output_folder = Path(output_folder)
+    window = pdfMemory.window_for(source)
+    total_pages = pdfMemory.page_count(pdfMemory.open_pdf(source, low_memory=True))  # mapped: reads no pages
+    failures = failed if failed is not None else []
+    jobs = []
+    for i, (start, end) in enumerate(ranges):
+        error = range_error(start, end, total_pages)
+        if error:
+            failures.append((start, end, error))
+            continue
+        filename = part_filename(base_filename, i, start, end, names[i] if names else None)
+        jobs.append((start, end, str(output_folder / filename), window))
+    with metrics.time_stage("pdf.split", items=sum(end - start + 1 for start, end, _, _ in jobs)):
+        if workers == 1:
+            pdf_reader = pdfMemory.open_pdf(source)
+            errors = [_write_job(pdf_reader, job) for job in jobs]
+        elif jobs:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_split_worker,
+                                     initargs=(str(source), bool(window))) as pool:
+                # Bigger chunks mean fewer round-trips to the workers when there are hundreds of small parts.
+                chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+                errors = list(pool.map(_write_part, jobs, chunksize=chunksize))
+        else:
+            errors = []
+    written = []
+    for (start, end, path, _), error in zip(jobs, errors):
+        if error:
+            failures.append((start, end, error))
+        else:
+            written.append(Path(path))
+    for start, end, error in failures:
+        logger.error(f"Part {start}-{end} of {Path(source).name} not written: {error}")
+    return written
+
+
+def split_pdf_by_outline(source: Path, output_folder: Path, level: int = 1, workers: Optional[int] = None,
+                         failed: Optional[List[Tuple[int, int, str]]] = None) -> List[Path]:
+    """Split `source` into one file per outline entry at depth `level` (chapters, sections, ...)."""
+    chapters = outline_ranges(pdfMemory.open_pdf(source), level)
+    return split_pdf_ranges(source, [(start, end) for _, start, end in chapters], output_folder,
+                            names=[title for title, _, _ in chapters], workers=workers, failed=failed)
+
+
+def split_pdf(pdf_reader: PyPDF2.PdfReader, output_folder: Path, base_filename: str, window: Optional[int] = None):
+    """Split the given PDF into multiple files based on user input for page ranges."""
+    logger.info("Enter page ranges to split (e.g., 1-3, 4-5). Leave empty to skip.")
+    for page_range in input().split(','):
+        try:
+            for start, end in parse_ranges(page_range):
+                output_filename = f"{base_filename}_{start}-{end}.pdf"
+                write_range(pdf_reader, start, end, output_folder / output_filename, window)
+                logger.info(f"PDF split: {output_filename} created.")
+        except Exception as e:
+            logger.info(f"Error processing range {page_range}: {e}")
+
+
+def display_table_of_contents(pdf_reader, entries: Optional[List[Tuple[int, str, int]]] = None):
+    """Log the outline; pass `entries` (see outline_entries) when they are already known."""
+    logger.info("Table of Contents:\n")
+    for depth, title, page in entries if entries is not None else outline_entries(pdf_reader):
+        indent = '    ' * (depth - 1)  # Indentation for sub-levels
+        logger.info(f"{indent}- {title}, Page {page + 1}")
 
 
 def main():
@@ -111,7 +305,10 @@ def main():
     logger.info(f"Selected: {selected_pdf}")
     pdf_reader = None
     try:
-        pdf_reader = PyPDF2.PdfReader(selected_pdf)
+        low_memory = Prompt.ask("Use low-memory mode (for very large files)?",
+                                default="Y" if pdfMemory.low_memory_for(selected_pdf) else "N")
+        pdfMemory.use_low_memory(low_memory.lower() == 'y')
+        pdf_reader = pdfMemory.open_pdf(selected_pdf)
         display_pdf_information(pdf_reader)
         display_table_of_contents(pdf_reader)
         # with open(selected_pdf, 'rb') as pdf_file:
@@ -124,7 +321,13 @@ def main():
             if not output_folder.exists():
                 logger.info(f"Output folder '{output_folder}' does not exist.")
                 return
-            split_pdf(pdf_reader, output_folder, selected_pdf.stem)
+            mode = Prompt.ask("Split by 1. page ranges or 2. outline level", default="1")
+            if mode == "2":
+                level = int(Prompt.ask("Outline level (1 = top level)", default="1"))
+                parts = split_pdf_by_outline(selected_pdf, output_folder, level)
+                logger.info(f"PDF split into {len(parts)} parts by outline level {level}.")
+            else:
+                split_pdf(pdf_reader, output_folder, selected_pdf.stem, pdfMemory.window_for(selected_pdf))
     except Exception as e:
         logger.info(f"Error: {e}")
 
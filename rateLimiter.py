@@ -0,0 +1,304 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+
+from metrics import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_EXTENSION = "retry"
+SAFE_TO_RETRY = {RETRY_EXTENSION: True}  # pass as extensions= on a POST that can safely be sent twice
+NEVER_RETRY = {RETRY_EXTENSION: False}  # for bodies that cannot be replayed, e.g. streamed from a generator
+POLL_INTERVAL = 0.01
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` requests per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: grows by about one slot per window of successes, halves on throttling.
+
+    Waiting is done by polling rather than with asyncio primitives so one limiter can be shared by
+    threads and by any number of event loops (every asyncio.run() call makes a new one).
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def _try_enter(self) -> bool:
+        with self.lock:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def enter(self) -> None:
+        while not self._try_enter():
+            time.sleep(POLL_INTERVAL)
+
+    async def enter_async(self) -> None:
+        while not self._try_enter():
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def exit(self, throttled: bool = False) -> None:
+        with self.lock:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+class RetryPolicy:
+    """Jittered exponential backoff ("full jitter") that never waits less than a server's Retry-After."""
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = retry_after_seconds(response) if response is not None else None
+        return max(backoff, retry_after) if retry_after is not None else backoff
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _record(endpoint: str, request: httpx.Request, started: float, response: Optional[httpx.Response] = None,
+            error: Optional[Exception] = None) -> None:
+    """Report one attempt to the metrics registry; sizes come from Content-Length since bodies stream."""
+    metrics.record_request(endpoint, request.method, response.status_code if response is not None else type(error).__name__,
+                           time.perf_counter() - started, int(request.headers.get("content-length") or 0),
+                           int(response.headers.get("content-length") or 0) if response is not None else 0)
+
+
+def _idempotent(request: httpx.Request) -> bool:
+    return request.method in IDEMPOTENT_METHODS or bool(request.extensions.get(RETRY_EXTENSION))
+
+
+def _replayable(request: httpx.Request) -> bool:
+    return request.extensions.get(RETRY_EXTENSION) is not False
+
+
+def may_retry_error(request: httpx.Request, error: httpx.TransportError) -> bool:
+    """Whether a request that failed with `error` may be sent again. A request that never reached the server
+    always may; any other may only if it is idempotent, since the server may have acted on it already.
+    A request sent with extensions=NEVER_RETRY never may: its body is gone once it has been read."""
+    if not _replayable(request):
+        return False
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)) or _idempotent(request)
+
+
+def may_retry_status(request: httpx.Request, status_code: int) -> bool:
+    """Whether a response status calls for sending the request again: 429 always (the request was refused
+    unprocessed), other RETRY_STATUSES only for idempotent requests, and never with NEVER_RETRY."""
+    if not _replayable(request):
+        return False
+    return status_code == 429 or (status_code in RETRY_STATUSES and _idempotent(request))
+
+
+class EndpointLimiter:
+    """Everything that sits in front of one AI21 endpoint: rate, concurrency and retries."""
+
+    def __init__(self, name: str, rate: float = 10.0, burst: int = 10, initial_concurrency: int = 4,
+                 max_concurrency: int = 32, retry: Optional[RetryPolicy] = None):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, maximum=max_concurrency)
+        self.retry = retry or RetryPolicy()
+        self.retries = 0
+
+
+class ThrottledTransport(httpx.BaseTransport):
+    """httpx transport that rate-limits, caps concurrency and retries 429/5xx and connection errors.
+    Requests that are not idempotent (POST, unless sent with extensions=SAFE_TO_RETRY) are only retried
+    when they cannot have been processed: on 429 and on errors connecting; requests sent with
+    extensions=NEVER_RETRY are not retried at all; see may_retry_error/_status."""
+
+    def __init__(self, endpoint: str, transport: Optional[httpx.BaseTransport] = None):
+        self.endpoint = endpoint
+        self.transport = transport or httpx.HTTPTransport()
+
+    @property
+    def limiter(self) -> EndpointLimiter:
+        return get_limiter(self.endpoint)  # looked up per request so configure_limiter() applies to live clients
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiter
+        for attempt in range(limiter.retry.max_retries + 1):
+            last_attempt = attempt == limiter.retry.max_retries
+            limiter.bucket.acquire()
+            limiter.concurrency.enter()
+            started = time.perf_counter()
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError as error:
+                limiter.concurrency.exit(throttled=False)
+                _record(self.endpoint, request, started, error=error)
+                if last_attempt or not may_retry_error(request, error):
+                    raise
+                limiter.retries += 1
+                metrics.record_retry(self.endpoint)
+                time.sleep(limiter.retry.delay(attempt))
+                continue
+            except BaseException:
+                limiter.concurrency.exit(throttled=False)
+                raise
+            _record(self.endpoint, request, started, response)
+            throttled = response.status_code in THROTTLE_STATUSES
+            limiter.concurrency.exit(throttled=throttled)
+            if last_attempt or not may_retry_status(request, response.status_code):
+                return response
+            response.close()
+            limiter.retries += 1
+            metrics.record_retry(self.endpoint)
+            time.sleep(limiter.retry.delay(attempt, response))
+        raise AssertionError("unreachable")
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class ThrottledAsyncTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of ThrottledTransport."""
+
+    def __init__(self, endpoint: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.endpoint = endpoint
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    @property
+    def limiter(self) -> EndpointLimiter:
+        return get_limiter(self.endpoint)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiter
+        for attempt in range(limiter.retry.max_retries + 1):
+            last_attempt = attempt == limiter.retry.max_retries
+            await limiter.bucket.acquire_async()
+            await limiter.concurrency.enter_async()
+            started = time.perf_counter()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as error:
+                limiter.concurrency.exit(throttled=False)
+                _record(self.endpoint, request, started, error=error)
+                if last_attempt or not may_retry_error(request, error):
+                    raise
+                limiter.retries += 1
+                metrics.record_retry(self.endpoint)
+                await asyncio.sleep(limiter.retry.delay(attempt))
+                continue
+            except BaseException:
+                limiter.concurrency.exit(throttled=False)
+                raise
+            _record(self.endpoint, request, started, response)
+            throttled = response.status_code in THROTTLE_STATUSES
+            limiter.concurrency.exit(throttled=throttled)
+            if last_attempt or not may_retry_status(request, response.status_code):
+                return response
+            await response.aclose()
+            limiter.retries += 1
+            metrics.record_retry(self.endpoint)
+            await asyncio.sleep(limiter.retry.delay(attempt, response))
+        raise AssertionError("unreachable")
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+# Starting points only: the concurrency limit adapts at run time, and configure_limiter() overrides these.
+DEFAULT_SETTINGS = {
+    "summarize": {"rate": 10.0, "burst": 10, "initial_concurrency": 4},
+    "answer": {"rate": 10.0, "burst": 10, "initial_concurrency": 4},
+    "library-answer": {"rate": 10.0, "burst": 10, "initial_concurrency": 4},
+    "library-files": {"rate": 50.0, "burst": 50, "initial_concurrency": 8},
+}
+
+_limiters: Dict[str, EndpointLimiter] = {}
+_limiters_lock = threading.Lock()
+_sync_clients: Dict[str, httpx.Client] = {}
+
+
+def get_limiter(name: str) -> EndpointLimiter:
+    """The shared limiter for an endpoint ("summarize", "answer", "library-answer", "library-files")."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = EndpointLimiter(name, **DEFAULT_SETTINGS.get(name, {}))
+        return _limiters[name]
+
+
+def unthrottle(name: str) -> EndpointLimiter:
+    """Effectively remove rate and concurrency limits, e.g. for benchmarks against the local stub server."""
+    return configure_limiter(name, rate=1e9, burst=10 ** 9, initial_concurrency=10 ** 6, max_concurrency=10 ** 6)
+
+
+def configure_limiter(name: str, **settings) -> EndpointLimiter:
+    """Replace an endpoint's limiter, e.g. configure_limiter("summarize", rate=2, burst=4).
+    Settings not given keep their defaults for that endpoint."""
+    with _limiters_lock:
+        _limiters[name] = EndpointLimiter(name, **{**DEFAULT_SETTINGS.get(name, {}), **settings})
+        return _limiters[name]
+
+
+def sync_client(name: str) -> httpx.Client:
+    """A pooled, throttled httpx.Client for blocking calls to one endpoint, created on first use."""
+    with _limiters_lock:
+        if name not in _sync_clients:
+            _sync_clients[name] = httpx.Client(transport=ThrottledTransport(name))
+        return _sync_clients[name]
+
+
+def async_client(name: str, http2: bool = False, limits: Optional[httpx.Limits] = None, **client_options) -> httpx.AsyncClient:
+    """A throttled httpx.AsyncClient for one endpoint; pool limits go to the underlying transport."""
+    transport = httpx.AsyncHTTPTransport(http2=http2, limits=limits or httpx.Limits())
+    return httpx.AsyncClient(transport=ThrottledAsyncTransport(name, transport), **client_options)
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+DEFAULT_CACHE_PATH = ".cache/responses.sqlite3"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    response TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access);
+"""
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.replace("\r\n", "\n").strip()
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def request_key(endpoint: str, payload: dict) -> str:
+    """Stable hash of an endpoint and its payload; key order, line endings, outer whitespace and None fields don't matter."""
+    canonical = json.dumps({"endpoint": endpoint, "payload": _normalize(payload)}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Disk-backed cache of JSON responses for deterministic API calls (summarize, answer).
+
+    Entries expire after `ttl` seconds and the store is kept under `max_bytes` by evicting least recently
+    used responses. Identical requests that are already in flight are not sent twice: later callers wait
+    for the first one and share its result. Failed requests are never cached.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        if str(db_path) != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self._db_lock = threading.Lock()
+        self._inflight_lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_async: Dict[str, asyncio.Future] = {}
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, endpoint: str, payload: dict) -> Optional[dict]:
+        key = request_key(endpoint, payload)
+        now = time.time()
+        with self._db_lock:
+            row = self.conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    with self.conn:
+                        self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, endpoint: str, payload: dict, response: dict) -> None:
+        body = json.dumps(response)
+        now = time.time()
+        with self._db_lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO responses (key, endpoint, response, bytes, created, last_access) "
+                              "VALUES (?, ?, ?, ?, ?, ?)",
+                              (request_key(endpoint, payload), endpoint, body, len(body), now, now))
+        self.evict()
+
+    def evict(self) -> int:
+        """Drop expired responses, then least recently used ones until the store fits in max_bytes."""
+        with self._db_lock, self.conn:
+            removed = self.conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)).rowcount
+            excess = self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0] - self.max_bytes
+            if excess > 0:
+                victims, freed = [], 0
+                for key, size in self.conn.execute("SELECT key, bytes FROM responses ORDER BY last_access").fetchall():
+                    victims.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+                removed += len(victims)
+        return removed
+
+    def call(self, endpoint: str, payload: dict, request: Callable[[], dict]) -> dict:
+        """Return the cached response, or run `request` (once across threads asking for the same thing) and cache it."""
+        cached = self.get(endpoint, payload)
+        if cached is not None:
+            return cached
+        key = request_key(endpoint, payload)
+        with self._inflight_lock:
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[key] = Future()
+        if not owner:
+            self.deduplicated += 1
+            return pending.result()
+        try:
+            response = request()
+            self.put(endpoint, payload, response)
+            pending.set_result(response)
+            return response
+        except BaseException as error:
+            pending.set_exception(error)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    async def acall(self, endpoint: str, payload: dict, request: Callable[[], Awaitable[dict]]) -> dict:
+        """Async counterpart of call(): concurrent identical requests on the event loop share one call."""
+        cached = self.get(endpoint, payload)
+        if cached is not None:
+            return cached
+        key = request_key(endpoint, payload)
+        pending = self._inflight_async.get(key)
+        if pending is not None:
+            self.deduplicated += 1
+            return await asyncio.shield(pending)
+        pending = self._inflight_async[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await request()
+            self.put(endpoint, payload, response)
+            pending.set_result(response)
+            return response
+        except BaseException as error:
+            pending.set_exception(error)
+            pending.exception()  # mark retrieved so an unshared failure doesn't warn on garbage collection
+            raise
+        finally:
+            self._inflight_async.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        with self._db_lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "deduplicated": self.deduplicated,
+                "hit_rate": self.hits / lookups if lookups else 0.0, "entries": entries, "size_bytes": size}
+
+
+_response_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """The process-wide response cache, opened on first use."""
+    global _response_cache  # pylint: disable=global-statement
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+
+def set_response_cache(cache: ResponseCache) -> None:
+    """Swap the process-wide cache, e.g. for a throwaway one in benchmarks."""
+    global _response_cache  # pylint: disable=global-statement
+    _response_cache = cache
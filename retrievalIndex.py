@@ -0,0 +1,162 @@
+import os
+import re
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import metrics
+
+DEFAULT_INDEX_DIR = ".cache/retrieval"
+INDEX_VERSION = 1  # bump when chunking or scoring changes so stale indexes are rebuilt
+CHUNK_CHARS = 1500
+DEFAULT_TOP_K = 6
+MAX_TERM_CHARS = 24  # longer tokens are truncated; keeps the fixed-width term arrays small
+TERM_DTYPE = f"<U{MAX_TERM_CHARS}"
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def chunk_document(pages: List[str], chunk_chars: int = CHUNK_CHARS) -> List[Tuple[int, str]]:
+    """Split page texts into (page_index, text) chunks of at most about `chunk_chars`.
+
+    Chunks break at line boundaries and never span pages, so every chunk can be traced to one page."""
+    chunks = []
+    for page_index, text in enumerate(pages):
+        current = ""
+        for line in text.splitlines(keepends=True):
+            while len(line) > chunk_chars:  # a single huge line (no line breaks extracted) is cut hard
+                if current.strip():
+                    chunks.append((page_index, current))
+                current = ""
+                chunks.append((page_index, line[:chunk_chars]))
+                line = line[chunk_chars:]
+            if len(current) + len(line) > chunk_chars and current.strip():
+                chunks.append((page_index, current))
+                current = ""
+            current += line
+        if current.strip():
+            chunks.append((page_index, current))
+    return chunks
+
+
+class RetrievalIndex:
+    """BM25 index over the chunks of one document, stored as NumPy postings.
+
+    Postings are grouped by term (`term_ptr` delimits each term's slice of `doc_ids`/`tfs`), so scoring a
+    question touches only the postings of its own terms and is vectorized over them. Chunk texts are kept
+    as one UTF-8 byte array with offsets so the whole index saves and loads without pickling.
+    """
+
+    def __init__(self, terms, term_ptr, doc_ids, tfs, lengths, pages, text_bytes, text_offsets):
+        self.terms = terms
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.lengths = lengths
+        self.pages = pages
+        self.text_bytes = text_bytes
+        self.text_offsets = text_offsets
+        count = len(lengths)
+        document_frequency = np.diff(term_ptr).astype(np.float64)
+        self.idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+        average = lengths.mean() if count and lengths.sum() else 1.0
+        self.norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average)
+
+    @classmethod
+    def build(cls, chunks: List[Tuple[int, str]]) -> "RetrievalIndex":
+        with metrics.time_stage("retrieval.build", items=len(chunks)):
+            tokens = [tokenize(text) for _, text in chunks]
+            lengths = np.array([len(chunk_tokens) for chunk_tokens in tokens], dtype=np.int32)
+            all_tokens = np.array([token for chunk_tokens in tokens for token in chunk_tokens], dtype=TERM_DTYPE)
+            terms, term_ids = np.unique(all_tokens, return_inverse=True)
+            doc_of_token = np.repeat(np.arange(len(chunks), dtype=np.int64), lengths)
+            # one (term, chunk) pair per posting, sorted by term then chunk, with its term frequency
+            pairs, tfs = np.unique(term_ids.astype(np.int64) * max(len(chunks), 1) + doc_of_token, return_counts=True)
+            posting_terms = pairs // max(len(chunks), 1)
+            term_ptr = np.searchsorted(posting_terms, np.arange(len(terms) + 1)).astype(np.int64)
+            encoded = [text.encode("utf-8") for _, text in chunks]
+            text_offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+            np.cumsum([len(data) for data in encoded], out=text_offsets[1:])
+            return cls(terms, term_ptr, (pairs % max(len(chunks), 1)).astype(np.int32), tfs.astype(np.int32), lengths,
+                       np.array([page for page, _ in chunks], dtype=np.int32),
+                       np.frombuffer(b"".join(encoded), dtype=np.uint8), text_offsets)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def chunk_text(self, chunk: int) -> str:
+        return self.text_bytes[self.text_offsets[chunk]:self.text_offsets[chunk + 1]].tobytes().decode("utf-8")
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for `query`."""
+        scores = np.zeros(len(self), dtype=np.float64)
+        query_terms = np.unique(np.array(tokenize(query), dtype=TERM_DTYPE))
+        if not len(self.terms) or not len(query_terms):
+            return scores
+        positions = np.minimum(np.searchsorted(self.terms, query_terms), len(self.terms) - 1)
+        for term in positions[self.terms[positions] == query_terms]:
+            start, end = self.term_ptr[term], self.term_ptr[term + 1]
+            docs, tfs = self.doc_ids[start:end], self.tfs[start:end]
+            scores[docs] += self.idf[term] * tfs * (BM25_K1 + 1) / (tfs + self.norm[docs])
+        return scores
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K) -> List[Tuple[float, int, str]]:
+        """The `k` best chunks as (score, page_index, text), best first; chunks sharing no term are left out."""
+        with metrics.time_stage("retrieval.search", items=1):
+            scores = self.scores(query)
+            k = min(k, len(scores))
+            if not k:
+                return []
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind="stable")]
+            return [(float(scores[chunk]), int(self.pages[chunk]), self.chunk_text(chunk)) for chunk in best if scores[chunk] > 0]
+
+    def context(self, question: str, k: int = DEFAULT_TOP_K) -> str:
+        """Context for an answer call: the top-k chunks in document order, or the opening chunks if none match."""
+        scores = self.scores(question)
+        chosen = np.flatnonzero(scores > 0)
+        if len(chosen) > k:
+            chosen = np.sort(np.argpartition(-scores, k - 1)[:k])
+        elif not len(chosen):
+            chosen = np.arange(min(k, len(self)))
+        return "\n\n".join(self.chunk_text(chunk) for chunk in chosen)
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "wb") as output:
+            np.savez(output, version=np.array(INDEX_VERSION), terms=self.terms, term_ptr=self.term_ptr,
+                     doc_ids=self.doc_ids, tfs=self.tfs, lengths=self.lengths, pages=self.pages,
+                     text_bytes=self.text_bytes, text_offsets=self.text_offsets)
+        os.replace(temporary, path)  # readers never see a half-written index
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["RetrievalIndex"]:
+        """The index saved at `path`, or None if it is missing, unreadable or from another INDEX_VERSION."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != INDEX_VERSION:
+                    return None
+                return cls(data["terms"], data["term_ptr"], data["doc_ids"], data["tfs"], data["lengths"],
+                           data["pages"], data["text_bytes"], data["text_offsets"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    @classmethod
+    def for_document(cls, sha256: str, pages: Callable[[], List[str]],
+                     index_dir: str = DEFAULT_INDEX_DIR) -> "RetrievalIndex":
+        """Load the index of the document with content hash `sha256`, building and saving it on first use.
+        `pages` is only called when the index has to be built."""
+        path = Path(index_dir) / f"{sha256}.npz"
+        index = cls.load(path)
+        if index is None:
+            index = cls.build(chunk_document(pages()))
+            index.save(path)
+        return index
@@ -0,0 +1,226 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LIBRARY_FILES_PATH = "/studio/v1/library/files"
+LIBRARY_ANSWER_PATH = "/studio/v1/library/answer"
+SUMMARIZE_PATH = "/studio/v1/summarize"
+ANSWER_PATH = "/studio/v1/answer"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def make_document(name: str, path=None, labels=None, public_url=None) -> dict:
+    stamp = _now()
+    return {"fileId": str(uuid.uuid4()), "name": name, "path": path, "fileType": "text/plain", "sizeBytes": 0,
+            "labels": labels or [], "publicUrl": public_url, "createdBy": "stub", "creationDate": stamp,
+            "lastUpdated": stamp, "status": "PROCESSED"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients actually reuse connections
+    disable_nagle_algorithm = True  # headers and body go out in separate writes; don't wait on delayed ACKs
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _delay(self) -> None:
+        latency = self.server.latency + random.uniform(0, self.server.jitter)
+        if latency:
+            time.sleep(latency)
+
+    def _inject_error(self) -> bool:
+        """With probability error_rate, answer 429 (with Retry-After) or 500 instead of serving the request."""
+        if not self.server.error_rate or random.random() >= self.server.error_rate:
+            return False
+        with self.server.lock:
+            self.server.errors_injected += 1
+        status = random.choice((429, 500))
+        body = json.dumps({"detail": "Injected error"}).encode("utf-8")
+        self._delay()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def _read_body(self) -> bytes:
+        if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():  # streamed uploads
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if not size:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):  # trailers, then the final blank line
+                        pass
+                    return bytes(body)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self._delay()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):  # the client gave up, e.g. a cancelled prefetch
+            self.close_connection = True
+
+    def _file_id(self, path: str):
+        rest = path[len(LIBRARY_FILES_PATH):].strip("/")
+        return rest or None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self._read_body()
+        if self._inject_error():
+            return None
+        if not url.path.startswith(LIBRARY_FILES_PATH):
+            return self._send_json(404, {"detail": "Not found"})
+        store = self.server.documents
+        file_id = self._file_id(url.path)
+        if file_id:
+            doc = store.get(file_id)
+            return self._send_json(200, doc) if doc else self._send_json(404, {"detail": "File not found"})
+        query = parse_qs(url.query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["100"])[0])
+        with self.server.lock:
+            docs = list(store.values())[offset:offset + limit]
+        return self._send_json(200, docs)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self._read_body()
+        if self._inject_error():
+            return None
+        path = url.path.rstrip("/")
+        if path == SUMMARIZE_PATH:
+            source = json.loads(body or b"{}").get("source") or ""
+            return self._send_json(200, {"id": str(uuid.uuid4()), "summary": source[:200]})
+        if path in (ANSWER_PATH, LIBRARY_ANSWER_PATH):
+            question = json.loads(body or b"{}").get("question") or ""
+            return self._send_json(200, {"id": str(uuid.uuid4()), "answerInContext": True, "answer": f"Stub answer to: {question}"})
+        if path != LIBRARY_FILES_PATH:
+            return self._send_json(404, {"detail": "Not found"})
+        match = re.search(rb'filename="([^"]*)"', body)
+        labels = [label.decode("utf-8", "replace") for label in re.findall(rb'name="labels"\r\n\r\n([^\r]*)\r\n', body)]
+        doc = make_document(match.group(1).decode("utf-8", "replace") if match else "upload", labels=labels)
+        doc["sizeBytes"] = len(body)
+        with self.server.lock:
+            self.server.documents[doc["fileId"]] = doc
+        return self._send_json(200, doc["fileId"])
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        body = self._read_body()
+        if self._inject_error():
+            return None
+        file_id = self._file_id(url.path)
+        doc = self.server.documents.get(file_id) if file_id else None
+        if doc is None:
+            return self._send_json(404, {"detail": "File not found"})
+        update = json.loads(body or b"{}")
+        with self.server.lock:
+            if update.get("labels") is not None:
+                doc["labels"] = update["labels"]
+            if update.get("publicUrl") is not None:
+                doc["publicUrl"] = update["publicUrl"]
+            doc["lastUpdated"] = _now()
+        return self._send_json(200, None)
+
+    def do_DELETE(self):
+        url = urlparse(self.path)
+        self._read_body()
+        if self._inject_error():
+            return None
+        file_id = self._file_id(url.path)
+        with self.server.lock:
+            doc = self.server.documents.pop(file_id, None) if file_id else None
+        return self._send_json(200 if doc else 404, None)
+
+
+class StubServer:
+    """A local stand-in for the AI21 Studio endpoints (summarize, answer, library answer, library files),
+    run on a background thread. Every response is delayed by `latency` plus up to `jitter` seconds, and
+    a fraction `error_rate` of requests fail with 429 or 500.
+
+    Usage:
+        with StubServer(documents=500) as stub:
+            api = AI21LibraryAPI("key", base_url=stub.library_url)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, documents: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0):
+        self.httpd = ThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.jitter = jitter
+        self.httpd.error_rate = error_rate
+        self.httpd.errors_injected = 0
+        self.httpd.lock = threading.Lock()
+        self.httpd.documents = {}
+        for i in range(documents):
+            doc = make_document(f"doc_{i}.txt", path="/stub", labels=[f"batch{i % 10}"])
+            self.httpd.documents[doc["fileId"]] = doc
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def library_url(self) -> str:
+        return self.base_url + LIBRARY_FILES_PATH
+
+    @property
+    def library_answer_url(self) -> str:
+        return self.base_url + LIBRARY_ANSWER_PATH
+
+    @property
+    def summarize_url(self) -> str:
+        return self.base_url + SUMMARIZE_PATH
+
+    @property
+    def answer_url(self) -> str:
+        return self.base_url + ANSWER_PATH
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = StubServer(port=8021, documents=250)
+    print(f"Stub AI21 server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,13 +1,27 @@
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
-import configparser
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import os
+import time
 import httpx
 from rich.console import Console
 from rich.prompt import Prompt
 import PyPDF2  # pylint: disable=import-error
+import appConfig
+import pdfMemory
+import pdfSplitter
+from metrics import metrics
+from rateLimiter import SAFE_TO_RETRY, async_client, sync_client
+from responseCache import get_response_cache
+from textCache import PageTextCache
 
 console = Console()
 data_folder = "data"
+PARALLEL_PAGE_THRESHOLD = 200  # below this, process start-up costs more than it saves
+SUMMARIZE_MAX_CHARS = 50000  # largest source the summarize endpoint accepts
+SUMMARIZE_CHUNK_CHARS = 40000
 
 
 class U:  # Utilities
@@ -50,11 +64,19 @@ class U:  # Utilities
             except ValueError:
                 console.print("Please enter a valid number.")
 
+    @staticmethod
+    def display_chapters(chapters: List[Tuple[str, int, int]]) -> None:
+        """Display (title, start, end) chapters, numbered for select_chapters."""
+        console.print("Chapters:")
+        for i, (title, start, end) in enumerate(chapters):
+            console.print(f"{i + 1}. {title} (pages {start}-{end})")
+
     @staticmethod
     def read_pdf(file_path: Path):
-        """Open a PDF file and return a PdfReader object."""
+        """Open a PDF file and return a PdfReader object (memory-mapped in low-memory mode, see pdfMemory)."""
         try:
-            return PyPDF2.PdfReader(file_path, strict=False)
+            with metrics.time_stage("pdf.open"):
+                return pdfMemory.open_pdf(file_path)
         except FileNotFoundError:
             console.print(f"File '{file_path.name}' not found.")
         except PermissionError:
@@ -63,60 +85,395 @@ class U:  # Utilities
             console.print(f"Error: {inner_exception}")
 
     @staticmethod
-    def save_text_to_file(savetext, base_filename, start_page=None, end_page=None) -> None:
+    def save_text_to_file(savetext, base_filename, start_page=None, end_page=None, output_folder=None) -> bool:
+        """Write `savetext` to "<base_filename>[_<start>-<end>].txt"; returns whether the file was written."""
         try:
             filename_suffix = f"_{start_page}-{end_page}" if start_page is not None and end_page is not None else ""
             filename = Path(base_filename).stem + filename_suffix + ".txt"
+            if output_folder is not None:
+                filename = Path(output_folder) / filename
             with open(filename, 'w', encoding='utf-8') as file:
                 file.write(savetext)
             console.print(f"Text saved to {filename}")
+            return True
         except Exception as err:
             console.print(f"Error saving text: {err}")
+            return False
+
+
+def iter_page_texts(reader: PyPDF2.PdfReader, start_page: int = 0, end_page: Optional[int] = None,
+                    window: Optional[int] = None, failed: Optional[set] = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page_index, text) for each page in the range, one page at a time.
+    Args:reader (PyPDF2.PdfReader): PDF reader object.
+    start_page (int, optional): Start page index. Defaults to first page.
+    end_page (int, optional): End page index (exclusive). Defaults to last page.
+    window (int, optional): Release the reader's parsed objects every this many pages (low-memory mode).
+    failed (set, optional): Indices of pages that fail to extract are added here.
+    Yields:Tuple[int, str]: Page index and its text ("" for pages that fail to extract)."""
+    if reader is None:
+        return
+    total_pages = pdfMemory.page_count(reader)
+    end_page = min(end_page if end_page is not None else total_pages, total_pages)
+    yield from iter_selected_page_texts(reader, range(max(start_page, 0), end_page), window, failed)
+
 
+def iter_selected_page_texts(reader: PyPDF2.PdfReader, indices: Iterable[int], window: Optional[int] = None,
+                             failed: Optional[set] = None) -> Iterator[Tuple[int, str]]:
+    """Like iter_page_texts, for an arbitrary ascending selection of page indices."""
+    for i, page in pdfMemory.iter_windowed(reader, indices, window):
+        try:
+            yield i, page.extract_text() or ""
+        except Exception as inner_exception:
+            console.print(f"Error extracting text from page {i+1}: {inner_exception}")
+            if failed is not None:
+                failed.add(i)
+            yield i, ""
 
-def extract_text_from_pdf(reader: PyPDF2.PdfReader, start_page: int = 0, end_page: int = 999) -> str:
+
+def extract_text_from_pdf(reader: PyPDF2.PdfReader, start_page: int = 0, end_page: Optional[int] = None,
+                          window: Optional[int] = None) -> str:
     """Extract text from specified range of pages in a PDF file.
     Args:reader (PyPDF2.PdfReader): PDF reader object.
     start_page (int, optional): Start page number. Defaults to first page.
     end_page (int, optional): End page number. Defaults to last page.
+    window (int, optional): Release the reader's parsed objects every this many pages (low-memory mode).
     Returns:str: Concatenated text from the specified pages."""
+    with metrics.time_stage("pdf.extract") as stage:
+        texts = [text for _, text in iter_page_texts(reader, start_page, end_page, window)]
+        stage.items = len(texts)
+    return "".join(texts)
+
+
+_worker_readers = {}  # per-process: each worker parses the PDF once, not once per shard
+
+
+def _extract_page_range(file_path: str, start_page: int, end_page: int,
+                        window: Optional[int] = None) -> Tuple[List[str], List[int]]:
+    """Worker for extract_text_parallel: open the PDF in this process and extract one shard of pages.
+    Returns the shard's texts and the indices of pages that failed to extract."""
+    reader = _worker_readers.get(file_path)
     if reader is None:
-        return ""
+        reader = _worker_readers[file_path] = pdfMemory.open_pdf(file_path, low_memory=bool(window))
+    failed = set()
+    texts = [text for _, text in iter_page_texts(reader, start_page, end_page, window, failed)]
+    return texts, sorted(failed)
 
-    total_pages = len(reader.pages)
+
+def extract_text_parallel(file_path: Path, start_page: int = 0, end_page: Optional[int] = None,
+                          workers: Optional[int] = None, shard_size: int = 25,
+                          failed: Optional[set] = None) -> Iterator[Tuple[int, str]]:
+    """Extract pages across a process pool, yielding (page_index, text) in page order as shards finish.
+    Args:file_path (Path): PDF to read; each worker opens it itself since readers cannot be pickled.
+    start_page (int, optional): Start page index. Defaults to first page.
+    end_page (int, optional): End page index (exclusive). Defaults to last page.
+    workers (int, optional): Worker processes. Defaults to the CPU count.
+    shard_size (int, optional): Pages per task; smaller shards balance better, larger ones cost less overhead.
+    failed (set, optional): Indices of pages that fail to extract are added here.
+    Yields:Tuple[int, str]: Page index and its text."""
+    total_pages = pdfMemory.page_count(pdfMemory.open_pdf(file_path, low_memory=True))  # mapped: reads no pages
     end_page = min(end_page if end_page is not None else total_pages, total_pages)
-    text = ""
-    for i in range(start_page, end_page):
+    starts = range(start_page, end_page, shard_size)
+    ends = [min(start + shard_size, end_page) for start in starts]
+    windows = [pdfMemory.window_for(file_path)] * len(ends)  # low-memory mode applies in the workers too
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() returns shards in submission order, so pages come back in order even though workers race.
+        for shard_start, (texts, shard_failed) in zip(starts, pool.map(_extract_page_range, [str(file_path)] * len(ends),
+                                                                       starts, ends, windows)):
+            if failed is not None:
+                failed.update(shard_failed)
+            for offset, text in enumerate(texts):
+                yield shard_start + offset, text
+
+
+def extract_text_with_throughput(file_path: Path, start_page: int = 0, end_page: Optional[int] = None,
+                                 workers: Optional[int] = None) -> Tuple[str, float]:
+    """Extract a page range with extract_text_parallel and report throughput.
+    Returns:Tuple[str, float]: Concatenated text and pages per second."""
+    started = time.perf_counter()
+    with metrics.time_stage("pdf.extract_parallel") as stage:
+        texts = [text for _, text in extract_text_parallel(file_path, start_page, end_page, workers=workers)]
+        stage.items = len(texts)
+    elapsed = time.perf_counter() - started
+    pages_per_sec = len(texts) / elapsed if elapsed else float(len(texts))
+    console.print(f"Extracted {len(texts)} pages in {elapsed:.2f}s ({pages_per_sec:.1f} pages/sec)")
+    return "".join(texts), pages_per_sec
+
+
+_text_cache = None
+_text_cache_pid = None
+
+
+def get_text_cache() -> PageTextCache:
+    """This process's page text cache, opened on first use. Pool workers open their own, since an SQLite
+    connection inherited across fork() must not be used."""
+    global _text_cache, _text_cache_pid  # pylint: disable=global-statement
+    if _text_cache is None or _text_cache_pid != os.getpid():
+        _text_cache, _text_cache_pid = PageTextCache(), os.getpid()
+    return _text_cache
+
+
+# Keys that don't change what text a page yields: font programs (extraction reads only a font's encoding,
+# widths and ToUnicode map) and inherited back-links that would walk the whole page tree.
+_UNHASHED_KEYS = {"/FontFile", "/FontFile2", "/FontFile3", "/Parent", "/Length"}
+
+
+def _hash_pdf_object(digest, obj, seen: set) -> None:
+    """Feed `obj` into `digest`, resolving indirect references and hashing streams by their decoded data.
+    An object reached a second time (shared, or a reference cycle) adds only a marker."""
+    if isinstance(obj, PyPDF2.generic.IndirectObject):
+        if (obj.idnum, obj.generation) in seen:
+            digest.update(b"@")
+            return
+        seen.add((obj.idnum, obj.generation))
+        obj = obj.get_object()
+    if isinstance(obj, dict):
+        digest.update(b"<<")
+        for key in sorted(obj):
+            if key not in _UNHASHED_KEYS:
+                digest.update(f"{key} ".encode("utf-8"))
+                _hash_pdf_object(digest, obj[key], seen)
+        digest.update(b">>")
+        if isinstance(obj, PyPDF2.generic.StreamObject) and obj.get("/Subtype") != "/Image":  # images hold no text
+            digest.update(obj.get_data())
+    elif isinstance(obj, list):
+        digest.update(b"[")
+        for item in obj:
+            _hash_pdf_object(digest, item, seen)
+        digest.update(b"]")
+    else:
+        digest.update(f"{type(obj).__name__}:{obj!r};".encode("utf-8"))
+
+
+def page_content_hash(page) -> Optional[str]:
+    """Hash of what a page's text is extracted from: its content streams and its whole /Resources tree,
+    including the fonts' encodings and ToUnicode maps and the form XObjects it draws.
+    Unchanged pages of a revised PDF keep their hash even though the file's hash changes.
+    Returns None when the page cannot be hashed, so that it is neither matched nor cached."""
+    digest = hashlib.sha256()
+    try:
+        contents = page.get_contents()
+        digest.update(contents.get_data() if contents is not None else b"")
+        _hash_pdf_object(digest, page["/Resources"] if "/Resources" in page else {}, set())
+    except Exception as err:
+        console.print(f"Error hashing page contents: {err}")
+        return None
+    return digest.hexdigest()
+
+
+def cached_page_count(file_path: Path, cache: Optional[PageTextCache] = None) -> int:
+    """Page count of the PDF, from the cache when this exact file content has been seen before."""
+    cache = cache or get_text_cache()
+    with metrics.time_stage("pdf.hash"):
+        sha256 = cache.content_hash(file_path)
+    page_count = cache.page_count(sha256)
+    if page_count is None:
+        reader = U.read_pdf(file_path)
+        page_count = pdfMemory.page_count(reader) if reader else 0
+        cache.set_page_count(sha256, page_count)
+    return page_count
+
+
+def cached_outline(file_path: Path, cache: Optional[PageTextCache] = None) -> List[Tuple[int, str, int]]:
+    """Outline entries of the PDF as (depth, title, 0-based first page), see pdfSplitter.outline_entries.
+    The outline is resolved once per file content and then served from the page text cache."""
+    cache = cache or get_text_cache()
+    with metrics.time_stage("pdf.hash"):
+        sha256 = cache.content_hash(file_path)
+    entries = cache.outline(sha256)
+    if entries is None:
+        reader = U.read_pdf(file_path)
+        if reader is None:
+            return []
         try:
-            page_text = reader.pages[i].extract_text() or ""
-            text += page_text
-        except Exception as inner_exception:
-            console.print(f"Error extracting text from page {i+1}: {inner_exception}")
-    return text
+            entries = pdfSplitter.outline_entries(reader)
+        except Exception as err:
+            console.print(f"Error reading the outline of {Path(file_path).name}: {err}")
+            return []
+        cache.set_outline(sha256, entries)
+        if cache.page_count(sha256) is None:  # chapter ranges need it next; the file is already open
+            cache.set_page_count(sha256, pdfMemory.page_count(reader))
+    return entries
+
+
+def cached_chapters(file_path: Path, level: int = 1, cache: Optional[PageTextCache] = None) -> List[Tuple[str, int, int]]:
+    """Chapters at outline depth `level` as (title, start, end), 1-based and inclusive, without parsing the
+    PDF again once its outline and page count are cached."""
+    return pdfSplitter.chapter_ranges(cached_outline(file_path, cache), cached_page_count(file_path, cache), level)
+
+
+def select_chapters(chapters: List[Tuple[str, int, int]], selection: str) -> List[Tuple[str, int, int]]:
+    """The chapters named by `selection`, in document order: comma-separated 1-based chapter numbers,
+    number ranges ("2-4"), or case-insensitive parts of chapter titles.
+    Args:chapters (List[Tuple[str, int, int]]): (title, start, end) as returned by cached_chapters.
+    selection (str): e.g. "1, 3-4, appendix".
+    Returns:List[Tuple[str, int, int]]: Matching chapters; selectors matching nothing are reported."""
+    chosen = set()
+    for selector in filter(None, (part.strip() for part in selection.split(","))):
+        first, dash, last = selector.partition("-")
+        if first.strip().isdigit() and (not dash or last.strip().isdigit()):
+            numbers = range(int(first), int(last or first) + 1)
+            matches = {number - 1 for number in numbers if 1 <= number <= len(chapters)}
+        else:
+            matches = {i for i, (title, _, _) in enumerate(chapters) if selector.lower() in title.lower()}
+        if not matches:
+            console.print(f"No chapter matches '{selector}'.")
+        chosen |= matches
+    return [chapters[i] for i in sorted(chosen)]
+
+
+def extract_pages_cached(file_path: Path, start_page: int = 0, end_page: Optional[int] = None,
+                         cache: Optional[PageTextCache] = None, allow_parallel: bool = True) -> List[str]:
+    """Extract per-page text, serving pages from the on-disk cache where possible.
+    Pages missing from the cache are matched by page content hash, so pages a revised file shares with an
+    earlier version are reused; only the rest are parsed (in a process pool for large gaps) and stored.
+    Args:file_path (Path): PDF file.
+    start_page (int, optional): Start page index. Defaults to first page.
+    end_page (int, optional): End page index (exclusive). Defaults to last page.
+    allow_parallel (bool, optional): Set False inside pool workers, which cannot start a pool of their own.
+    Returns:List[str]: Text of each page in the range, in order."""
+    cache = cache or get_text_cache()
+    total_pages = cached_page_count(file_path, cache)
+    start_page = max(start_page, 0)  # a negative index would wrap around to the last pages
+    end_page = min(end_page if end_page is not None else total_pages, total_pages)
+    sha256 = cache.content_hash(file_path)
+    with metrics.time_stage("pdf.cache_lookup") as stage:
+        pages = cache.get_pages(sha256, start_page, end_page)
+        stage.items = len(pages)
+    missing = [i for i in range(start_page, end_page) if i not in pages]
+    if missing:
+        # A revised file has a new hash, but most of its pages are unchanged: find those by page content
+        # and only extract pages whose text has never been seen.
+        reader = U.read_pdf(file_path)
+        window = pdfMemory.window_for(file_path)
+        with metrics.time_stage("pdf.page_hash", items=len(missing)):
+            content_shas = {i: page_content_hash(page) for i, page in pdfMemory.iter_windowed(reader, missing, window)}
+        known = cache.texts_by_content(content_sha for content_sha in content_shas.values() if content_sha)
+        reused = [(i, content_shas[i]) for i in missing if content_shas[i] in known]
+        cache.link_pages(sha256, reused)
+        pages.update((i, known[content_sha]) for i, content_sha in reused)
+        missing = [i for i in missing if i not in pages]
+    if missing:
+        first, last = missing[0], missing[-1] + 1
+        parallel = allow_parallel and len(missing) >= PARALLEL_PAGE_THRESHOLD
+        failed = set()
+        with metrics.time_stage("pdf.extract_parallel" if parallel else "pdf.extract") as stage:
+            if parallel:
+                extracted = ((i, text) for i, text in extract_text_parallel(file_path, first, last, failed=failed)
+                             if i in content_shas)
+            else:
+                extracted = iter_selected_page_texts(reader, missing, window, failed)
+            new_pages = [(i, content_shas[i], text) for i, text in extracted if i not in pages]
+            stage.items = len(new_pages)
+        with metrics.time_stage("pdf.cache_store", items=len(new_pages)):
+            # pages that raised come back as "" this time, and pages that could not be hashed have no key:
+            # neither is stored, so the next call extracts them again
+            cache.put_pages(sha256, [page for page in new_pages if page[0] not in failed and page[1]])
+        pages.update((i, text) for i, _, text in new_pages)
+    return [pages[i] for i in range(start_page, end_page)]
+
+
+def extract_text_cached(file_path: Path, start_page: int = 0, end_page: Optional[int] = None,
+                        cache: Optional[PageTextCache] = None) -> str:
+    """Like extract_text_from_pdf, but through the page text cache (see extract_pages_cached)."""
+    return "".join(extract_pages_cached(file_path, start_page, end_page, cache))
+
+
+def _split_oversized(text: str, max_chars: int) -> List[str]:
+    """Break one unit that is too big into paragraphs, then lines, then hard cuts as a last resort."""
+    if len(text) <= max_chars:
+        return [text]
+    for separator in ("\n\n", "\n"):
+        parts = text.split(separator)
+        if len(parts) > 1:
+            pieces = [part + separator for part in parts[:-1]] + [parts[-1]]
+            return [unit for piece in pieces for unit in _split_oversized(piece, max_chars)]
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def chunk_pages(pages: List[str], max_chars: int = SUMMARIZE_CHUNK_CHARS, max_items: Optional[int] = None) -> List[str]:
+    """Pack consecutive pages (or paragraphs, or summaries) into chunks of at most max_chars characters.
+    Units are only split when a single one is larger than max_chars, and then on paragraph boundaries.
+    Args:pages (List[str]): Units of text in document order.
+    max_chars (int, optional): Upper bound on chunk length.
+    max_items (int, optional): Upper bound on units per chunk.
+    Returns:List[str]: Chunks in document order."""
+    chunks, current, current_len, current_items = [], [], 0, 0
+    for unit in (piece for page in pages for piece in _split_oversized(page, max_chars)):
+        if current and (current_len + len(unit) > max_chars or (max_items and current_items >= max_items)):
+            chunks.append("".join(current))
+            current, current_len, current_items = [], 0, 0
+        current.append(unit)
+        current_len += len(unit)
+        current_items += 1
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def _cuts_after(unit: str, period: int) -> bool:
+    digest = hashlib.sha256(unit.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % period == 0
+
+
+def chunk_pages_stable(pages: List[str], max_chars: int = SUMMARIZE_CHUNK_CHARS, period: Optional[int] = None) -> List[str]:
+    """Like chunk_pages, but chunk boundaries are chosen by content so they survive edits elsewhere.
+    A chunk ends after a unit whose hash is divisible by `period` (or before it would exceed max_chars), so
+    changing one page only changes the chunk(s) around it; greedy packing would shift every later boundary,
+    and with it every later (cached) summary request.
+    Args:pages (List[str]): Units of text in document order.
+    max_chars (int, optional): Upper bound on chunk length.
+    period (int, optional): Average units per chunk. Defaults to the largest power of two of median-length
+    units that fits in max_chars; rounding to a power of two keeps it unchanged by small edits.
+    Returns:List[str]: Chunks in document order."""
+    units = [piece for page in pages for piece in _split_oversized(page, max_chars)]
+    if period is None:
+        typical = sorted(len(unit) for unit in units)[len(units) // 2] if units else 0
+        period = 1 << max(0, int(max_chars / max(typical, 1)).bit_length() - 1)
+    chunks, current, current_len = [], [], 0
+    for unit in units:
+        if current and current_len + len(unit) > max_chars:
+            chunks.append("".join(current))
+            current, current_len = [], 0
+        current.append(unit)
+        current_len += len(unit)
+        if _cuts_after(unit, period):
+            chunks.append("".join(current))
+            current, current_len = [], 0
+    if current:
+        chunks.append("".join(current))
+    return chunks
 
 
 class summarizeAPI:
+    API_URL = "https://api.ai21.com/studio/v1/summarize"
+    CONFIG_FILE = r'F:\_ai\_scripts\TextSummarizer\config\config.ini'
+
+    @staticmethod
+    def get_api_key() -> str:
+        key = appConfig.api_key(summarizeAPI.CONFIG_FILE, 'KEY', 'API_KEY')
+        if not key:
+            console.print("API key not found in config.ini.")
+        return key
 
     @staticmethod
     def summarize_text(selected_text: str, focusinput: str) -> str:
         """Summarize the selected text using an API call.
         Args:selected_text (str): The text to be summarized.
         Returns:str: The summarized text."""
-        configfile = r'F:\_ai\_scripts\TextSummarizer\config\config.ini'
-        config = configparser.ConfigParser()
-        try:
-            config.read(configfile)
-            api_key = config['KEY']['API_KEY']
-        except KeyError:
-            console.print("API key not found in config.ini.")
+        api_key = summarizeAPI.get_api_key()
+        if not api_key:
             return ""
-        api_url = "https://api.ai21.com/studio/v1/summarize"
         payload = {"sourceType": "TEXT", "source": selected_text, "focus": focusinput}
         headers = {"accept": "application/json", "content-type": "application/json", "Authorization": f"Bearer {api_key}"}
-        try:
-            response = httpx.post(api_url, json=payload, headers=headers, timeout=60)
+
+        def request() -> dict:
+            response = sync_client("summarize").post(summarizeAPI.API_URL, json=payload, headers=headers, timeout=60,
+                                                     extensions=SAFE_TO_RETRY)
             response.raise_for_status()
-            summary_data = response.json()  # Parse the response as JSON
+            return response.json()  # Parse the response as JSON
+
+        try:
+            summary_data = get_response_cache().call(summarizeAPI.API_URL, payload, request)
             summary = summary_data.get("summary", "No summary provided.")  # Extract the summary from the JSON
             console.print("\nSummary: ", summary)
             return summary
@@ -126,28 +483,170 @@ class summarizeAPI:
             console.print(f"HTTP error: {http_error}")
         return ""
 
+    @staticmethod
+    async def summarize_text_async(client: httpx.AsyncClient, selected_text: str, focusinput: str) -> str:
+        """Async variant of summarize_text for use with a shared client; errors are logged and return ""."""
+        payload = {"sourceType": "TEXT", "source": selected_text, "focus": focusinput}
+
+        async def request() -> dict:
+            response = await client.post(summarizeAPI.API_URL, json=payload, extensions=SAFE_TO_RETRY)
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            summary_data = await get_response_cache().acall(summarizeAPI.API_URL, payload, request)
+            return summary_data.get("summary", "")
+        except httpx.RequestError as request_error:
+            console.print(f"Request error: {request_error}")
+        except httpx.HTTPStatusError as http_error:
+            console.print(f"HTTP error: {http_error}")
+        return ""
+
+    @staticmethod
+    async def summarize_map_reduce(pages: List[str], focusinput: str, max_chars: int = SUMMARIZE_CHUNK_CHARS,
+                                   fan_out: int = 8, concurrency: int = 4,
+                                   client: Optional[httpx.AsyncClient] = None) -> str:
+        """Summarize text of any length: summarize size-bounded chunks concurrently, then repeatedly
+        summarize groups of about fan_out summaries until one remains. Every level keeps the same focus.
+        Args:pages (List[str]): Page (or paragraph) texts in document order.
+        focusinput (str): What the summary should focus on.
+        max_chars (int, optional): Largest source sent in one request.
+        fan_out (int, optional): Average summaries combined per reduce request.
+        concurrency (int, optional): Requests in flight at once.
+        client (httpx.AsyncClient, optional): Client to reuse, e.g. from summarize_client(); one is opened if omitted.
+        Returns:str: The combined summary, or "" if any chunk could not be summarized."""
+        if client is None:
+            client = summarizeAPI.summarize_client(concurrency)
+            if client is None:
+                return ""
+            async with client:
+                return await summarizeAPI.summarize_map_reduce(pages, focusinput, max_chars, fan_out, concurrency, client)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def summarize(chunk: str) -> str:
+            async with semaphore:
+                return await summarizeAPI.summarize_text_async(client, chunk, focusinput)
+
+        # Stable chunking at every level means a revised document re-sends only the requests covering what
+        # changed; the rest are answered by the response cache.
+        chunks = [chunk for chunk in chunk_pages_stable(pages, max_chars) if chunk.strip()]  # e.g. scanned pages
+        level = 0
+        while True:
+            cache_misses = get_response_cache().misses
+            summaries = await asyncio.gather(*(summarize(chunk) for chunk in chunks))
+            console.log(f"Summarized level {level}: {len(chunks)} chunks -> {len(summaries)} summaries "
+                        f"({get_response_cache().misses - cache_misses} requested, the rest reused)")
+            failed = [i + 1 for i, summary in enumerate(summaries) if not summary]
+            if failed:  # a summary without those chunks would silently leave part of the document out
+                console.log(f"Summarizing failed for {len(failed)} of {len(chunks)} chunks at level {level} "
+                            f"(chunks {', '.join(map(str, failed))}); no summary returned")
+                return ""
+            if len(summaries) <= 1:
+                return summaries[0] if summaries else ""
+            separated = [summary + "\n\n" for summary in summaries]
+            next_chunks = chunk_pages_stable(separated, max_chars, period=fan_out)
+            if len(next_chunks) >= len(summaries):  # summaries too long to pack; pair them so each level shrinks
+                next_chunks = ["".join(separated[i:i + 2]) for i in range(0, len(separated), 2)]
+            chunks = next_chunks
+            level += 1
+
+    @staticmethod
+    def summarize_client(concurrency: int = 4) -> Optional[httpx.AsyncClient]:
+        """A throttled AsyncClient carrying the API key, or None when no key is configured."""
+        api_key = summarizeAPI.get_api_key()
+        if not api_key:
+            return None
+        headers = {"accept": "application/json", "content-type": "application/json", "Authorization": f"Bearer {api_key}"}
+        return async_client("summarize", headers=headers, timeout=60, limits=httpx.Limits(max_connections=concurrency))
+
+    @staticmethod
+    def summarize_long_text(pages: List[str], focusinput: str, **options) -> str:
+        """Blocking wrapper around summarize_map_reduce that prints the result like summarize_text."""
+        summary = asyncio.run(summarizeAPI.summarize_map_reduce(pages, focusinput, **options))
+        console.print("\nSummary: ", summary)
+        return summary
+
+
+def summarize_pages(pages: List[str], focusinput: str) -> str:
+    """Summarize in one request when the text fits, otherwise through the map-reduce pipeline."""
+    if sum(len(page) for page in pages) <= SUMMARIZE_MAX_CHARS:
+        return summarizeAPI.summarize_text("".join(pages), focusinput)
+    return summarizeAPI.summarize_long_text(pages, focusinput)
+
+
+async def summarize_pages_async(client: httpx.AsyncClient, pages: List[str], focusinput: str) -> str:
+    """Async summarize_pages on a shared client: one request when the text fits, map-reduce otherwise."""
+    if sum(len(page) for page in pages) <= SUMMARIZE_MAX_CHARS:
+        return await summarizeAPI.summarize_text_async(client, "".join(pages), focusinput)
+    return await summarizeAPI.summarize_map_reduce(pages, focusinput, client=client)
+
+
+async def summarize_chapters(file_path: Path, chapters: List[Tuple[str, int, int]], focusinput: str = "",
+                             output_folder: Optional[str] = None, concurrency: int = 4) -> Dict[str, List[str]]:
+    """Summarize chapters of one PDF into one file each, "<stem>_<NNN>_<title>.txt" with NNN the chapter's
+    position in `chapters`, so chapters that share pages still get a file each.
+    Only the chapters' pages are extracted (through the page text cache), and chapters are summarized
+    concurrently on one client.
+    Args:file_path (Path): The PDF.
+    chapters (List[Tuple[str, int, int]]): (title, start, end), 1-based and inclusive; see select_chapters.
+    focusinput (str, optional): Focus passed to every summary.
+    output_folder (str, optional): Where the summaries go. Defaults to the current folder.
+    concurrency (int, optional): Summary requests in flight at once.
+    Returns:Dict[str, List[str]]: Titles of the chapters that were summarized and saved, or failed."""
+    results = {"summarized": [], "failed": []}
+    client = summarizeAPI.summarize_client(concurrency)
+    if client is None:
+        results["failed"] = [title for title, _, _ in chapters]
+        return results
+    file_path = Path(file_path)
+    chapter_pages = [(chapter, extract_pages_cached(file_path, chapter[1] - 1, chapter[2])) for chapter in chapters]
+
+    async def summarize_one(index: int, chapter: Tuple[str, int, int], pages: List[str]) -> None:
+        title, start, end = chapter
+        try:
+            summary = await summarize_pages_async(client, pages, focusinput)
+        except Exception as err:
+            console.print(f"Error summarizing {title}: {err}")
+            summary = ""
+        saved = bool(summary) and U.save_text_to_file(
+            summary, pdfSplitter.part_filename(file_path.stem, index, start, end, title), output_folder=output_folder)
+        results["summarized" if saved else "failed"].append(title)
+
+    async with client:
+        await asyncio.gather(*(summarize_one(index, chapter, pages)
+                               for index, (chapter, pages) in enumerate(chapter_pages)))
+    return results
+
 
 class contextualAPI:
+    API_URL = "https://api.ai21.com/studio/v1/answer"
+
+    @staticmethod
+    def get_api_key() -> str:
+        key = appConfig.api_key('config.ini', 'KEY', 'APIKEY')
+        if not key:
+            console.print("API key not found in config.ini.")
+        return key
 
     @staticmethod
     def get_contextual_answer(context: str, question: str) -> str:
         """Get answer to a question based on the provided context using AI21 API."""
-        config = configparser.ConfigParser()
-        try:
-            config.read('config.ini')
-            api_key = config['KEY']['APIKEY']
-        except KeyError:
-            console.print("API key not found in config.ini.")
+        api_key = contextualAPI.get_api_key()
+        if not api_key:
             return ""
 
-        api_url = "https://api.ai21.com/studio/v1/answer"
         payload = {"context": context, "question": question}
         headers = {"accept": "application/json", "content-type": "application/json", "Authorization": f"Bearer {api_key}"}
 
-        try:
-            response = httpx.post(api_url, json=payload, headers=headers)
+        def request() -> dict:
+            response = sync_client("answer").post(contextualAPI.API_URL, json=payload, headers=headers,
+                                                  extensions=SAFE_TO_RETRY)
             response.raise_for_status()
-            answer_data = response.json()
+            return response.json()
+
+        try:
+            answer_data = get_response_cache().call(contextualAPI.API_URL, payload, request)
             answer = answer_data.get("answer", "Answer not found.")
             console.print("\nAnswer: ", answer)
             return answer
@@ -157,9 +656,131 @@ class contextualAPI:
             console.print(f"HTTP error: {http_error}")
         return ""
 
+    @staticmethod
+    def answer_from_pdf(file_path: Path, question: str, top_k: Optional[int] = None,
+                        chapters: Optional[List[Tuple[str, int, int]]] = None) -> str:
+        """Answer a question from one PDF, sending only its most relevant chunks as context.
+        The document's BM25 index is built on first use and reused by every later question.
+        Args:file_path (Path): The PDF to answer from.
+        question (str): The question.
+        top_k (int, optional): Chunks to send. Defaults to retrievalIndex.DEFAULT_TOP_K.
+        chapters (List[Tuple[str, int, int]], optional): Only search these chapters (see select_chapters);
+        only their pages are extracted, and they get an index of their own.
+        Returns:str: The answer, or "" on failure."""
+        from retrievalIndex import DEFAULT_TOP_K, RetrievalIndex  # NumPy is only needed for document Q&A
+        key = get_text_cache().content_hash(file_path)
+        ranges = [(start - 1, end) for _, start, end in chapters] if chapters else [(0, None)]
+        if chapters:  # a selection of pages is indexed, and cached, separately from the whole document
+            key += "_" + hashlib.sha256(repr(ranges).encode("utf-8")).hexdigest()[:16]
+        index = RetrievalIndex.for_document(key, lambda: [page for start, end in ranges
+                                                          for page in extract_pages_cached(file_path, start, end)])
+        return contextualAPI.get_contextual_answer(index.context(question, top_k or DEFAULT_TOP_K), question)
+
+
+def _pipeline_extract(file_path: str) -> List[str]:
+    """Process-pool worker for summarize_folder; each worker process uses its own handle on the page cache."""
+    return extract_pages_cached(Path(file_path), allow_parallel=False)
+
+
+def _summary_is_current(pdf_path: Path, summary_path: Path) -> bool:
+    """Whether summary_path exists and was written after pdf_path last changed, so a revised PDF is redone."""
+    try:
+        return summary_path.stat().st_mtime_ns >= pdf_path.stat().st_mtime_ns
+    except OSError:
+        return False
+
+
+async def summarize_folder(folder: str = data_folder, focusinput: str = "", output_folder: Optional[str] = None,
+                           extract_workers: Optional[int] = None, summarize_concurrency: int = 4,
+                           queue_size: int = 4, skip_existing: bool = True) -> Dict[str, List[str]]:
+    """Summarize every PDF in a folder without prompts, as a three-stage pipeline.
+
+    Extraction runs in a process pool, summarization as async requests, and file writes in a thread;
+    the stages are joined by bounded queues, so CPU and network work overlap and at most about
+    extract_workers + 2 * queue_size documents are held in memory at once.
+    Args:folder (str, optional): Folder to scan for *.pdf. Defaults to the data folder.
+    focusinput (str, optional): Focus passed to every summary.
+    output_folder (str, optional): Where "<stem>.txt" summaries go. Defaults to the input folder.
+    extract_workers (int, optional): Extraction processes. Defaults to the CPU count.
+    summarize_concurrency (int, optional): Documents being summarized at once.
+    queue_size (int, optional): Capacity of each queue between stages.
+    skip_existing (bool, optional): Skip PDFs whose summary file exists and is newer than the PDF.
+    Returns:Dict[str, List[str]]: Paths that were summarized, skipped, or failed; with no API key, every PDF
+    is failed.
+    Raises:FileNotFoundError: `folder` does not exist."""
+    folder = Path(folder)
+    if not folder.is_dir():
+        raise FileNotFoundError(f"Folder '{folder}' not found.")
+    output_folder = Path(output_folder or folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    results = {"summarized": [], "skipped": [], "failed": []}
+    client = summarizeAPI.summarize_client(summarize_concurrency)
+    if client is None:
+        results["failed"] = [str(path) for path in sorted(folder.glob("*.pdf"))]
+        return results
+    workers = extract_workers or os.cpu_count() or 1
+    extracted: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    summarized: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    loop = asyncio.get_running_loop()
+
+    async def extract_stage(pool: ProcessPoolExecutor) -> None:
+        slots = asyncio.Semaphore(workers)
+
+        async def extract_one(path: Path) -> None:
+            try:
+                pages = await loop.run_in_executor(pool, _pipeline_extract, str(path))
+                await extracted.put((path, pages))  # blocks while summarizers are behind: backpressure
+            except Exception as err:
+                console.print(f"Error extracting {path.name}: {err}")
+                results["failed"].append(str(path))
+            finally:
+                slots.release()
+
+        tasks = []
+        for path in sorted(folder.glob("*.pdf")):
+            if skip_existing and _summary_is_current(path, output_folder / f"{path.stem}.txt"):
+                results["skipped"].append(str(path))
+                continue
+            await slots.acquire()
+            tasks.append(asyncio.create_task(extract_one(path)))
+        await asyncio.gather(*tasks)
+        for _ in range(summarize_concurrency):
+            await extracted.put(None)
+
+    async def summarize_stage() -> None:
+        while (item := await extracted.get()) is not None:
+            path, pages = item
+            try:
+                summary = await summarize_pages_async(client, pages, focusinput)
+            except Exception as err:
+                console.print(f"Error summarizing {path.name}: {err}")
+                summary = ""
+            if summary:
+                await summarized.put((path, summary))
+            else:
+                results["failed"].append(str(path))
+
+    async def write_stage() -> None:
+        while (item := await summarized.get()) is not None:
+            path, summary = item
+            saved = await asyncio.to_thread(U.save_text_to_file, summary, path.stem, output_folder=output_folder)
+            results["summarized" if saved else "failed"].append(str(path))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=pdfMemory.use_low_memory,
+                             initargs=(pdfMemory.low_memory_enabled(),)) as pool:
+        async with client:
+            writer = asyncio.create_task(write_stage())
+            summarizers = [asyncio.create_task(summarize_stage()) for _ in range(summarize_concurrency)]
+            await extract_stage(pool)
+            await asyncio.gather(*summarizers)
+            await summarized.put(None)
+            await writer
+    return results
+
 
 def main() -> None:
-    api_option = Prompt.ask("Select API option:\n 1. Summarize Text\n 2. Get Contextual Answer")
+    api_option = Prompt.ask("Select API option:\n 1. Summarize Text\n 2. Get Contextual Answer\n"
+                            " 3. Summarize every PDF in the data folder")
     if api_option == "1":
         files = U.get_files_in_folder(data_folder)
         if not files:
@@ -172,19 +793,19 @@ def main() -> None:
             return
 
         console.print(f"Selected file: {selected_file.name}")
-        pdf_reader = U.read_pdf(selected_file)
-        if not pdf_reader:
+        total_pages = cached_page_count(selected_file)
+        if not total_pages:
             return
-        total_pages = len(pdf_reader.pages)
         console.print(f"Total number of pages: {total_pages}")
 
-        option = Prompt.ask("Options:\n 1. Use entire PDF as source\n 2. Select specific pages as source")
+        option = Prompt.ask("Options:\n 1. Use entire PDF as source\n 2. Select specific pages as source\n"
+                            " 3. Select chapters as source")
 
         if option == "1":
             try:
-                all_text = extract_text_from_pdf(pdf_reader)
+                pages = extract_pages_cached(selected_file)
                 focusinput = input("Enter what should AI focus on from the source: ")
-                summarized_text = summarizeAPI.summarize_text(all_text, focusinput)
+                summarized_text = summarize_pages(pages, focusinput)
                 U.save_text_to_file(summarized_text, selected_file.stem)
             except Exception as er:
                 console.print(f"Error: {er}")
@@ -193,24 +814,57 @@ def main() -> None:
             try:
                 start_page = int(Prompt.ask("Enter the start page number:"))
                 end_page = int(Prompt.ask("Enter the end page number:"))
-                all_text = extract_text_from_pdf(pdf_reader, start_page - 1, end_page)
+                pages = extract_pages_cached(selected_file, start_page - 1, end_page)
                 focusinput = input("Enter what should AI focus on from the source: ")
-                summarized_text = summarizeAPI.summarize_text(all_text, focusinput)
+                summarized_text = summarize_pages(pages, focusinput)
                 U.save_text_to_file(summarized_text, f"{selected_file.stem}_{start_page}-{end_page}")
             except Exception as err:
                 console.print(f"Error: {err}")
                 return
+        elif option == "3":
+            chapters = cached_chapters(selected_file)
+            if not chapters:
+                console.print("This PDF has no outline to select chapters from.")
+                return
+            U.display_chapters(chapters)
+            chapters = select_chapters(chapters, Prompt.ask("Chapters to summarize (e.g. 1, 3-4, appendix)"))
+            if not chapters:
+                return
+            focusinput = input("Enter what should AI focus on from the source: ")
+            results = asyncio.run(summarize_chapters(selected_file, chapters, focusinput))
+            console.print(f"Summarized: {len(results['summarized'])}, failed: {len(results['failed'])}")
         else:
             console.print("Invalid option selected.")
             return
     elif api_option == "2":
+        files = U.get_files_in_folder(data_folder)
+        if not files:
+            return
+        U.display_files(files)
+        selected_file = U.select_file(files)
+        if not selected_file:
+            console.print("File selection cancelled.")
+            return
         try:
-            all_text = extract_text_from_pdf(pdf_reader)
+            chapters = cached_chapters(selected_file)
+            if chapters:
+                U.display_chapters(chapters)
+                selection = Prompt.ask("Chapters to search (leave empty for the whole PDF)", default="")
+                chapters = select_chapters(chapters, selection) if selection else None
             question = input("Enter your question: ")
-            get_contextual_answer(all_text, question)
+            contextualAPI.answer_from_pdf(selected_file, question, chapters=chapters or None)
         except Exception as err:
             console.print(f"Error: {err}")
             return
+    elif api_option == "3":
+        focusinput = input("Enter what should AI focus on from the sources: ")
+        try:
+            results = asyncio.run(summarize_folder(data_folder, focusinput))
+        except FileNotFoundError as err:
+            console.print(f"Error: {err}")
+            return
+        console.print(f"Summarized: {len(results['summarized'])}, skipped: {len(results['skipped'])}, "
+                      f"failed: {len(results['failed'])}")
     else:
         console.print("Invalid API option selected.")
         return
@@ -219,5 +873,6 @@ def main() -> None:
 if __name__ == "__main__":
     try:
         main()
+        console.log(f"Response cache: {get_response_cache().stats()}")
     except Exception as e:
         console.print(f"Error: {e}")
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+import benchmark
+from apiController import AI21LibraryAPI, content_label
+from fileHash import file_sha256
+from stubServer import StubServer
+
+
+@pytest.fixture
+def stub():
+    with StubServer() as stub:
+        yield stub
+
+
+def library_api(stub):
+    return AI21LibraryAPI("test-key", base_url=stub.library_url, http2=False)
+
+
+def bulk_upload(stub, folder, manifest):
+    async def run():
+        async with library_api(stub) as api:
+            return await api.bulk_upload_folder(folder, manifest_path=manifest)
+    return asyncio.run(run())
+
+
+def test_bulk_upload_dedups_on_content_not_name_and_size(stub, tmp_path):
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    (folder / "a.txt").write_text("version 1")
+    assert len(bulk_upload(stub, folder, tmp_path / "first.jsonl")["uploaded"]) == 1
+    labels = [doc["labels"] for doc in stub.httpd.documents.values()]
+    assert labels == [[content_label(file_sha256(folder / "a.txt"))]]
+
+    # another machine (no shared manifest) sees the same content in the library and skips it
+    assert len(bulk_upload(stub, folder, tmp_path / "second.jsonl")["skipped"]) == 1
+    # same name and size, different content: uploaded
+    (folder / "a.txt").write_text("version 2")
+    assert len(bulk_upload(stub, folder, tmp_path / "third.jsonl")["uploaded"]) == 1
+
+
+def test_upload_pdf_parts_fails_bad_ranges_and_uploads_the_rest(stub, tmp_path):
+    pdf = benchmark.make_sample_pdf(tmp_path / "doc.pdf", pages=10, lines_per_page=1)
+
+    async def run():
+        async with library_api(stub) as api:
+            return await api.upload_pdf_parts(pdf, [(1, 3), (50, 60), (4, 5), (0, 2)])
+
+    results = asyncio.run(run())
+    assert sorted(results["uploaded"]) == ["doc_1-3.pdf", "doc_4-5.pdf"]
+    assert sorted(results["failed"]) == ["doc_0-2.pdf", "doc_50-60.pdf"]
+    assert len(stub.httpd.documents) == 2
@@ -0,0 +1,36 @@
+import pytest
+
+import apiController
+import cli
+import rateLimiter
+from stubServer import StubServer
+
+
+@pytest.fixture
+def library_stub(monkeypatch, tmp_path):
+    """cli library commands against a stub server that fails every request it is sent."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AI21_API_KEY", "stub")
+    monkeypatch.setattr(rateLimiter, "_limiters", {})
+    monkeypatch.setitem(rateLimiter.DEFAULT_SETTINGS, "library-files",
+                        {**rateLimiter.DEFAULT_SETTINGS["library-files"], "retry": rateLimiter.RetryPolicy(base_delay=0)})
+    with StubServer(error_rate=1.0) as stub:
+        monkeypatch.setattr(apiController.AI21LibraryAPI, "BASE_URL", stub.library_url)
+        yield stub
+
+
+def test_upload_error_exits_1(library_stub, tmp_path):
+    (tmp_path / "a.txt").write_text("text")
+    assert cli.main(["library", "upload", str(tmp_path / "a.txt")]) == 1
+
+
+def test_bulk_upload_with_failures_exits_1(library_stub, tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "a.txt").write_text("text")
+    assert cli.main(["library", "bulk-upload", str(tmp_path / "docs")]) == 1
+
+
+def test_summarize_missing_source_exits_1(tmp_path, capsys):
+    assert cli.main(["summarize", str(tmp_path / "nope.pdf")]) == 1
+    assert "not found" in capsys.readouterr().err
+
@@ -0,0 +1,32 @@
+from pdfSplitter import chapter_ranges
+
+
+def test_chapters_run_to_the_next_chapter_and_the_last_to_the_end():
+    entries = [(1, "One", 0), (1, "Two", 4), (1, "Three", 9)]
+    assert chapter_ranges(entries, 12) == [("One", 1, 4), ("Two", 5, 9), ("Three", 10, 12)]
+
+
+def test_unresolved_and_out_of_range_destinations_are_skipped():
+    entries = [(1, "External", -1), (1, "One", 0), (1, "Beyond", 30), (1, "Two", 4)]
+    assert chapter_ranges(entries, 20) == [("One", 1, 4), ("Two", 5, 20)]
+
+
+def test_entries_on_the_same_page_share_a_range():
+    entries = [(1, "A", 4), (1, "B", 4), (1, "C", 9)]
+    assert chapter_ranges(entries, 12) == [("A", 5, 9), ("B", 5, 9), ("C", 10, 12)]
+
+
+def test_out_of_order_entries_do_not_produce_negative_ranges():
+    entries = [(1, "Late", 9), (1, "Early", 2)]
+    assert chapter_ranges(entries, 12) == [("Late", 10, 12), ("Early", 3, 12)]
+
+
+def test_nested_levels():
+    entries = [(1, "Ch 1", 0), (2, "1.1", 0), (2, "1.2", 3), (1, "Ch 2", 6), (2, "2.1", 8)]
+    assert chapter_ranges(entries, 10) == [("Ch 1", 1, 6), ("Ch 2", 7, 10)]
+    # a section ends at the next section or at the next chapter, whichever comes first
+    assert chapter_ranges(entries, 10, level=2) == [("1.1", 1, 3), ("1.2", 4, 6), ("2.1", 9, 10)]
+
+
+def test_no_outline():
+    assert chapter_ranges([], 10) == []
@@ -0,0 +1,98 @@
+import asyncio
+
+import httpx
+import pytest
+
+from rateLimiter import (NEVER_RETRY, SAFE_TO_RETRY, RetryPolicy, ThrottledAsyncTransport, ThrottledTransport,
+                         configure_limiter, may_retry_error, may_retry_status)
+
+ENDPOINT = "test-endpoint"
+
+
+@pytest.fixture(autouse=True)
+def fast_limiter():
+    configure_limiter(ENDPOINT, rate=1e9, burst=10 ** 9, retry=RetryPolicy(max_retries=3, base_delay=0))
+
+
+def request(method="POST", extensions=None):
+    return httpx.Request(method, "https://example.test/", extensions=extensions or {})
+
+
+@pytest.mark.parametrize("method, extensions, status, expected", [
+    ("POST", None, 429, True),
+    ("POST", None, 500, False),
+    ("POST", None, 503, False),
+    ("POST", SAFE_TO_RETRY, 503, True),
+    ("GET", None, 503, True),
+    ("DELETE", None, 502, True),
+    ("GET", None, 404, False),
+    ("POST", NEVER_RETRY, 429, False),
+    ("GET", NEVER_RETRY, 503, False),
+])
+def test_may_retry_status(method, extensions, status, expected):
+    assert may_retry_status(request(method, extensions), status) is expected
+
+
+@pytest.mark.parametrize("method, extensions, error, expected", [
+    ("POST", None, httpx.ConnectError, True),
+    ("POST", None, httpx.ConnectTimeout, True),
+    ("POST", None, httpx.ReadTimeout, False),
+    ("POST", None, httpx.RemoteProtocolError, False),
+    ("POST", SAFE_TO_RETRY, httpx.ReadTimeout, True),
+    ("GET", None, httpx.ReadTimeout, True),
+    ("POST", NEVER_RETRY, httpx.ConnectError, False),
+])
+def test_may_retry_error(method, extensions, error, expected):
+    assert may_retry_error(request(method, extensions), error("failed")) is expected
+
+
+def counting_transport(status):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(status)
+    return httpx.MockTransport(handler), calls
+
+
+@pytest.mark.parametrize("method, extensions, status, expected_calls", [
+    ("POST", None, 500, 1),
+    ("POST", SAFE_TO_RETRY, 500, 4),
+    ("POST", None, 429, 4),
+    ("GET", None, 503, 4),
+    ("GET", None, 200, 1),
+])
+def test_transport_retries(method, extensions, status, expected_calls):
+    mock, calls = counting_transport(status)
+    with httpx.Client(transport=ThrottledTransport(ENDPOINT, mock)) as client:
+        response = client.request(method, "https://example.test/", extensions=extensions)
+    assert response.status_code == status
+    assert len(calls) == expected_calls
+
+
+def test_streamed_request_is_sent_once():
+    mock, calls = counting_transport(429)
+
+    async def body():
+        yield b"part"
+
+    async def send():
+        async with httpx.AsyncClient(transport=ThrottledAsyncTransport(ENDPOINT, mock)) as client:
+            return await client.post("https://example.test/", content=body(), extensions=NEVER_RETRY)
+
+    assert asyncio.run(send()).status_code == 429
+    assert len(calls) == 1
+
+
+def test_connect_errors_are_retried_for_post():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200)
+
+    with httpx.Client(transport=ThrottledTransport(ENDPOINT, httpx.MockTransport(handler))) as client:
+        assert client.post("https://example.test/").status_code == 200
+    assert len(attempts) == 3
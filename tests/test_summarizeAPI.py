@@ -0,0 +1,142 @@
+import asyncio
+import os
+
+import PyPDF2
+import pytest
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+import benchmark
+import responseCache
+import summarizeAPI
+from stubServer import StubServer
+from textCache import PageTextCache
+
+
+def stream(data: bytes, **entries) -> DecodedStreamObject:
+    obj = DecodedStreamObject()
+    obj.set_data(data)
+    obj.update({NameObject(key): value for key, value in entries.items()})
+    return obj
+
+
+def make_page(to_unicode=b"cmap", encoding="/WinAnsiEncoding", form=b"BT (form) Tj ET", writer=None):
+    """A page drawing text with font F1 and form XObject X1, built in memory."""
+    font = DictionaryObject({NameObject("/Type"): NameObject("/Font"), NameObject("/BaseFont"): NameObject("/Helvetica"),
+                             NameObject("/Encoding"): NameObject(encoding),
+                             NameObject("/ToUnicode"): stream(to_unicode)})
+    xobject = stream(form, **{"/Subtype": NameObject("/Form")})
+    page = PyPDF2.PageObject.create_blank_page(width=612, height=792)
+    page[NameObject("/Contents")] = stream(b"BT /F1 10 Tf (text) Tj ET /X1 Do")
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font) if writer else font}),
+        NameObject("/XObject"): DictionaryObject({NameObject("/X1"): xobject})})
+    return page
+
+
+def test_page_content_hash_is_stable():
+    assert summarizeAPI.page_content_hash(make_page()) == summarizeAPI.page_content_hash(make_page())
+    assert summarizeAPI.page_content_hash(make_page(writer=PyPDF2.PdfWriter())) is not None
+
+
+@pytest.mark.parametrize("change", [{"to_unicode": b"other cmap"}, {"encoding": "/MacRomanEncoding"},
+                                   {"form": b"BT (changed) Tj ET"}])
+def test_page_content_hash_changes_with_resources(change):
+    assert summarizeAPI.page_content_hash(make_page(**change)) != summarizeAPI.page_content_hash(make_page())
+
+
+def test_page_content_hash_ignores_image_data():
+    pages = [make_page(), make_page()]
+    for page, data in zip(pages, (b"\x00" * 16, b"\xff" * 16)):
+        page["/Resources"]["/XObject"][NameObject("/Im1")] = stream(data, **{"/Subtype": NameObject("/Image"),
+                                                                              "/Width": NumberObject(4)})
+    assert summarizeAPI.page_content_hash(pages[0]) == summarizeAPI.page_content_hash(pages[1])
+
+
+def test_page_content_hash_failure_returns_none():
+    class Broken:
+        def get_contents(self):
+            raise ValueError("bad page")
+
+    assert summarizeAPI.page_content_hash(Broken()) is None
+
+
+def test_revised_file_reuses_unchanged_pages(tmp_path):
+    cache = PageTextCache(":memory:")
+    original = benchmark.make_sample_pdf(tmp_path / "a.pdf", pages=4, lines_per_page=2)
+    revised = benchmark.make_sample_pdf(tmp_path / "b.pdf", pages=4, lines_per_page=2, revised_pages=[1])
+    summarizeAPI.extract_pages_cached(original, cache=cache, allow_parallel=False)
+    cache.reused = 0
+    pages = summarizeAPI.extract_pages_cached(revised, cache=cache, allow_parallel=False)
+    assert cache.reused == 3
+    assert "Revised page 2" in pages[1] and "Revised" not in pages[0]
+
+
+def test_unhashable_pages_are_extracted_but_not_cached(tmp_path, monkeypatch):
+    cache = PageTextCache(":memory:")
+    pdf = benchmark.make_sample_pdf(tmp_path / "a.pdf", pages=3, lines_per_page=2)
+    monkeypatch.setattr(summarizeAPI, "page_content_hash", lambda page: None)
+    pages = summarizeAPI.extract_pages_cached(pdf, cache=cache, allow_parallel=False)
+    assert all("Page" in text for text in pages)
+    assert cache.conn.execute("SELECT COUNT(*) FROM page_texts").fetchone()[0] == 0
+    assert cache.conn.execute("SELECT COUNT(*) FROM document_pages").fetchone()[0] == 0
+
+
+CHAPTERS = [("Introduction", 1, 4), ("Methods", 5, 9), ("Results", 10, 14), ("Appendix A", 15, 20)]
+
+
+@pytest.mark.parametrize("selection, expected", [
+    ("1", ["Introduction"]),
+    ("3-4", ["Results", "Appendix A"]),
+    ("4, 1", ["Introduction", "Appendix A"]),
+    ("appendix", ["Appendix A"]),
+    ("METH,2", ["Methods"]),
+    ("0, 9, nothing", []),
+    ("3-9", ["Results", "Appendix A"]),
+    (" , ", []),
+])
+def test_select_chapters(selection, expected):
+    assert [title for title, _, _ in summarizeAPI.select_chapters(CHAPTERS, selection)] == expected
+
+
+def test_negative_start_page_is_clamped(tmp_path):
+    cache = PageTextCache(":memory:")
+    pdf = benchmark.make_sample_pdf(tmp_path / "a.pdf", pages=4, lines_per_page=2)
+    pages = summarizeAPI.extract_pages_cached(pdf, -1, 2, cache=cache, allow_parallel=False)
+    assert len(pages) == 2 and "Page 1 " in pages[0]
+    assert sorted(cache.get_pages(cache.content_hash(pdf), -1, 4)) == [0, 1]
+
+
+@pytest.fixture
+def summarize_stub(monkeypatch, tmp_path):
+    """The summarize endpoint on a stub server, with fresh caches under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(summarizeAPI, "_text_cache", None)
+    monkeypatch.setattr(responseCache, "_response_cache", responseCache.ResponseCache(":memory:"))
+    with StubServer() as stub:
+        monkeypatch.setattr(summarizeAPI.summarizeAPI, "API_URL", stub.summarize_url)
+        monkeypatch.setattr(summarizeAPI.summarizeAPI, "get_api_key", staticmethod(lambda: "stub"))
+        yield stub
+
+
+def summarize_folder(folder, **options):
+    return asyncio.run(summarizeAPI.summarize_folder(folder, extract_workers=1, **options))
+
+
+def test_summarize_folder_redoes_revised_pdfs(summarize_stub, tmp_path):
+    pdf = benchmark.make_sample_pdf(tmp_path / "a.pdf", pages=2, lines_per_page=2)
+    assert summarize_folder(tmp_path)["summarized"] == [str(pdf)]
+    assert summarize_folder(tmp_path)["skipped"] == [str(pdf)]
+    summary = tmp_path / "a.txt"
+    os.utime(pdf, ns=(summary.stat().st_mtime_ns + 10 ** 9,) * 2)  # the PDF changed after it was summarized
+    assert summarize_folder(tmp_path)["summarized"] == [str(pdf)]
+
+
+def test_summarize_folder_without_api_key_fails_every_pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(summarizeAPI.summarizeAPI, "get_api_key", staticmethod(lambda: ""))
+    pdf = benchmark.make_sample_pdf(tmp_path / "a.pdf", pages=1, lines_per_page=1)
+    assert summarize_folder(tmp_path) == {"summarized": [], "skipped": [], "failed": [str(pdf)]}
+
+
+def test_summarize_folder_missing_folder(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        summarize_folder(tmp_path / "nope")
@@ -0,0 +1,102 @@
+import asyncio
+import configparser
+
+import pytest
+
+import rateLimiter
+import watchFolder
+from fileHash import file_sha256
+from stubServer import StubServer
+from watchFolder import WorkQueue
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(watchFolder.time, "time", clock.time)
+    return clock
+
+
+def test_status_follows_a_file_through_the_queue(clock):
+    queue = WorkQueue(":memory:")
+    assert queue.status("a.pdf", 10, 1) == "new"
+    queue.enqueue("a.pdf", 10, 1)
+    assert queue.status("a.pdf", 10, 1) == "pending"
+    assert queue.pending() == ["a.pdf"]
+    queue.mark_done("a.pdf")
+    assert queue.status("a.pdf", 10, 1) == "done"
+    assert queue.status("a.pdf", 11, 1) == "new"  # a changed file is a new version
+
+
+def test_failed_files_back_off_exponentially_then_give_up(clock):
+    queue = WorkQueue(":memory:", max_attempts=3)
+    queue.enqueue("a.pdf", 10, 1)
+    for attempt in (1, 2):
+        queue.mark_failed("a.pdf", "boom")
+        delay = watchFolder.RETRY_DELAY * 2 ** (attempt - 1)
+        clock.now += delay - 1
+        assert queue.status("a.pdf", 10, 1) == "waiting"
+        clock.now += 1
+        assert queue.status("a.pdf", 10, 1) == "retry"
+        queue.enqueue("a.pdf", 10, 1)  # re-queued for the retry: the attempt count is kept
+    queue.mark_failed("a.pdf", "boom")
+    clock.now += 10 ** 6
+    assert queue.status("a.pdf", 10, 1) == "gave-up"
+
+
+def test_a_new_version_of_a_failed_file_starts_over(clock):
+    queue = WorkQueue(":memory:", max_attempts=1)
+    queue.enqueue("a.pdf", 10, 1)
+    queue.mark_failed("a.pdf", "boom")
+    assert queue.status("a.pdf", 10, 1) == "gave-up"
+    queue.enqueue("a.pdf", 10, 2)
+    assert queue.status("a.pdf", 10, 2) == "pending"
+
+
+def test_processed_work_is_recorded_per_content_and_action():
+    queue = WorkQueue(":memory:")
+    queue.record_processed("abc", "summarize", "a.txt")
+    assert queue.is_processed("abc", "summarize")
+    assert not queue.is_processed("abc", "upload")
+
+
+def test_run_refuses_a_missing_folder(tmp_path):
+    watcher = watchFolder.FolderWatcher(str(tmp_path / "typo"), ["extract"], queue=WorkQueue(":memory:"))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(watcher.run(once=True))
+    assert not (tmp_path / "typo").exists()
+
+
+def test_run_needs_an_api_key_to_summarize(tmp_path, monkeypatch):
+    monkeypatch.delenv(watchFolder.appConfig.API_KEY_ENV, raising=False)
+    monkeypatch.setattr(watchFolder.appConfig, "read_config", lambda path: configparser.ConfigParser())
+    watcher = watchFolder.FolderWatcher(str(tmp_path), ["summarize"], queue=WorkQueue(":memory:"))
+    with pytest.raises(KeyError):
+        asyncio.run(watcher.run(once=True))
+
+
+def test_scan_survives_a_removed_folder(tmp_path):
+    watcher = watchFolder.FolderWatcher(str(tmp_path / "gone"), ["extract"], queue=WorkQueue(":memory:"))
+    asyncio.run(watcher.scan(asyncio.Queue()))
+
+
+def test_rejected_upload_is_failed_not_recorded(tmp_path, monkeypatch):
+    monkeypatch.setenv(watchFolder.appConfig.API_KEY_ENV, "stub")
+    monkeypatch.setattr(rateLimiter, "_limiters", {})
+    monkeypatch.setitem(rateLimiter.DEFAULT_SETTINGS, "library-files",
+                        {**rateLimiter.DEFAULT_SETTINGS["library-files"], "retry": rateLimiter.RetryPolicy(base_delay=0)})
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4 not really")
+    queue = WorkQueue(":memory:")
+    with StubServer(error_rate=1.0) as stub:
+        monkeypatch.setattr(watchFolder.AI21LibraryAPI, "BASE_URL", stub.library_url)
+        watcher = watchFolder.FolderWatcher(str(tmp_path), ["upload"], settle=0, queue=queue)
+        assert asyncio.run(watcher.run(once=True))["failed"] == 1
+    assert not queue.is_processed(file_sha256(tmp_path / "a.pdf"), "upload")
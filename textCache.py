@@ -0,0 +1,187 @@
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fileHash import file_sha256
+
+DEFAULT_CACHE_PATH = ".cache/page_text.sqlite3"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    sha256 TEXT PRIMARY KEY,
+    page_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS document_pages (
+    sha256 TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    content_sha TEXT NOT NULL,
+    PRIMARY KEY (sha256, page)
+);
+CREATE TABLE IF NOT EXISTS page_texts (
+    content_sha TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outlines (
+    sha256 TEXT PRIMARY KEY,
+    entries TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_document_pages_content ON document_pages(content_sha);
+CREATE INDEX IF NOT EXISTS idx_page_texts_last_access ON page_texts(last_access);
+-- text used to be stored per (document, page); it is only a cache, so the old table is simply dropped
+DROP TABLE IF EXISTS pages;
+"""
+
+
+class PageTextCache:
+    """On-disk cache of extracted page text, looked up by (PDF content hash, page index).
+
+    Text is stored once per page *content* hash (see summarizeAPI.page_content_hash) and each document
+    version maps its pages onto those texts, so when a file is revised only pages whose content changed
+    have to be extracted again. A file's hash is remembered against its path, size and mtime, so an
+    unchanged file is not even re-hashed. Total text size is bounded by `max_bytes`, evicting least
+    recently used page texts first. Each version's resolved outline is kept too, so chapters can be looked
+    up without parsing the file again.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        if str(db_path) != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0  # misses served from another version's text with the same page content
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def content_hash(self, file_path: Path) -> str:
+        """SHA-256 of the file, reusing the stored hash while size and mtime are unchanged."""
+        key = str(Path(file_path).resolve())
+        stat = os.stat(key)
+        row = self.conn.execute("SELECT mtime_ns, size, sha256 FROM files WHERE path = ?", (key,)).fetchone()
+        if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            return row[2]
+        sha256 = file_sha256(key)
+        with self.conn:
+            if row and row[2] != sha256:
+                self._invalidate(row[2], key)
+            self.conn.execute("INSERT OR REPLACE INTO files (path, mtime_ns, size, sha256) VALUES (?, ?, ?, ?)",
+                              (key, stat.st_mtime_ns, stat.st_size, sha256))
+        return sha256
+
+    def _invalidate(self, sha256: str, path: str) -> None:
+        """Forget an old version's page mapping; its page texts stay, for the new version to reuse."""
+        still_used = self.conn.execute("SELECT 1 FROM files WHERE sha256 = ? AND path != ?", (sha256, path)).fetchone()
+        if not still_used:
+            self.conn.execute("DELETE FROM document_pages WHERE sha256 = ?", (sha256,))
+            self.conn.execute("DELETE FROM documents WHERE sha256 = ?", (sha256,))
+            self.conn.execute("DELETE FROM outlines WHERE sha256 = ?", (sha256,))
+
+    def page_count(self, sha256: str) -> Optional[int]:
+        row = self.conn.execute("SELECT page_count FROM documents WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def set_page_count(self, sha256: str, page_count: int) -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO documents (sha256, page_count) VALUES (?, ?)", (sha256, page_count))
+
+    def outline(self, sha256: str) -> Optional[List[Tuple[int, str, int]]]:
+        """The stored outline index, as (depth, title, 0-based first page) entries, or None if not indexed yet."""
+        row = self.conn.execute("SELECT entries FROM outlines WHERE sha256 = ?", (sha256,)).fetchone()
+        return [tuple(entry) for entry in json.loads(row[0])] if row else None
+
+    def set_outline(self, sha256: str, entries: Iterable[Tuple[int, str, int]]) -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO outlines (sha256, entries) VALUES (?, ?)",
+                              (sha256, json.dumps([list(entry) for entry in entries])))
+
+    def get_pages(self, sha256: str, start_page: int, end_page: int) -> Dict[int, str]:
+        """Cached text for pages in [start_page, end_page); pages not in the cache are simply absent."""
+        rows = self.conn.execute("SELECT d.page, d.content_sha, t.text FROM document_pages d "
+                                 "JOIN page_texts t ON t.content_sha = d.content_sha "
+                                 "WHERE d.sha256 = ? AND d.page >= ? AND d.page < ?",
+                                 (sha256, start_page, end_page)).fetchall()
+        self.hits += len(rows)
+        self.misses += (end_page - start_page) - len(rows)
+        self._touch(content_sha for _, content_sha, _ in rows)
+        return {page: text for page, _, text in rows}
+
+    def texts_by_content(self, content_shas: Iterable[str]) -> Dict[str, str]:
+        """Known texts for the given page content hashes, whichever document they were first seen in."""
+        found = {}
+        content_shas = list(set(content_shas))
+        for i in range(0, len(content_shas), 500):  # stay under SQLite's bound-parameter limit
+            batch = content_shas[i:i + 500]
+            found.update(self.conn.execute(f"SELECT content_sha, text FROM page_texts WHERE content_sha IN "
+                                           f"({', '.join('?' * len(batch))})", batch).fetchall())
+        self.reused += len(found)
+        self._touch(found)
+        return found
+
+    def _touch(self, content_shas: Iterable[str]) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("UPDATE page_texts SET last_access = ? WHERE content_sha = ?",
+                                  [(now, content_sha) for content_sha in content_shas])
+
+    def link_pages(self, sha256: str, pages: Iterable[Tuple[int, str]]) -> None:
+        """Map (page index, content hash) pairs of a document onto page texts that are already stored."""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO document_pages (sha256, page, content_sha) VALUES (?, ?, ?)",
+                                  [(sha256, page, content_sha) for page, content_sha in pages])
+
+    def put_pages(self, sha256: str, pages: Iterable[Tuple[int, str, str]]) -> None:
+        """Store newly extracted (page index, content hash, text) triples of a document."""
+        now = time.time()
+        pages = list(pages)
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO page_texts (content_sha, text, bytes, last_access) "
+                                  "VALUES (?, ?, ?, ?)",
+                                  [(content_sha, text, len(text.encode("utf-8")), now) for _, content_sha, text in pages])
+        self.link_pages(sha256, [(page, content_sha) for page, content_sha, _ in pages])
+        self.evict()
+
+    def size_bytes(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM page_texts").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least recently used page texts until the cache fits in max_bytes. Returns texts evicted."""
+        excess = self.size_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        victims, freed = [], 0
+        for content_sha, size in self.conn.execute("SELECT content_sha, bytes FROM page_texts ORDER BY last_access"):
+            victims.append((content_sha,))
+            freed += size
+            if freed >= excess:
+                break
+        with self.conn:
+            self.conn.executemany("DELETE FROM page_texts WHERE content_sha = ?", victims)
+            self.conn.executemany("DELETE FROM document_pages WHERE content_sha = ?", victims)
+        return len(victims)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "reused": self.reused, "size_bytes": self.size_bytes(), "max_bytes": self.max_bytes}
@@ -0,0 +1,305 @@
+import asyncio
+import contextlib
+import fnmatch
+import os
+import signal
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from rich.console import Console
+
+import appConfig
+import pdfMemory
+import summarizeAPI
+from apiController import AI21LibraryAPI, CONFIGFILE, get_api_key
+from fileHash import file_sha256
+from metrics import metrics
+
+console = Console()
+
+DEFAULT_QUEUE_PATH = ".cache/watch_queue.sqlite3"
+ACTIONS = ("extract", "summarize", "upload")
+RETRY_DELAY = 60.0  # seconds before a failed file is retried; doubles with every further failure
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_state ON files(state);
+CREATE TABLE IF NOT EXISTS processed (
+    sha256 TEXT NOT NULL,
+    action TEXT NOT NULL,
+    result TEXT,
+    finished REAL NOT NULL,
+    PRIMARY KEY (sha256, action)
+);
+"""
+
+
+class WorkQueue:
+    """Persistent record of the files a FolderWatcher has seen and what became of them.
+
+    Files are tracked by path, size and mtime, so after a restart an unchanged file is skipped with one
+    stat() and one indexed lookup, and files that were still pending are picked up again. Finished work
+    is also recorded per content hash and action, so a renamed or merely touched file is not processed
+    twice. Failed files are retried with exponential backoff, at most `max_attempts` times per version.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_QUEUE_PATH, max_attempts: int = 3):
+        if str(db_path) != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self.max_attempts = max_attempts
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def status(self, path: str, size: int, mtime_ns: int) -> str:
+        """"new" for an unseen file or version, "pending", "done", "retry" (failed, backoff elapsed),
+        "waiting" (failed, backing off) or "gave-up" (failed max_attempts times)."""
+        row = self.conn.execute("SELECT size, mtime_ns, state, attempts, updated FROM files WHERE path = ?",
+                                (path,)).fetchone()
+        if row is None or (row[0], row[1]) != (size, mtime_ns):
+            return "new"
+        state, attempts, updated = row[2:]
+        if state != "failed":
+            return state
+        if attempts >= self.max_attempts:
+            return "gave-up"
+        return "retry" if time.time() - updated >= RETRY_DELAY * 2 ** (attempts - 1) else "waiting"
+
+    def enqueue(self, path: str, size: int, mtime_ns: int) -> None:
+        """Mark a file pending; a new version (size or mtime changed) starts again with no failed attempts."""
+        with self.conn:
+            self.conn.execute("INSERT INTO files (path, size, mtime_ns, state, attempts, updated) "
+                              "VALUES (?, ?, ?, 'pending', 0, ?) ON CONFLICT(path) DO UPDATE SET "
+                              "attempts = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns "
+                              "THEN attempts ELSE 0 END, size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                              "state = 'pending', error = NULL, updated = excluded.updated",
+                              (path, size, mtime_ns, time.time()))
+
+    def pending(self) -> List[str]:
+        """Files left pending by an earlier run, oldest first."""
+        return [row[0] for row in self.conn.execute("SELECT path FROM files WHERE state = 'pending' ORDER BY updated")]
+
+    def mark_done(self, path: str) -> None:
+        with self.conn:
+            self.conn.execute("UPDATE files SET state = 'done', error = NULL, updated = ? WHERE path = ?",
+                              (time.time(), path))
+
+    def forget(self, path: str) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def mark_failed(self, path: str, error: str) -> None:
+        with self.conn:
+            self.conn.execute("UPDATE files SET state = 'failed', attempts = attempts + 1, error = ?, updated = ? "
+                              "WHERE path = ?", (error, time.time(), path))
+
+    def is_processed(self, sha256: str, action: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM processed WHERE sha256 = ? AND action = ?",
+                                 (sha256, action)).fetchone() is not None
+
+    def record_processed(self, sha256: str, action: str, result: str = "") -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO processed (sha256, action, result, finished) VALUES (?, ?, ?, ?)",
+                              (sha256, action, result, time.time()))
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM files GROUP BY state").fetchall())
+
+
+def _extract(file_path: str) -> List[str]:
+    """Process-pool worker: page texts through the page text cache (one cache handle per worker process)."""
+    return summarizeAPI.extract_pages_cached(Path(file_path), allow_parallel=False)
+
+
+class FolderWatcher:
+    """Watch a folder for new or changed files and extract, summarize and/or upload each one.
+
+    The folder is polled every `interval` seconds, so no platform-specific file events are needed. A file
+    is only picked up once its size and mtime have not changed for `settle` seconds, so files still being
+    copied in are left alone. At most `concurrency` files are processed at once and `queue_size` more wait
+    in memory; while the workers are behind, scanning waits too (backpressure). Everything else stays
+    recorded in the WorkQueue until there is room, and across restarts.
+    """
+
+    def __init__(self, folder: str = summarizeAPI.data_folder, actions: Sequence[str] = ("summarize",),
+                 pattern: str = "*.pdf", output_folder: Optional[str] = None, focus: str = "",
+                 labels: Optional[List[str]] = None, library_path: Optional[str] = None, interval: float = 2.0,
+                 settle: float = 5.0, concurrency: int = 2, queue_size: int = 4, extract_workers: Optional[int] = None,
+                 queue: Optional[WorkQueue] = None):
+        unknown = set(actions) - set(ACTIONS)
+        if unknown:
+            raise ValueError(f"Unknown actions: {', '.join(sorted(unknown))}")
+        self.folder = Path(folder)
+        self.actions = tuple(actions)
+        self.pattern = pattern
+        self.output_folder = Path(output_folder or folder)
+        self.focus = focus
+        self.labels = labels
+        self.library_path = library_path
+        self.interval = interval
+        self.settle = settle
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.extract_workers = extract_workers
+        self.queue = queue or WorkQueue()
+        self.results = {"processed": 0, "skipped": 0, "failed": 0}
+        self._settling: Dict[str, Tuple[int, int, float]] = {}  # path -> (size, mtime_ns, unchanged since)
+        self._known: Dict[str, Tuple[int, int]] = {}  # versions already found finished; no lookup needed
+        self._inflight = set()
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stop scanning; files being processed finish, queued ones stay pending for the next run."""
+        self._stop.set()
+
+    async def _submit(self, work: asyncio.Queue, path: str) -> None:
+        self._inflight.add(path)
+        await work.put(path)  # blocks while every worker is busy and the queue is full
+
+    async def scan(self, work: asyncio.Queue) -> None:
+        """One pass over the folder: queue files that are new or changed and have settled."""
+        now = time.monotonic()
+        present = set()
+        try:
+            entries = os.scandir(self.folder)
+        except OSError as err:  # e.g. the folder was removed or unmounted; try again next pass
+            console.print(f"Error scanning {self.folder}: {err}")
+            return
+        with entries:
+            for entry in entries:
+                if self._stop.is_set():
+                    return
+                try:
+                    if not fnmatch.fnmatch(entry.name, self.pattern) or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:  # deleted or unreadable since the listing: not this pass
+                    continue
+                path = entry.path
+                present.add(path)
+                version = (stat.st_size, stat.st_mtime_ns)
+                if path in self._inflight or self._known.get(path) == version:
+                    continue
+                status = self.queue.status(path, *version)
+                if status in ("done", "gave-up"):
+                    self._known[path] = version
+                    continue
+                if status == "waiting":
+                    continue
+                size, mtime_ns, since = self._settling.get(path, (None, None, now))
+                if (size, mtime_ns) != version:
+                    self._settling[path] = (*version, now)
+                    if self.settle > 0:
+                        continue
+                elif now - since < self.settle:
+                    continue
+                self._settling.pop(path, None)
+                self.queue.enqueue(path, *version)
+                await self._submit(work, path)
+        for path in set(self._settling) - present:  # deleted before it settled
+            del self._settling[path]
+
+    async def _process(self, path: Path, pool, client, api) -> str:
+        sha256 = await asyncio.to_thread(file_sha256, path)
+        todo = [action for action in self.actions if not self.queue.is_processed(sha256, action)]
+        if not todo:
+            return "skipped"
+        if "extract" in todo or "summarize" in todo:
+            with metrics.time_stage("watch.extract", items=1):
+                pages = await asyncio.get_running_loop().run_in_executor(pool, _extract, str(path))
+            if "extract" in todo:
+                self.queue.record_processed(sha256, "extract", str(len(pages)))
+        if "summarize" in todo:
+            summary = await summarizeAPI.summarize_pages_async(client, pages, self.focus)
+            if not summary:
+                raise RuntimeError("no summary returned")
+            if not await asyncio.to_thread(summarizeAPI.U.save_text_to_file, summary, path.stem,
+                                           output_folder=self.output_folder):
+                raise RuntimeError("summary could not be saved")
+            self.queue.record_processed(sha256, "summarize", str(self.output_folder / f"{path.stem}.txt"))
+        if "upload" in todo:
+            response = await api.upload_document(str(path), path=self.library_path, labels=self.labels)
+            file_id = response.get("fileId") if isinstance(response, dict) else response
+            if not file_id:
+                raise RuntimeError(f"upload failed: {response}")
+            self.queue.record_processed(sha256, "upload", str(file_id))
+        console.log(f"{path.name}: {', '.join(todo)} done")
+        return "processed"
+
+    async def _worker(self, work: asyncio.Queue, pool, client, api) -> None:
+        while (path := await work.get()) is not None:
+            try:
+                with metrics.time_stage("watch.file", items=1):
+                    outcome = await self._process(Path(path), pool, client, api)
+                self.queue.mark_done(path)
+                self.results[outcome] += 1
+            except Exception as err:
+                console.print(f"Error processing {Path(path).name}: {err}")
+                self.queue.mark_failed(path, str(err))
+                self.results["failed"] += 1
+            finally:
+                self._inflight.discard(path)
+
+    async def run(self, once: bool = False) -> Dict[str, int]:
+        """Watch until stop() (or SIGINT/SIGTERM); with once, return as soon as everything found has settled
+        and been processed. Returns counts of files processed, skipped (already done) and failed.
+        Raises FileNotFoundError when the folder does not exist, and KeyError when an action needs an API key
+        that is not configured, rather than watching without being able to process anything."""
+        if not self.folder.is_dir():
+            raise FileNotFoundError(f"Watched folder not found: {self.folder}")
+        self.output_folder.mkdir(parents=True, exist_ok=True)
+        work: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        async with contextlib.AsyncExitStack() as stack:
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                with contextlib.suppress(NotImplementedError, RuntimeError):  # not available on Windows
+                    loop.add_signal_handler(signum, self.stop)
+                    stack.callback(loop.remove_signal_handler, signum)
+            client = api = pool = None
+            if "summarize" in self.actions:
+                appConfig.require_api_key(summarizeAPI.summarizeAPI.CONFIG_FILE, 'KEY', 'API_KEY')
+                client = await stack.enter_async_context(summarizeAPI.summarizeAPI.summarize_client(self.concurrency))
+            if "upload" in self.actions:
+                api = await stack.enter_async_context(AI21LibraryAPI(get_api_key(CONFIGFILE),
+                                                                     max_connections=self.concurrency))
+            if "extract" in self.actions or "summarize" in self.actions:
+                pool = stack.enter_context(ProcessPoolExecutor(
+                    max_workers=self.extract_workers or min(self.concurrency, os.cpu_count() or 1),
+                    initializer=pdfMemory.use_low_memory, initargs=(pdfMemory.low_memory_enabled(),)))
+            workers = [asyncio.create_task(self._worker(work, pool, client, api)) for _ in range(self.concurrency)]
+            pending = self.queue.pending()
+            if pending:
+                console.log(f"Resuming {len(pending)} pending files")
+            for path in pending:
+                if os.path.exists(path):
+                    await self._submit(work, path)
+                else:
+                    self.queue.forget(path)
+            while not self._stop.is_set():
+                await self.scan(work)
+                if once and not self._settling:
+                    break
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._stop.wait(), self.interval)
+            if self._stop.is_set():  # queued files stay pending in the WorkQueue for the next run
+                while not work.empty():
+                    self._inflight.discard(work.get_nowait())
+            for _ in workers:
+                await work.put(None)
+            await asyncio.gather(*workers)
+        console.log(f"Watch stopped: {self.results}, queue: {self.queue.counts()}")
+        return self.results